@@ -58,6 +58,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'projects.middleware.PerformanceMiddleware',
+    'projects.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -138,6 +140,74 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cached choice lists (projects/choices.py); point CACHE_URL at Redis or
+# Memcached to share them between workers.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# Background tasks (e.g. large exports) run on a per-process thread pool.
+# Set BACKGROUND_TASKS_EAGER to run them inline instead.
+BACKGROUND_TASK_WORKERS = env.int("BACKGROUND_TASK_WORKERS", default=2)
+BACKGROUND_TASKS_EAGER = env.bool("BACKGROUND_TASKS_EAGER", default=False)
+# `manage.py cleanup_exports` fails exports left pending/running this long (a
+# restart loses queued tasks) and deletes finished ones after the retention.
+EXPORT_STALE_MINUTES = env.int("EXPORT_STALE_MINUTES", default=60)
+EXPORT_RETENTION_DAYS = env.int("EXPORT_RETENTION_DAYS", default=7)
+
+# Audit entries: "sync" writes them with each edit; "buffered" batches them on
+# a background thread (see projects/auditing.py).
+AUDIT_SINK = env("AUDIT_SINK", default="sync")
+AUDIT_BUFFER_SIZE = env.int("AUDIT_BUFFER_SIZE", default=100)
+AUDIT_FLUSH_INTERVAL = env.float("AUDIT_FLUSH_INTERVAL", default=2.0)
+
+# Generated Excel exports are cached here until the next job/milestone write.
+# Keep it outside MEDIA_ROOT: the cached workbooks must never be served.
+EXPORT_CACHE_DIR = env("EXPORT_CACHE_DIR", default=str(BASE_DIR / "var" / "export_cache"))
+
+# Request metrics (projects/middleware.py). Point PERF_METRICS_DIR at a
+# directory shared by the gunicorn workers so /metrics covers all of them.
+PERF_METRICS_DIR = env("PERF_METRICS_DIR", default=None)
+PERF_METRICS_DUMP_INTERVAL = env.float("PERF_METRICS_DUMP_INTERVAL", default=5.0)
+
+# Statements slower than SLOW_QUERY_MS (0 to disable) are logged with their
+# query plan to SLOW_QUERY_LOG, one JSON object per line (projects/slow_queries.py).
+SLOW_QUERY_MS = env.float("SLOW_QUERY_MS", default=500.0)
+SLOW_QUERY_LOG = env("SLOW_QUERY_LOG", default=str(BASE_DIR / "logs" / "slow_queries.jsonl"))
+# Parameters are left out unless this is set (never for user/session tables).
+SLOW_QUERY_LOG_PARAMS = env.bool("SLOW_QUERY_LOG_PARAMS", default=False)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "jsonl": {"()": "projects.slow_queries.JsonLinesFormatter"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+        "slow_queries": {
+            "class": "projects.slow_queries.JsonLinesFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "jsonl",
+        },
+    },
+    "loggers": {
+        "projects.nplusone": {"handlers": ["console"], "level": "WARNING"},
+        "projects.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+# N+1 detection (projects/nplusone.py): "off", "warn" or "raise" once a query
+# shape repeats NPLUSONE_THRESHOLD times in a request. Tests always raise.
+NPLUSONE_MODE = env("NPLUSONE_MODE", default="warn" if DEBUG else "off")
+NPLUSONE_THRESHOLD = env.int("NPLUSONE_THRESHOLD", default=5)
+TEST_RUNNER = "projects.nplusone.NPlusOneTestRunner"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,15 +1,20 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
+from .auditing import ChangeTracker, save_milestone_formset
 from .models import (
     Client,
     ClientAccess,
+    ExportJob,
     Job,
     JobAttachment,
     JobAuditLog,
     JobNote,
     Milestone,
     Project,
+    SystemCounter,
 )
+from .services import jobs_for_user
+from .transitions import transition_jobs
 
 
 class MilestoneInline(admin.TabularInline):
@@ -50,11 +55,51 @@ class JobAdmin(admin.ModelAdmin):
         "client_contact",
         "forecast_revenue",
         "actual_revenue",
+        "current_stage",
+        "next_milestone_date",
     )
     search_fields = ("reference", "title", "project__reference")
-    list_filter = ("project__client", "status")
+    list_filter = ("project__client", "status", "current_stage")
     inlines = [MilestoneInline]
 
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for status, label in Job.Status.choices:
+            name = f"set_status_{status}"
+            actions[name] = (
+                self._status_action(status),
+                name,
+                f"Set status to {label}",
+            )
+        return actions
+
+    @staticmethod
+    def _status_action(status):
+        def action(modeladmin, request, queryset):
+            # Re-scope the selection so staff can't move jobs outside it.
+            jobs = jobs_for_user(request.user).filter(pk__in=queryset.values("pk"))
+            result = transition_jobs(jobs, status, request.user)
+            modeladmin.message_user(
+                request,
+                f"Moved {result.updated} job(s) to {Job.Status(status).label}.",
+                messages.SUCCESS,
+            )
+
+        return action
+
+    def save_related(self, request, form, formsets, change):
+        # Audit admin edits the same way as the job page, in one INSERT.
+        tracker = ChangeTracker(form.instance, request.user)
+        if change:
+            tracker.track_form(form, "job_field_updated")
+        form.save_m2m()
+        for formset in formsets:
+            if formset.model is Milestone:
+                save_milestone_formset(formset, tracker if change else None)
+            else:
+                self.save_formset(request, form, formset, change=change)
+        tracker.flush()
+
 
 @admin.register(Milestone)
 class MilestoneAdmin(admin.ModelAdmin):
@@ -84,3 +129,27 @@ class JobAuditLogAdmin(admin.ModelAdmin):
     list_filter = ("action", "field_name")
     search_fields = ("job__reference", "actor__username", "note")
     autocomplete_fields = ("job", "actor")
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "requested_by",
+        "export_format",
+        "status",
+        "rows_processed",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status", "export_format")
+    search_fields = ("requested_by__username",)
+
+
+@admin.register(SystemCounter)
+class SystemCounterAdmin(admin.ModelAdmin):
+    list_display = ("name", "value", "updated_at")
+    readonly_fields = ("name", "value", "created_at", "updated_at")
+
+    def has_add_permission(self, request):
+        return False
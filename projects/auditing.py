@@ -0,0 +1,254 @@
+"""Batched audit logging for job and milestone edits.
+
+``ChangeTracker`` diffs an edit once, collects the resulting ``JobAuditLog``
+rows and hands them to the audit sink in one batch.  Views, the admin and any
+future API share it so every edit path produces the same audit trail.
+
+The sink is chosen by ``AUDIT_SINK``: ``"sync"`` (the default) inserts each
+batch with ``bulk_create`` immediately; ``"buffered"`` queues committed
+entries in memory and inserts them from a background thread once
+``AUDIT_BUFFER_SIZE`` entries are waiting or ``AUDIT_FLUSH_INTERVAL`` seconds
+have passed, at the end of each request, and at interpreter exit.  Entries
+take their ``created_at`` when they are built, so buffered ones still record
+the time of the edit rather than of the flush.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from typing import Any, Iterable
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from accounts.models import User
+
+from .export_cache import bump_export_generation
+from .models import Job, JobAuditLog, Milestone
+from .schedule import refresh_job_schedule
+
+logger = logging.getLogger(__name__)
+
+
+class SyncAuditSink:
+    def write(self, entries: list[JobAuditLog]) -> None:
+        JobAuditLog.objects.bulk_create(entries)
+
+    def flush(self) -> None:
+        pass
+
+
+class BufferedAuditSink:
+    """Queues audit entries and inserts them in batches off the request path."""
+
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending: list[JobAuditLog] = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    def write(self, entries: list[JobAuditLog]) -> None:
+        # Only queue entries whose edit actually committed.
+        transaction.on_commit(lambda: self._enqueue(entries))
+
+    def _enqueue(self, entries: list[JobAuditLog]) -> None:
+        with self._condition:
+            if self._closed:
+                JobAuditLog.objects.bulk_create(entries)
+                return
+            self._pending.extend(entries)
+            self._start()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="ddps-audit-sink", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+    def _take(self) -> list[JobAuditLog]:
+        with self._condition:
+            batch, self._pending = self._pending, []
+        return batch
+
+    def flush(self) -> None:
+        """Insert everything queued so far from the calling thread."""
+        with self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return
+            try:
+                JobAuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+            except Exception:
+                # Fall back to row-by-row so one bad entry (e.g. for a job that
+                # has since been deleted) doesn't drop the whole batch.
+                logger.exception("Audit batch insert failed; retrying per entry")
+                for entry in batch:
+                    try:
+                        entry.save(force_insert=True)
+                    except Exception:
+                        logger.exception("Dropping audit entry %r", entry.__dict__)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+
+_sink: SyncAuditSink | BufferedAuditSink | None = None
+_sink_lock = threading.Lock()
+
+
+def audit_sink() -> SyncAuditSink | BufferedAuditSink:
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            if settings.AUDIT_SINK == "buffered":
+                _sink = BufferedAuditSink(
+                    settings.AUDIT_BUFFER_SIZE, settings.AUDIT_FLUSH_INTERVAL
+                )
+            else:
+                _sink = SyncAuditSink()
+        return _sink
+
+
+def flush_audit_sink() -> None:
+    if _sink is not None:
+        _sink.flush()
+
+
+def _display(value: Any) -> str:
+    return str(value or "")
+
+
+def _comparable(value: Any) -> Any:
+    return value.pk if isinstance(value, models.Model) else value
+
+
+def snapshot(instance: models.Model, fields: Iterable[str]) -> dict[str, Any]:
+    """Current values of ``fields``, for diffing against a later snapshot."""
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _initial_value(form: forms.BaseForm, name: str) -> Any:
+    """The form's initial value, resolved to an object for model choices."""
+    field = form.fields[name]
+    value = form.get_initial_for_field(field, name)
+    if (
+        isinstance(field, forms.ModelChoiceField)
+        and not isinstance(value, models.Model)
+        and value not in field.empty_values
+    ):
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            return value
+    return value
+
+
+class ChangeTracker:
+    """Collects audit entries for one job and writes them in one INSERT."""
+
+    def __init__(self, job: Job, actor: User | None):
+        self.job = job
+        self.actor = actor if actor is not None and actor.is_authenticated else None
+        self.entries: list[JobAuditLog] = []
+
+    def add(self, action: str, **values) -> None:
+        self.entries.append(
+            JobAuditLog(job=self.job, actor=self.actor, action=action, **values)
+        )
+
+    def track(
+        self, action: str, before: dict[str, Any], after: dict[str, Any], prefix=""
+    ) -> None:
+        """Record one entry per field whose value differs between snapshots."""
+        for field, previous in before.items():
+            current = after.get(field)
+            if _comparable(previous) == _comparable(current):
+                continue
+            self.add(
+                action,
+                field_name=f"{prefix} - {field}" if prefix else field,
+                previous_value=_display(previous),
+                new_value=_display(current),
+            )
+
+    def track_form(self, form: forms.BaseForm, action: str, prefix="") -> None:
+        """Diff a valid form's initial data against its cleaned data."""
+        fields = [name for name in form.changed_data if name in form.cleaned_data]
+        self.track(
+            action,
+            {name: _initial_value(form, name) for name in fields},
+            {name: form.cleaned_data[name] for name in fields},
+            prefix=prefix,
+        )
+
+    def flush(self) -> list[JobAuditLog]:
+        entries, self.entries = self.entries, []
+        if entries:
+            audit_sink().write(entries)
+        return entries
+
+
+def save_milestone_formset(
+    formset: forms.BaseModelFormSet, tracker: ChangeTracker | None = None
+) -> list[Milestone]:
+    """Save a valid milestone formset with one ``bulk_update``.
+
+    ``bulk_update`` skips ``auto_now`` and the Milestone signals, so this sets
+    ``updated_at``, refreshes the job schedule and invalidates cached exports
+    itself.  Changes are
+    recorded on ``tracker`` when one is given.
+    """
+    if tracker is not None:
+        for form in formset.forms:
+            if form.cleaned_data and form.has_changed():
+                tracker.track_form(
+                    form,
+                    "milestone_updated",
+                    prefix=form.instance.get_stage_display(),
+                )
+    model_fields = {field.name for field in Milestone._meta.concrete_fields}
+    fields = [name for name in formset.form.base_fields if name in model_fields]
+    milestones = formset.save(commit=False)
+    existing = [milestone for milestone in milestones if milestone.pk]
+    now = timezone.now()
+    with transaction.atomic():
+        for milestone in formset.deleted_objects:
+            milestone.delete()
+        for milestone in milestones:
+            if milestone.pk is None:
+                milestone.save()
+        for milestone in existing:
+            milestone.updated_at = now
+        if existing:
+            Milestone.objects.bulk_update(existing, [*fields, "updated_at"])
+            refresh_job_schedule({milestone.job_id for milestone in existing})
+            bump_export_generation()
+    return milestones
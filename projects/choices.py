@@ -0,0 +1,121 @@
+"""Cached choice lists for the job form selects and the autocomplete endpoint.
+
+Each list is built once and kept in Django's cache; the signals in
+``projects/signals.py`` drop it when users, client assignments or projects
+change.  Entries also expire after ``CHOICES_TIMEOUT`` seconds, so workers
+with separate local-memory caches converge without a shared backend.
+"""
+from __future__ import annotations
+
+from django.core.cache import cache
+
+from .models import ClientAccess, Project
+from .services import AccessScope, internal_users
+
+CHOICES_TIMEOUT = 300
+AUTOCOMPLETE_LIMIT = 20
+
+STAFF_KEY = "projects:choices:staff"
+CONTACTS_KEY = "projects:choices:contacts"
+PROJECTS_KEY = "projects:choices:projects"
+
+# Autocomplete source -> the cached list it searches.
+SOURCES = ("owner", "design_manager", "client_contact", "project")
+
+
+def staff_choices() -> list[tuple[int, str]]:
+    """``(user_id, label)`` for users who may own or manage jobs."""
+    return cache.get_or_set(
+        STAFF_KEY,
+        lambda: list(
+            internal_users().order_by("username").values_list("id", "username")
+        ),
+        CHOICES_TIMEOUT,
+    )
+
+
+def contact_choices() -> list[tuple[int, str, int]]:
+    """``(user_id, label, client_id)`` for every client assignment."""
+    return cache.get_or_set(
+        CONTACTS_KEY,
+        lambda: list(
+            ClientAccess.objects.order_by("user__username").values_list(
+                "user_id", "user__username", "client_id"
+            )
+        ),
+        CHOICES_TIMEOUT,
+    )
+
+
+def project_choices() -> list[tuple[int, str, int]]:
+    """``(project_id, label, client_id)`` for every project."""
+
+    def build():
+        return [
+            (pk, f"{reference} - {name}", client_id)
+            for pk, reference, name, client_id in Project.objects.order_by(
+                "reference"
+            ).values_list("id", "reference", "name", "client_id")
+        ]
+
+    return cache.get_or_set(PROJECTS_KEY, build, CHOICES_TIMEOUT)
+
+
+def invalidate_user_choices() -> None:
+    cache.delete_many([STAFF_KEY, CONTACTS_KEY])
+
+
+def invalidate_project_choices() -> None:
+    cache.delete(PROJECTS_KEY)
+
+
+def _scoped(
+    entries: list[tuple[int, str, int]], scope: AccessScope, client_id: int | None
+) -> list[tuple[int, str]]:
+    seen: dict[int, str] = {}
+    for pk, label, entry_client_id in entries:
+        if client_id is not None and entry_client_id != client_id:
+            continue
+        if scope.unrestricted or entry_client_id in scope.client_ids:
+            seen.setdefault(pk, label)
+    return list(seen.items())
+
+
+def choices_for(
+    source: str, scope: AccessScope, client_id: int | None = None
+) -> list[tuple[int, str]]:
+    """``(pk, label)`` pairs ``scope`` may pick for ``source``.
+
+    ``client_id`` narrows client contacts and projects to one client.
+    """
+    if source in ("owner", "design_manager"):
+        return staff_choices()
+    if source == "client_contact":
+        return _scoped(contact_choices(), scope, client_id)
+    if source == "project":
+        return _scoped(project_choices(), scope, client_id)
+    raise ValueError(f"Unknown choice source {source!r}")
+
+
+def client_for_project(project_id: int) -> int | None:
+    for pk, _, client_id in project_choices():
+        if pk == project_id:
+            return client_id
+    return None
+
+
+def search_choices(
+    source: str,
+    scope: AccessScope,
+    term: str = "",
+    client_id: int | None = None,
+    limit: int = AUTOCOMPLETE_LIMIT,
+) -> list[dict]:
+    term = term.strip().lower()
+    results = []
+    for pk, label in choices_for(source, scope, client_id):
+        if term in label.lower():
+            results.append({"id": pk, "text": label})
+            if len(results) >= limit:
+                break
+    return results
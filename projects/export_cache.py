@@ -0,0 +1,101 @@
+"""On-disk cache for generated job exports.
+
+Entries are keyed on the requesting user's access scope, their finance flag and
+the export parameters, and are only valid for the current data generation.
+Job, Milestone, Project, Client and User writes bump the generation (see
+``projects/signals.py``), so any write invalidates every cached export.
+
+The directory must not be served: keys are HMACs under ``SECRET_KEY`` so
+file names can't be derived from the (guessable) parameters, but a cached
+workbook holds whatever the requesting user was allowed to see.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+
+from accounts.models import User
+
+from .models import SystemCounter
+from .services import access_scope
+
+
+def cache_dir() -> Path:
+    return Path(settings.EXPORT_CACHE_DIR)
+
+
+def bump_export_generation() -> None:
+    """Invalidate cached exports once the current transaction commits."""
+    transaction.on_commit(
+        lambda: SystemCounter.increment(SystemCounter.EXPORT_GENERATION)
+    )
+
+
+def export_cache_key(user: User, export_format: str, parameters: dict) -> str:
+    scope = access_scope(user)
+    payload = json.dumps(
+        {
+            "scope": "all" if scope.unrestricted else sorted(scope.client_ids),
+            "finance": user.can_view_finance,
+            "format": export_format,
+            "parameters": parameters,
+        },
+        sort_keys=True,
+    )
+    return salted_hmac(__name__, payload, algorithm="sha256").hexdigest()
+
+
+def _prune(directory: Path, generation: int) -> None:
+    for path in directory.iterdir():
+        prefix = path.name.split("-", 1)[0]
+        if prefix.isdigit() and int(prefix) < generation:
+            path.unlink(missing_ok=True)
+
+
+def fetch_or_build(
+    user: User,
+    export_format: str,
+    parameters: dict,
+    build: Callable[[IO[bytes]], object],
+) -> tuple[IO[bytes], bool]:
+    """Return ``(file, hit)`` for the export, calling ``build`` on a miss.
+
+    The file is opened here, so a concurrent prune can't remove it between
+    the lookup and the read; the caller closes it.  The generation is read
+    before building, so a write that lands while the file is being built
+    leaves it keyed to the old generation.
+    """
+    generation = SystemCounter.current(SystemCounter.EXPORT_GENERATION)
+    key = export_cache_key(user, export_format, parameters)
+    directory = cache_dir()
+    path = directory / f"{generation}-{key}.{export_format}"
+    try:
+        cached = open(path, "rb")
+    except FileNotFoundError:
+        pass
+    else:
+        SystemCounter.increment(SystemCounter.EXPORT_CACHE_HITS)
+        return cached, True
+
+    SystemCounter.increment(SystemCounter.EXPORT_CACHE_MISSES)
+    directory.mkdir(parents=True, exist_ok=True)
+    handle, partial = tempfile.mkstemp(dir=directory, suffix=".partial")
+    output = os.fdopen(handle, "w+b")
+    try:
+        build(output)
+        output.flush()
+        output.seek(0)
+        os.replace(partial, path)
+    except BaseException:
+        output.close()
+        Path(partial).unlink(missing_ok=True)
+        raise
+    _prune(directory, generation)
+    return output, False
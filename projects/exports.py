@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import csv
+import logging
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import IO, Any, Callable, Iterable, Iterator
+
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q, QuerySet
+from django.utils import timezone
+from openpyxl import Workbook
+
+from accounts.models import User
+
+from .models import ExportJob, Job, JobAttachment, JobNote, Milestone
+from .services import job_milestones_prefetched
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+)
+EXPORT_CHUNK_SIZE = 2000
+# Rows are grouped into chunks so streaming responses don't yield tiny writes.
+STREAM_BATCH_ROWS = 500
+# Background exports record progress every this many rows.
+PROGRESS_EVERY_ROWS = 1000
+# Delta watermarks trail the query start so rows saved by transactions that
+# were still open when the export began are picked up by the next run.
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def _full_name(user: User | None) -> str:
+    return user.get_full_name() if user else ""
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    key: str
+    header: str
+    getter: Callable[[Job, Milestone], Any]
+    # Model paths the column reads; only these are fetched from the database.
+    job_fields: tuple[str, ...] = ()
+    milestone_fields: tuple[str, ...] = ()
+    finance: bool = False
+
+
+_NAME_FIELDS = ("first_name", "last_name")
+
+EXPORT_COLUMNS: list[ExportColumn] = [
+    ExportColumn(
+        "project",
+        "Project",
+        lambda job, milestone: job.project.reference,
+        job_fields=("project__reference",),
+    ),
+    ExportColumn(
+        "job", "Job", lambda job, milestone: job.reference, job_fields=("reference",)
+    ),
+    ExportColumn(
+        "job_title",
+        "Job Title",
+        lambda job, milestone: job.title,
+        job_fields=("title",),
+    ),
+    ExportColumn(
+        "job_status",
+        "Job Status",
+        lambda job, milestone: job.get_status_display(),
+        job_fields=("status",),
+    ),
+    ExportColumn(
+        "stage",
+        "Stage",
+        lambda job, milestone: milestone.get_stage_display(),
+        milestone_fields=("stage",),
+    ),
+    ExportColumn(
+        "planned_date",
+        "Planned Date",
+        lambda job, milestone: milestone.planned_date,
+        milestone_fields=("planned_date",),
+    ),
+    ExportColumn(
+        "actual_date",
+        "Actual Date",
+        lambda job, milestone: milestone.actual_date,
+        milestone_fields=("actual_date",),
+    ),
+    ExportColumn(
+        "owner",
+        "Owner",
+        lambda job, milestone: _full_name(job.owner),
+        job_fields=tuple(f"owner__{name}" for name in _NAME_FIELDS),
+    ),
+    ExportColumn(
+        "design_manager",
+        "Design Manager",
+        lambda job, milestone: _full_name(job.design_manager),
+        job_fields=tuple(f"design_manager__{name}" for name in _NAME_FIELDS),
+    ),
+    ExportColumn(
+        "client",
+        "Client",
+        lambda job, milestone: job.project.client.name,
+        job_fields=("project__client__name",),
+    ),
+    ExportColumn(
+        "client_contact",
+        "Client Contact",
+        lambda job, milestone: _full_name(job.client_contact),
+        job_fields=tuple(f"client_contact__{name}" for name in _NAME_FIELDS),
+    ),
+    ExportColumn(
+        "forecast_revenue",
+        "Forecast Revenue",
+        lambda job, milestone: job.forecast_revenue,
+        job_fields=("forecast_revenue",),
+    ),
+    ExportColumn(
+        "actual_revenue",
+        "Actual Revenue",
+        lambda job, milestone: job.actual_revenue,
+        job_fields=("actual_revenue",),
+        finance=True,
+    ),
+]
+EXPORT_COLUMN_CHOICES = [(column.key, column.header) for column in EXPORT_COLUMNS]
+
+
+def export_columns(keys: Iterable[str] | None = None) -> list[ExportColumn]:
+    """Return the requested columns in their canonical order (all by default)."""
+    if not keys:
+        return list(EXPORT_COLUMNS)
+    keys = set(keys)
+    return [column for column in EXPORT_COLUMNS if column.key in keys]
+
+
+def export_headers(columns: Iterable[ExportColumn] | None = None) -> list[str]:
+    return [column.header for column in (columns or EXPORT_COLUMNS)]
+
+
+def _milestone_window(filters: dict) -> Q:
+    window = Q()
+    for field in ("planned", "actual"):
+        start, end = filters.get(f"{field}_from"), filters.get(f"{field}_to")
+        if start:
+            window &= Q(**{f"{field}_date__gte": start})
+        if end:
+            window &= Q(**{f"{field}_date__lte": end})
+    return window
+
+
+def changed_job_ids(since: datetime | str) -> QuerySet:
+    """IDs of jobs whose row, milestones, notes or attachments changed after
+    ``since``; each branch is a range scan on an ``updated_at`` index."""
+    branches = [
+        model.objects.filter(updated_at__gt=since).order_by().values(column)
+        for model, column in (
+            (Milestone, "job_id"),
+            (JobNote, "job_id"),
+            (JobAttachment, "job_id"),
+        )
+    ]
+    return (
+        Job.objects.filter(updated_at__gt=since)
+        .order_by()
+        .values("id")
+        .union(*branches)
+    )
+
+
+def next_watermark() -> str:
+    """The ``since`` value to pass to the next delta export; take it before
+    running the export query.  UTC with a ``Z`` suffix keeps it URL-safe."""
+    watermark = timezone.now() - WATERMARK_OVERLAP
+    return watermark.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def export_jobs_queryset(
+    user: User,
+    columns: Iterable[ExportColumn] | None = None,
+    filters: dict | None = None,
+) -> QuerySet[Job]:
+    """Scoped, filtered job queryset that fetches only what ``columns`` read.
+
+    ``filters`` accepts the cleaned data of ``JobExportFilterForm``: ``client``,
+    ``project``, ``status`` and ``planned_from``/``planned_to``/``actual_from``/
+    ``actual_to`` milestone date windows, and ``since`` for delta exports.  A
+    date window limits both the jobs and the milestone rows exported for them.
+    """
+    columns = list(columns or EXPORT_COLUMNS)
+    filters = filters or {}
+    if not user.can_view_finance:
+        columns = [column for column in columns if not column.finance]
+
+    window = _milestone_window(filters)
+    milestone_fields = {"job"}
+    for column in columns:
+        milestone_fields.update(column.milestone_fields)
+    milestones = (
+        Milestone.objects.filter(window)
+        .only(*milestone_fields)
+        .order_by("planned_date")
+    )
+
+    job_fields = {"id"}
+    relations = set()
+    for column in columns:
+        job_fields.update(column.job_fields)
+        relations.update(
+            path.rsplit("__", 1)[0] for path in column.job_fields if "__" in path
+        )
+    jobs = (
+        job_milestones_prefetched(user, milestones=milestones)
+        .select_related(None)
+        .select_related(*relations)
+        .only(*job_fields)
+    )
+
+    if filters.get("client"):
+        jobs = jobs.filter(project__client=filters["client"])
+    if filters.get("project"):
+        jobs = jobs.filter(project=filters["project"])
+    if filters.get("status"):
+        jobs = jobs.filter(status__in=filters["status"])
+    if window:
+        jobs = jobs.filter(
+            Exists(Milestone.objects.filter(window, job=OuterRef("pk")))
+        )
+    if filters.get("since"):
+        jobs = jobs.filter(pk__in=changed_job_ids(filters["since"]))
+    return jobs
+
+
+def iter_export_rows(
+    jobs: Iterable[Job],
+    user: User,
+    columns: Iterable[ExportColumn] | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[list[Any]]:
+    """Yield one row per milestone, hiding finance columns the user may not see.
+
+    ``jobs`` should prefetch milestones (see ``export_jobs_queryset``); it is
+    consumed with ``iterator(chunk_size=...)`` so only one chunk of jobs is
+    held in memory at a time.
+    """
+    getters = [
+        (lambda job, milestone: None)
+        if column.finance and not user.can_view_finance
+        else column.getter
+        for column in (columns or EXPORT_COLUMNS)
+    ]
+    if hasattr(jobs, "iterator"):
+        jobs = jobs.iterator(chunk_size=chunk_size)
+    for job in jobs:
+        for milestone in job.milestones.all():
+            yield [getter(job, milestone) for getter in getters]
+
+
+def write_xlsx(
+    handle: IO[bytes], headers: list[str], rows: Iterable[list[Any]]
+) -> int:
+    """Write rows to ``handle`` as a single-sheet workbook; return the row count.
+
+    openpyxl's write-only mode spools each row to a temporary file instead of
+    keeping a cell object per value, so memory stays flat regardless of size.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Jobs")
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(handle)
+    return count
+
+
+class _Echo:
+    """File-like object whose write() hands the value back to the caller."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _batched(lines: Iterable[str]) -> Iterator[str]:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= STREAM_BATCH_ROWS:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def stream_csv(headers: list[str], rows: Iterable[list[Any]]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    yield from _batched(writer.writerow(row) for row in rows)
+
+
+def stream_jsonl(headers: list[str], rows: Iterable[list[Any]]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder()
+    yield from _batched(
+        encoder.encode(dict(zip(headers, row))) + "\n" for row in rows
+    )
+
+
+# format -> (content type, streaming writer); xlsx is built as a file instead.
+STREAMING_FORMATS: dict[str, tuple[str, Callable[..., Iterator[str]]]] = {
+    "csv": ("text/csv", stream_csv),
+    "jsonl": ("application/x-ndjson", stream_jsonl),
+}
+EXPORT_FORMATS = ["xlsx", *STREAMING_FORMATS]
+
+
+def _report_progress(
+    rows: Iterable[list[Any]], export: ExportJob
+) -> Iterator[list[Any]]:
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % PROGRESS_EVERY_ROWS == 0:
+            ExportJob.objects.filter(pk=export.pk).update(rows_processed=count)
+    export.rows_processed = count
+
+
+def run_export_job(export_id: int) -> None:
+    """Build the file for an ExportJob and store it under MEDIA_ROOT.
+
+    ``ExportJob.parameters`` holds ``JobExportFilterForm.export_parameters()``.
+    """
+    try:
+        export = ExportJob.objects.select_related("requested_by").get(pk=export_id)
+    except ExportJob.DoesNotExist:
+        # Deleted (e.g. by cleanup_exports) before the worker picked it up.
+        logger.warning("Export %s no longer exists", export_id)
+        return
+    user = export.requested_by
+    ExportJob.objects.filter(pk=export.pk).update(
+        status=ExportJob.Status.RUNNING, started_at=timezone.now()
+    )
+    try:
+        # Full exports get one too, as the starting point for delta runs.
+        export.parameters["watermark"] = next_watermark()
+        columns = export_columns(export.parameters.get("columns"))
+        jobs = export_jobs_queryset(user, columns, export.parameters)
+        rows = _report_progress(iter_export_rows(jobs, user, columns), export)
+        headers = export_headers(columns)
+        with tempfile.TemporaryFile() as handle:
+            if export.export_format in STREAMING_FORMATS:
+                _, stream = STREAMING_FORMATS[export.export_format]
+                for chunk in stream(headers, rows):
+                    handle.write(chunk.encode("utf-8"))
+            else:
+                write_xlsx(handle, headers, rows)
+            handle.seek(0)
+            filename = f"ddps_jobs_{date.today().isoformat()}.{export.export_format}"
+            export.file.save(filename, File(handle), save=False)
+    except Exception as exc:
+        logger.exception("Export %s failed", export.pk)
+        export.status = ExportJob.Status.FAILED
+        export.error = str(exc)
+    else:
+        export.status = ExportJob.Status.COMPLETE
+    export.finished_at = timezone.now()
+    export.save(
+        update_fields=[
+            "status",
+            "error",
+            "file",
+            "rows_processed",
+            "parameters",
+            "finished_at",
+            "updated_at",
+        ]
+    )
+
+
+def fail_stale_exports(older_than: timedelta) -> int:
+    """Mark exports still pending or running after ``older_than`` as failed.
+
+    Tasks run in the web process, so a restart loses whatever was queued or
+    in progress; without this those exports would be polled forever.
+    """
+    cutoff = timezone.now() - older_than
+    return (
+        ExportJob.objects.filter(
+            status__in=[ExportJob.Status.PENDING, ExportJob.Status.RUNNING]
+        )
+        .filter(
+            Q(started_at__lt=cutoff) | Q(started_at__isnull=True, created_at__lt=cutoff)
+        )
+        .update(
+            status=ExportJob.Status.FAILED,
+            error="The export was interrupted; please request it again.",
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    )
+
+
+def delete_expired_exports(older_than: timedelta) -> int:
+    """Delete finished exports, and their files, older than ``older_than``."""
+    cutoff = timezone.now() - older_than
+    expired = ExportJob.objects.filter(
+        status__in=[ExportJob.Status.COMPLETE, ExportJob.Status.FAILED],
+        finished_at__lt=cutoff,
+    )
+    deleted = 0
+    for export in expired.only("pk", "file").iterator():
+        if export.file:
+            export.file.delete(save=False)
+        deleted += 1
+    expired.delete()
+    return deleted
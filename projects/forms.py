@@ -1,7 +1,66 @@
 from django import forms
-from django.forms import inlineformset_factory
+from django.core.exceptions import ValidationError
+from django.forms import BaseInlineFormSet, inlineformset_factory
+from django.urls import reverse
+from django.utils.functional import cached_property
 
-from .models import Job, Milestone, Project, JobNote, JobAttachment
+from .choices import choices_for
+from .exports import EXPORT_COLUMN_CHOICES, EXPORT_FORMATS
+from .models import Client, Job, Milestone, Project, JobNote, JobAttachment
+from .services import (
+    access_scope,
+    client_contacts_for_user,
+    clients_for_user,
+    internal_users,
+    jobs_for_user,
+    projects_for_user,
+)
+
+
+class AutocompleteSelect(forms.Select):
+    """Select that renders only its selected option.
+
+    Other options are fetched from the ``job-autocomplete`` endpoint by
+    ``static/js/autocomplete.js``; the selected label comes from the cached
+    choice lists in ``projects/choices.py``.  ``forward`` names a sibling
+    field whose value is sent along to narrow the results.
+    """
+
+    def __init__(self, source: str, forward: str | None = None, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+        self.forward = forward
+        self.scope = None
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete-url"] = reverse("job-autocomplete", args=[self.source])
+        if self.forward:
+            attrs["data-autocomplete-forward"] = self.forward
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        selected = {str(item) for item in value if item not in (None, "")}
+        labels = {}
+        if selected and self.scope is not None:
+            labels = {
+                str(pk): label
+                for pk, label in choices_for(self.source, self.scope)
+                if str(pk) in selected
+            }
+        missing = selected - labels.keys()
+        if missing and hasattr(self.choices, "queryset"):
+            model = self.choices.queryset.model
+            for obj in model._default_manager.filter(pk__in=missing):
+                labels[str(obj.pk)] = str(obj)
+        choices, self.choices = self.choices, [
+            ("", "---------"),
+            *((pk, labels.get(pk, pk)) for pk in sorted(selected)),
+        ]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
 
 
 class ProjectForm(forms.ModelForm):
@@ -46,8 +105,26 @@ class JobForm(forms.ModelForm):
             "anticipated_completion": forms.DateInput(attrs={"type": "date"}),
             "actual_completion": forms.DateInput(attrs={"type": "date"}),
             "notes": forms.Textarea(attrs={"rows": 3}),
+            "project": AutocompleteSelect("project"),
+            "owner": AutocompleteSelect("owner"),
+            "design_manager": AutocompleteSelect("design_manager"),
+            "client_contact": AutocompleteSelect("client_contact", forward="project"),
         }
 
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["project"].queryset = projects_for_user(user)
+        staff = internal_users()
+        self.fields["owner"].queryset = staff
+        self.fields["design_manager"].queryset = staff
+        self.fields["client_contact"].queryset = client_contacts_for_user(user)
+        scope = access_scope(user)
+        for name in ("project", "owner", "design_manager", "client_contact"):
+            self.fields[name].widget.scope = scope
+        if not user.can_view_finance:
+            self.fields["actual_revenue"].widget = forms.HiddenInput()
+            self.fields["actual_revenue"].required = False
+
     def clean(self):
         cleaned = super().clean()
         project = cleaned.get("project")
@@ -83,16 +160,144 @@ class JobAttachmentForm(forms.ModelForm):
         }
 
 
+class LoadedModelChoiceField(forms.ModelChoiceField):
+    """A ``ModelChoiceField`` that picks from objects already loaded."""
+
+    def __init__(self, objects: dict, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[self.queryset.model._meta.pk.to_python(value)]
+        except (KeyError, ValidationError):
+            raise ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice"
+            )
+
+
+class BaseMilestoneFormSet(BaseInlineFormSet):
+    @cached_property
+    def _milestones_by_pk(self) -> dict:
+        return {milestone.pk: milestone for milestone in self.get_queryset()}
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Each row's hidden id would otherwise be looked up with its own query;
+        # the formset has already loaded the job's milestones.
+        name = self.model._meta.pk.name
+        field = form.fields[name]
+        form.fields[name] = LoadedModelChoiceField(
+            self._milestones_by_pk,
+            queryset=field.queryset,
+            initial=field.initial,
+            required=False,
+            widget=field.widget,
+        )
+
+
+# Each row edits the dates of an existing milestone; its stage is fixed.  Leaving
+# ``stage`` out also skips the per-row (job, stage) unique check, one query each.
 MilestoneFormSet = inlineformset_factory(
     parent_model=Job,
     model=Milestone,
-    fields=["stage", "planned_date", "actual_date", "notes"],
+    formset=BaseMilestoneFormSet,
+    fields=["planned_date", "actual_date", "notes"],
     extra=0,
     can_delete=False,
     widgets={
         "planned_date": forms.DateInput(attrs={"type": "date"}),
         "actual_date": forms.DateInput(attrs={"type": "date"}),
-        "stage": forms.HiddenInput(),
         "notes": forms.TextInput(),
     },
 )
+
+
+class JobExportFilterForm(forms.Form):
+    format = forms.ChoiceField(
+        choices=[(value, value) for value in EXPORT_FORMATS], required=False
+    )
+    client = forms.ModelChoiceField(queryset=Client.objects.none(), required=False)
+    project = forms.ModelChoiceField(queryset=Project.objects.none(), required=False)
+    status = forms.MultipleChoiceField(choices=Job.Status.choices, required=False)
+    planned_from = forms.DateField(required=False)
+    planned_to = forms.DateField(required=False)
+    actual_from = forms.DateField(required=False)
+    actual_to = forms.DateField(required=False)
+    since = forms.DateTimeField(
+        required=False, help_text="Only export jobs changed after this time."
+    )
+    columns = forms.MultipleChoiceField(choices=EXPORT_COLUMN_CHOICES, required=False)
+
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["client"].queryset = clients_for_user(user)
+        self.fields["project"].queryset = projects_for_user(user)
+
+    def clean(self):
+        cleaned = super().clean()
+        for prefix in ("planned", "actual"):
+            start = cleaned.get(f"{prefix}_from")
+            end = cleaned.get(f"{prefix}_to")
+            if start and end and start > end:
+                self.add_error(
+                    f"{prefix}_to", "End date must be on or after the start date."
+                )
+        return cleaned
+
+    def export_parameters(self) -> dict:
+        """JSON-safe filters, as stored on ExportJob.parameters."""
+        data = self.cleaned_data
+        parameters = {
+            "client": data["client"].pk if data.get("client") else None,
+            "project": data["project"].pk if data.get("project") else None,
+            "status": data.get("status") or [],
+            "columns": data.get("columns") or [],
+        }
+        for name in ("planned_from", "planned_to", "actual_from", "actual_to"):
+            parameters[name] = data[name].isoformat() if data.get(name) else None
+        parameters["since"] = data["since"].isoformat() if data.get("since") else None
+        return parameters
+
+
+class JobImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV or Excel (.xlsx) with a header row: project, reference, "
+        "title and optionally the other job fields.  People are matched by "
+        "username and projects by reference."
+    )
+    dry_run = forms.BooleanField(
+        required=False, help_text="Validate the file without creating any jobs."
+    )
+
+
+class JobBulkStatusForm(forms.Form):
+    jobs = forms.ModelMultipleChoiceField(queryset=Job.objects.none())
+    status = forms.ChoiceField(choices=Job.Status.choices)
+
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["jobs"].queryset = jobs_for_user(user)
+
+
+class ProjectRescheduleForm(forms.Form):
+    days = forms.IntegerField(
+        help_text="Days to move planned milestone dates by; negative moves them "
+        "earlier."
+    )
+    stages = forms.MultipleChoiceField(
+        choices=Milestone.Stage.choices,
+        required=False,
+        help_text="Leave empty to move every stage.",
+    )
+    future_only = forms.BooleanField(
+        required=False, help_text="Only move milestones planned from today onwards."
+    )
+
+    def clean_days(self):
+        days = self.cleaned_data["days"]
+        if days == 0:
+            raise forms.ValidationError("Enter a non-zero number of days.")
+        return days
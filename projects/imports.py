@@ -0,0 +1,263 @@
+"""Bulk job import from CSV or XLSX files.
+
+Rows are read one at a time (``csv`` or openpyxl read-only mode), cleaned
+with the same form fields as ``JobForm`` and checked against the same rules:
+the project, owner, design manager and client contact must be in the
+importing user's choices, the contact must be assigned to the project's
+client, and ``(project, reference)`` must be unique.  Lookups are loaded once
+per import (or once per chunk for existing references) instead of per row.
+Valid rows are inserted ``chunk_size`` at a time with ``bulk_create_jobs``;
+invalid rows are reported with their row number and errors.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from openpyxl import load_workbook
+
+from accounts.models import User
+
+from .forms import JobForm
+from .models import ClientAccess, Job
+from .services import (
+    access_scope,
+    bulk_create_jobs,
+    client_contacts_for_user,
+    internal_users,
+    projects_for_user,
+)
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_FORMATS = ("csv", "xlsx")
+REQUIRED_COLUMNS = {"project", "reference", "title"}
+# Lookup columns hold a project reference or a username.
+LOOKUP_COLUMNS = {"project", "owner", "design_manager", "client_contact"}
+VALUE_COLUMNS = [
+    name for name in JobForm.Meta.fields if name not in LOOKUP_COLUMNS
+]
+IMPORT_COLUMNS = [*LOOKUP_COLUMNS, *VALUE_COLUMNS]
+# Blank cells in these columns fall back to the model default.
+DEFAULTED_COLUMNS = {"status", "forecast_revenue", "actual_revenue"}
+
+
+class ImportFileError(Exception):
+    """The file can't be imported at all (unknown format, missing columns)."""
+
+
+@dataclass
+class RowError:
+    row: int
+    errors: dict[str, list[str]]
+
+    def as_text(self) -> str:
+        return "; ".join(
+            f"{name}: {' '.join(messages)}" for name, messages in self.errors.items()
+        )
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    rows: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    dry_run: bool = False
+
+
+def _normalise_header(value: Any) -> str:
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _csv_rows(handle: IO[bytes]) -> Iterator[list[Any]]:
+    yield from csv.reader(io.TextIOWrapper(handle, encoding="utf-8-sig", newline=""))
+
+
+def _xlsx_rows(handle: IO[bytes]) -> Iterator[tuple[Any, ...]]:
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def import_format(filename: str) -> str:
+    suffix = Path(filename).suffix.lower().lstrip(".")
+    if suffix not in IMPORT_FORMATS:
+        raise ImportFileError(
+            f"Unsupported file type '{suffix or filename}'; use .csv or .xlsx."
+        )
+    return suffix
+
+
+def iter_import_rows(
+    handle: IO[bytes], file_format: str
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield ``(row number, {column: value})`` for each non-blank data row."""
+    rows = _csv_rows(handle) if file_format == "csv" else _xlsx_rows(handle)
+    try:
+        header = [_normalise_header(value) for value in next(rows)]
+    except StopIteration:
+        raise ImportFileError("The file is empty.")
+    missing = REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(sorted(missing))}.")
+    columns = [
+        (index, name) for index, name in enumerate(header) if name in IMPORT_COLUMNS
+    ]
+    for number, values in enumerate(rows, start=2):
+        row = {
+            name: values[index] if index < len(values) else None
+            for index, name in columns
+        }
+        if all(value in (None, "") for value in row.values()):
+            continue
+        yield number, row
+
+
+class JobImporter:
+    """Validates rows for one user and inserts the valid ones in chunks."""
+
+    def __init__(self, user: User, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.fields = JobForm.base_fields
+        self.projects: dict[str, int] = {}
+        self.project_clients: dict[int, int] = {}
+        for pk, reference, client_id in projects_for_user(user).values_list(
+            "id", "reference", "client_id"
+        ):
+            self.projects[reference] = pk
+            self.project_clients[pk] = client_id
+        self.staff = dict(internal_users().values_list("username", "id"))
+        self.contacts = dict(
+            client_contacts_for_user(user).values_list("username", "id")
+        )
+        assignments = access_scope(user).filter(
+            ClientAccess.objects.all(), "client_id"
+        )
+        self.assignments = set(assignments.values_list("user_id", "client_id"))
+        self.seen: set[tuple[int, str]] = set()
+
+    def _lookup(self, name: str, value: Any, errors: dict) -> int | None:
+        value = str(value).strip() if value is not None else ""
+        if not value:
+            if name == "project":
+                errors[name] = ["This field is required."]
+            return None
+        table = {
+            "project": self.projects,
+            "owner": self.staff,
+            "design_manager": self.staff,
+            "client_contact": self.contacts,
+        }[name]
+        pk = table.get(value)
+        if pk is None:
+            errors[name] = [f"'{value}' is not one of the available choices."]
+        return pk
+
+    def clean_row(self, row: dict[str, Any]) -> tuple[dict[str, Any], dict]:
+        errors: dict[str, list[str]] = {}
+        data: dict[str, Any] = {}
+        for name in VALUE_COLUMNS:
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in (None, "") and name in DEFAULTED_COLUMNS:
+                value = Job._meta.get_field(name).get_default()
+            if name == "actual_revenue" and not self.user.can_view_finance:
+                if row.get(name) not in (None, ""):
+                    errors[name] = ["You may not set actual revenue."]
+                continue
+            try:
+                data[name] = self.fields[name].clean(
+                    "" if value is None else value
+                )
+                # JobForm also runs the model field validators in _post_clean.
+                if data[name] not in (None, ""):
+                    Job._meta.get_field(name).run_validators(data[name])
+            except ValidationError as exc:
+                errors[name] = exc.messages
+        for name in LOOKUP_COLUMNS:
+            data[f"{name}_id"] = self._lookup(name, row.get(name), errors)
+
+        project_id = data.get("project_id")
+        contact_id = data.get("client_contact_id")
+        if project_id and contact_id:
+            client_id = self.project_clients[project_id]
+            if (contact_id, client_id) not in self.assignments:
+                errors["client_contact"] = [
+                    "Selected contact is not assigned to this client."
+                ]
+        return data, errors
+
+    def _existing_references(self, keys: set[tuple[int, str]]) -> set:
+        if not keys:
+            return set()
+        by_project = defaultdict(list)
+        for project_id, reference in keys:
+            by_project[project_id].append(reference)
+        query = Q()
+        for project_id, references in by_project.items():
+            query |= Q(project_id=project_id, reference__in=references)
+        return set(Job.objects.filter(query).values_list("project_id", "reference"))
+
+    def _process_chunk(
+        self, chunk: list[tuple[int, dict]], result: ImportResult
+    ) -> None:
+        cleaned = []
+        for number, row in chunk:
+            data, errors = self.clean_row(row)
+            cleaned.append((number, data, errors))
+        keys = {
+            (data["project_id"], data["reference"])
+            for _, data, errors in cleaned
+            if not errors
+        }
+        existing = self._existing_references(keys)
+        jobs = []
+        for number, data, errors in cleaned:
+            key = (data.get("project_id"), data.get("reference"))
+            if not errors and (key in existing or key in self.seen):
+                errors["reference"] = [
+                    "A job with this reference already exists for the project."
+                ]
+            if errors:
+                result.errors.append(RowError(number, errors))
+                continue
+            self.seen.add(key)
+            jobs.append(Job(**data))
+        if jobs and not result.dry_run:
+            bulk_create_jobs(jobs)
+            result.created += len(jobs)
+
+    def run(
+        self, rows: Iterable[tuple[int, dict[str, Any]]], dry_run: bool = False
+    ) -> ImportResult:
+        result = ImportResult(dry_run=dry_run)
+        chunk = []
+        for item in rows:
+            chunk.append(item)
+            result.rows += 1
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(chunk, result)
+                chunk = []
+        if chunk:
+            self._process_chunk(chunk, result)
+        return result
+
+
+def import_jobs(
+    handle: IO[bytes],
+    filename: str,
+    user: User,
+    dry_run: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> ImportResult:
+    rows = iter_import_rows(handle, import_format(filename))
+    return JobImporter(user, chunk_size=chunk_size).run(rows, dry_run=dry_run)
@@ -0,0 +1,161 @@
+"""Query instrumentation shared by the diagnostic commands.
+
+``QueryRecorder`` hooks ``connection.execute_wrapper`` to time every statement
+run on a connection.  Unlike ``CaptureQueriesContext`` it doesn't need
+``DEBUG`` or a debug cursor, so it measures the same code path production
+runs.  ``normalize_sql`` reduces a statement to its shape (literals and
+``IN`` lists replaced) so ``group_queries`` can spot the same query being run
+over and over with different parameters, and ``query_origin`` says which line
+of project code and which template line ran a statement.
+"""
+from __future__ import annotations
+
+import re
+import time
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    params: Any
+    duration: float
+    many: bool = False
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN \((?:\?\s*,\s*)*\?\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """The shape of ``sql``: literals become ``?`` and ``IN`` lists ``(...)``."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+@dataclass
+class QueryGroup:
+    shape: str
+    queries: list[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    @property
+    def identical(self) -> int:
+        """Repeats of an earlier statement with the very same parameters."""
+        seen = {(query.sql, repr(query.params)) for query in self.queries}
+        return self.count - len(seen)
+
+
+def group_queries(
+    queries: Iterable[QueryRecord], min_count: int = 2
+) -> list[QueryGroup]:
+    """Queries sharing a shape at least ``min_count`` times, most frequent first."""
+    groups: dict[str, QueryGroup] = {}
+    for query in queries:
+        shape = normalize_sql(query.sql)
+        groups.setdefault(shape, QueryGroup(shape)).queries.append(query)
+    return sorted(
+        (group for group in groups.values() if group.count >= min_count),
+        key=lambda group: (-group.count, -group.total_time),
+    )
+
+
+# Modules whose frames are never a query's origin: the wrappers themselves.
+_INSTRUMENTATION_FILES = {__file__}
+
+
+def ignore_frames_from(filename: str) -> None:
+    _INSTRUMENTATION_FILES.add(filename)
+
+
+@dataclass
+class QueryOrigin:
+    frame: str | None = None
+    template: str | None = None
+
+    def __str__(self) -> str:
+        return " via ".join(part for part in (self.template, self.frame) if part) or "?"
+
+
+def query_origin() -> QueryOrigin:
+    """Where the statement being run now came from.
+
+    ``frame`` is the innermost frame of project code (``path:line in
+    function``) and ``template`` the innermost template node being rendered
+    (``name:line``), if any.
+    """
+    base = str(settings.BASE_DIR)
+    origin = QueryOrigin()
+    for frame, lineno in traceback.walk_stack(None):
+        code = frame.f_code
+        if origin.template is None and code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            token = getattr(node, "token", None)
+            template = getattr(getattr(node, "origin", None), "template_name", None)
+            if token is not None and template:
+                origin.template = f"{template}:{token.lineno}"
+        if (
+            origin.frame is None
+            and code.co_filename.startswith(base)
+            and "site-packages" not in code.co_filename
+            and code.co_filename not in _INSTRUMENTATION_FILES
+        ):
+            relative = Path(code.co_filename).relative_to(base)
+            origin.frame = f"{relative}:{lineno} in {code.co_name}"
+        if origin.frame is not None and origin.template is not None:
+            break
+    return origin
+
+
+class QueryRecorder:
+    """Context manager that records the statements run on one connection."""
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.queries: list[QueryRecord] = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                QueryRecord(sql, params, time.perf_counter() - start, many)
+            )
+
+    def __enter__(self) -> "QueryRecorder":
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._wrapper.__exit__(*exc_info)
+        self._wrapper = None
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(query.duration for query in self.queries)
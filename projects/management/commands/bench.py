@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client as TestClient
+from django.urls import URLPattern, reverse
+
+from accounts.models import User
+from projects import urls as project_urls
+from projects.choices import SOURCES
+from projects.instrumentation import QueryRecorder
+from projects.models import ClientAccess, ExportJob, Job, Milestone
+from projects.services import clients_for_user, jobs_for_user, projects_for_user
+from projects.views import JOB_PANELS
+
+ROLES = [User.Role.INTERNAL, User.Role.SIKLA, User.Role.CLIENT]
+# Extra values for URL parameters other than ``pk``.
+PARAMETER_VALUES = {"panel": list(JOB_PANELS), "source": list(SOURCES)}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def role_user(role: str) -> User | None:
+    users = User.objects.filter(role=role, is_active=True).order_by("pk")
+    if role == User.Role.CLIENT:
+        users = users.filter(pk__in=ClientAccess.objects.values("user_id"))
+    return users.first()
+
+
+def sample_pk(url_name: str, user: User) -> int | None:
+    """A primary key ``user`` can open for the ``pk`` of ``url_name``."""
+    prefix = url_name.split("-", 1)[0]
+    if prefix == "client":
+        queryset = clients_for_user(user)
+    elif prefix == "project":
+        # The busiest project is the most telling.
+        queryset = projects_for_user(user).annotate(size=Count("jobs")).order_by(
+            "-size", "pk"
+        )
+    elif prefix == "job":
+        queryset = jobs_for_user(user).order_by("pk")
+    elif prefix == "export":
+        queryset = user.export_jobs.filter(status=ExportJob.Status.COMPLETE)
+    else:
+        return None
+    return queryset.values_list("pk", flat=True).first()
+
+
+def bench_targets(user: User) -> list[tuple[str, str]]:
+    """``(label, path)`` for every GET-able URL in ``projects/urls.py``."""
+    targets = []
+    for pattern in project_urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        view_class = getattr(pattern.callback, "view_class", None)
+        if view_class is not None and not hasattr(view_class, "get"):
+            continue
+        parameters = list(pattern.pattern.converters)
+        kwargs: dict = {}
+        if "pk" in parameters:
+            kwargs["pk"] = sample_pk(pattern.name, user)
+            if kwargs["pk"] is None:
+                continue
+        variants = [(pattern.name, kwargs)]
+        for name in parameters:
+            if name == "pk":
+                continue
+            variants = [
+                (f"{label}[{value}]", {**values, name: value})
+                for label, values in variants
+                for value in PARAMETER_VALUES.get(name, [])
+            ]
+        for label, values in variants:
+            targets.append((label, reverse(pattern.name, kwargs=values)))
+    return targets
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every page in projects/urls.py as an internal, Sikla and client "
+        "user and report latency, query count, DB time and response size per "
+        "view. Compares against a saved baseline when one is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Measured requests per view and role (default: 10)",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=1,
+            help="Unmeasured requests first, to fill caches (default: 1)",
+        )
+        parser.add_argument(
+            "--role",
+            action="append",
+            choices=ROLES,
+            help="Only benchmark this role (repeatable; default: all)",
+        )
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="HTTP host header to use (default: localhost)",
+        )
+        parser.add_argument(
+            "--seed-clients",
+            type=int,
+            help="Replace the data with a synthetic portfolio of this many "
+            "clients first (see seed_demo --clients)",
+        )
+        parser.add_argument(
+            "--projects-per-client",
+            type=int,
+            default=5,
+            help="With --seed-clients (default: 5)",
+        )
+        parser.add_argument(
+            "--jobs-per-project",
+            type=int,
+            default=20,
+            help="With --seed-clients (default: 20)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="With --seed-clients (default: 0)"
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument(
+            "--baseline", help="Fail if results regress against this JSON file"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed fractional increase in p95 latency or query count "
+            "over the baseline (default: 0.2)",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=5.0,
+            help="Ignore p95 increases smaller than this many ms (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed_clients"] is not None:
+            call_command(
+                "seed_demo",
+                clients=options["seed_clients"],
+                projects_per_client=options["projects_per_client"],
+                jobs_per_project=options["jobs_per_project"],
+                seed=options["seed"],
+                stdout=self.stdout,
+            )
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        # Views a role may not open answer 404; don't log each one.
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            results = self._run(options)
+        finally:
+            request_logger.setLevel(level)
+
+        report = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "repeat": options["repeat"],
+            "data": {
+                "jobs": Job.objects.count(),
+                "milestones": Milestone.objects.count(),
+            },
+            "results": results,
+        }
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Wrote {options['output']}")
+        if options["baseline"]:
+            self._compare(results, options)
+
+    def _run(self, options) -> list[dict]:
+        results = []
+        for role in options["role"] or ROLES:
+            user = role_user(role)
+            if user is None:
+                self.stdout.write(self.style.WARNING(f"No {role} user; skipped."))
+                continue
+            client = TestClient(HTTP_HOST=options["host"])
+            client.force_login(user)
+            self.stdout.write(f"{role}: {user.username}")
+            for label, path in bench_targets(user):
+                result = self._measure(
+                    client, path, options["warmup"], options["repeat"]
+                )
+                result.update(role=role, name=label, path=path)
+                results.append(result)
+                self.stdout.write(
+                    f"  {label:<36} {result['status']:>3} "
+                    f"p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+                    f"{result['queries']:>4} queries  {result['db_ms']:7.1f}ms db  "
+                    f"{result['bytes']:>9} B"
+                )
+        return results
+
+    def _measure(self, client: TestClient, path: str, warmup: int, repeat: int):
+        for _ in range(warmup):
+            self._fetch(client, path)
+        timings, queries, db_times, sizes, statuses = [], [], [], [], set()
+        for _ in range(repeat):
+            with QueryRecorder() as recorder:
+                start = time.perf_counter()
+                status, size = self._fetch(client, path)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(recorder.count)
+            db_times.append(recorder.total_time * 1000)
+            sizes.append(size)
+            statuses.add(status)
+        return {
+            "status": max(statuses),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "queries": int(statistics.median(queries)),
+            "db_ms": round(statistics.median(db_times), 2),
+            "bytes": int(statistics.median(sizes)),
+        }
+
+    @staticmethod
+    def _fetch(client: TestClient, path: str) -> tuple[int, int]:
+        response = client.get(path)
+        try:
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+        finally:
+            response.close()
+        return response.status_code, size
+
+    def _compare(self, results: list[dict], options) -> None:
+        baseline = json.loads(Path(options["baseline"]).read_text())
+        previous = {
+            (entry["role"], entry["name"]): entry for entry in baseline["results"]
+        }
+        limit = 1 + options["threshold"]
+        regressions = []
+        for entry in results:
+            base = previous.get((entry["role"], entry["name"]))
+            if base is None:
+                continue
+            key = f"{entry['role']} {entry['name']}"
+            if (
+                entry["p95_ms"] > base["p95_ms"] * limit
+                and entry["p95_ms"] - base["p95_ms"] >= options["min_delta_ms"]
+            ):
+                regressions.append(
+                    f"{key}: p95 {base['p95_ms']}ms -> {entry['p95_ms']}ms"
+                )
+            if entry["queries"] > base["queries"] * limit:
+                regressions.append(
+                    f"{key}: queries {base['queries']} -> {entry['queries']}"
+                )
+        if regressions:
+            raise CommandError(
+                "Regressed against the baseline:\n  " + "\n  ".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import importlib
+import io
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from accounts.models import User
+from projects.exports import EXPORT_COLUMNS
+from projects.services import job_milestones_prefetched
+from projects.views import JobExcelExportView
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _legacy_pandas_export(user: User):
+    """The pre-streaming implementation: list of dicts -> DataFrame -> BytesIO."""
+    import pandas as pd
+
+    rows = []
+    for job in job_milestones_prefetched(user):
+        for milestone in job.milestones.all():
+            rows.append(
+                {
+                    column.header: (
+                        None
+                        if column.finance and not user.can_view_finance
+                        else column.getter(job, milestone)
+                    )
+                    for column in EXPORT_COLUMNS
+                }
+            )
+    frame = pd.DataFrame(rows)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        frame.to_excel(writer, index=False, sheet_name="Jobs")
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(8192), b"")
+
+
+def _streaming_export(user: User):
+    request = RequestFactory().get("/exports/jobs/")
+    request.user = user
+    response = JobExcelExportView.as_view(use_cache=False)(request)
+    try:
+        yield from response.streaming_content
+    finally:
+        response.close()
+
+
+VARIANTS = {
+    "legacy": _legacy_pandas_export,
+    "streaming": _streaming_export,
+}
+# Imported before timing starts; the old view imported pandas at module load.
+VARIANT_IMPORTS = {"legacy": "pandas"}
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak memory and time-to-first-byte of the pandas job export "
+        "against the streaming openpyxl export, each in a fresh process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username",
+            default="admin",
+            help="User whose export scope is benchmarked (default: admin)",
+        )
+        parser.add_argument(
+            "--variant",
+            choices=sorted(VARIANTS),
+            help="Run a single variant in this process and print JSON (internal)",
+        )
+
+    def _measure(self, variant: str, user: User) -> dict:
+        if variant in VARIANT_IMPORTS:
+            try:
+                importlib.import_module(VARIANT_IMPORTS[variant])
+            except ImportError as exc:
+                return {"variant": variant, "skipped": str(exc)}
+        tracemalloc.start()
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        for chunk in VARIANTS[variant](user):
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        total = time.perf_counter() - started
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            "variant": variant,
+            "ttfb_s": round(first_byte or total, 3),
+            "total_s": round(total, 3),
+            "bytes": size,
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "peak_traced_bytes": traced_peak,
+        }
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} not found")
+
+        if options["variant"]:
+            self.stdout.write(json.dumps(self._measure(options["variant"], user)))
+            return
+
+        # A fresh interpreter per variant keeps peak RSS from one run out of
+        # the other's measurement.
+        for variant in sorted(VARIANTS):
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    str(settings.BASE_DIR / "manage.py"),
+                    "bench_export",
+                    "--username",
+                    user.username,
+                    "--variant",
+                    variant,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode:
+                raise CommandError(completed.stderr.strip())
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            if "skipped" in result:
+                self.stdout.write(f"{variant:>10}: skipped ({result['skipped']})")
+                continue
+            parts = [
+                f"ttfb {result['ttfb_s']:.3f}s",
+                f"total {result['total_s']:.3f}s",
+                f"peak traced {result['peak_traced_bytes'] / 2**20:.1f} MiB",
+                f"{result['bytes']} bytes",
+            ]
+            if result["peak_rss_bytes"] is not None:
+                rss = result["peak_rss_bytes"] / 2**20
+                parts.insert(2, f"peak RSS {rss:.1f} MiB")
+            self.stdout.write(f"{variant:>10}: " + ", ".join(parts))
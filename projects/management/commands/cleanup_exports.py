@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from projects.exports import delete_expired_exports, fail_stale_exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark background exports interrupted by a restart as failed and delete "
+        "finished exports past their retention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=settings.EXPORT_STALE_MINUTES,
+            help="Fail exports pending or running for longer than this "
+            f"(default: {settings.EXPORT_STALE_MINUTES})",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.EXPORT_RETENTION_DAYS,
+            help="Delete finished exports older than this many days "
+            f"(default: {settings.EXPORT_RETENTION_DAYS})",
+        )
+
+    def handle(self, *args, **options):
+        failed = fail_stale_exports(timedelta(minutes=options["stale_minutes"]))
+        deleted = delete_expired_exports(timedelta(days=options["days"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Marked {failed} stale exports as failed and deleted "
+                f"{deleted} expired exports."
+            )
+        )
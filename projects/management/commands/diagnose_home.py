@@ -1,5 +1,10 @@
 ﻿from __future__ import annotations
 
+import cProfile
+import io
+import pstats
+import statistics
+import time
 from typing import Iterable
 
 from django.conf import settings
@@ -7,12 +12,23 @@ from django.core.management.base import BaseCommand
 from django.test import Client
 
 from accounts.models import User
+from projects.instrumentation import QueryRecorder, group_queries
+
+
+def _consume(response) -> int:
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    response.close()
+    return size
 
 
 class Command(BaseCommand):
     help = (
-        "Make anonymous and authenticated requests to '/' with a chosen host "
-        "and dump the first part of the response for debugging."
+        "Make anonymous and authenticated requests to a path (default '/') with "
+        "a chosen host and dump the first part of the response for debugging. "
+        "--profile also shows where the authenticated request spent its time."
     )
 
     def add_arguments(self, parser):
@@ -31,6 +47,38 @@ class Command(BaseCommand):
             default="Demo123!",
             help="Password to authenticate with (default: Demo123!)",
         )
+        parser.add_argument(
+            "--path", default="/", help="Path to request (default: /)"
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=1,
+            help="Authenticated requests to make; timings are summarised and "
+            "--profile covers the last one (default: 1)",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="Run the last request under cProfile and list its top functions, "
+            "SQL statements and repeated query shapes",
+        )
+        parser.add_argument(
+            "--prof-file",
+            help="Also write the profile to this file (for snakeviz and friends); "
+            "implies --profile",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=25,
+            help="Functions to list from the profile (default: 25)",
+        )
+        parser.add_argument(
+            "--sort",
+            default="cumulative",
+            help="pstats sort key for the function list (default: cumulative)",
+        )
 
     def _pick_host(self, candidate: str | None) -> str:
         if candidate:
@@ -45,10 +93,12 @@ class Command(BaseCommand):
         host = self._pick_host(options.get("host"))
         username: str = options["username"]
         password: str = options["password"]
+        path: str = options["path"]
+        profile = options["profile"] or bool(options["prof_file"])
 
         client = Client(HTTP_HOST=host)
-        resp = client.get("/")
-        self.stdout.write(f"Anonymous GET / ({host}) -> {resp.status_code}")
+        resp = client.get(path)
+        self.stdout.write(f"Anonymous GET {path} ({host}) -> {resp.status_code}")
         if resp.status_code >= 400:
             self.stdout.write(resp.content.decode(errors="ignore")[:500])
 
@@ -67,7 +117,71 @@ class Command(BaseCommand):
             )
             return
 
-        resp = logged_client.get("/")
-        self.stdout.write(f"Logged-in GET / ({host}) -> {resp.status_code}")
-        if resp.status_code >= 400:
+        repeat = max(options["repeat"], 1)
+        timings = []
+        profiler = recorder = None
+        for index in range(repeat):
+            if profile and index == repeat - 1:
+                profiler = cProfile.Profile()
+                recorder = QueryRecorder()
+            start = time.perf_counter()
+            if profiler is not None:
+                with recorder:
+                    profiler.enable()
+                    try:
+                        resp = logged_client.get(path)
+                        size = _consume(resp)
+                    finally:
+                        profiler.disable()
+            else:
+                resp = logged_client.get(path)
+                size = _consume(resp)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(
+            f"Logged-in GET {path} ({host}) -> {resp.status_code}, {size} bytes"
+        )
+        if resp.status_code >= 400 and not resp.streaming:
             self.stdout.write(resp.content.decode(errors="ignore")[:500])
+        if repeat > 1:
+            self.stdout.write(
+                f"{repeat} requests: min {min(timings):.1f}ms, "
+                f"median {statistics.median(timings):.1f}ms, "
+                f"max {max(timings):.1f}ms"
+            )
+        if profiler is not None:
+            self._report_profile(profiler, recorder, options)
+
+    def _report_profile(
+        self, profiler: cProfile.Profile, recorder: QueryRecorder, options
+    ) -> None:
+        if options["prof_file"]:
+            profiler.dump_stats(options["prof_file"])
+            self.stdout.write(f"Profile written to {options['prof_file']}")
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(options["sort"]).print_stats(options["top"])
+        self.stdout.write(self.style.MIGRATE_HEADING("Top functions"))
+        self.stdout.write(stream.getvalue().strip())
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"SQL: {recorder.count} statements, "
+                f"{recorder.total_time * 1000:.1f}ms"
+            )
+        )
+        for number, query in enumerate(recorder.queries, start=1):
+            self.stdout.write(
+                f"{number:>4} {query.duration * 1000:8.2f}ms  {query.sql}"
+            )
+
+        groups = group_queries(recorder.queries)
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(f"Repeated query shapes: {len(groups)}")
+        )
+        for group in groups:
+            self.stdout.write(
+                f"{group.count:>4}x {group.total_time * 1000:8.2f}ms  "
+                f"({group.identical} identical)  {group.shape}"
+            )
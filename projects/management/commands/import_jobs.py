@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from projects.imports import IMPORT_CHUNK_SIZE, ImportFileError, import_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Import jobs from a CSV or XLSX file. Columns: project (reference), "
+        "reference, title and optionally status, owner, design_manager, "
+        "client_contact (usernames), dates, revenue and notes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to a .csv or .xlsx file")
+        parser.add_argument(
+            "--username",
+            required=True,
+            help="Import as this user; their access scope and finance rights apply",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate every row without creating any jobs",
+        )
+        parser.add_argument(
+            "--report",
+            help="Write rejected rows to this CSV file instead of the console",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f"Rows validated and inserted per batch (default: {IMPORT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} not found")
+
+        started = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as handle:
+                result = import_jobs(
+                    handle,
+                    options["path"],
+                    user,
+                    dry_run=options["dry_run"],
+                    chunk_size=options["chunk_size"],
+                )
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        if options["report"]:
+            with open(options["report"], "w", newline="", encoding="utf-8") as out:
+                writer = csv.writer(out)
+                writer.writerow(["row", "errors"])
+                for error in result.errors:
+                    writer.writerow([error.row, error.as_text()])
+        else:
+            for error in result.errors:
+                self.stdout.write(f"Row {error.row}: {error.as_text()}")
+
+        verb = "Validated" if result.dry_run else "Imported"
+        count = result.rows - len(result.errors) if result.dry_run else result.created
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {count} of {result.rows} rows in {elapsed:.1f}s; "
+                f"{len(result.errors)} rejected."
+            )
+        )
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from projects.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the project and client rollup tables from the job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of projects/clients recomputed per transaction (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        projects, clients = rebuild_rollups(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {projects} project rollups and {clients} client rollups."
+            )
+        )
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from projects.schedule import refresh_all_job_schedules
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every job's current stage and next milestone from its "
+        "milestones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of jobs recomputed per batch (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        changed = refresh_all_job_schedules(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Updated the schedule of {changed} jobs."))
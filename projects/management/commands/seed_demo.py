@@ -1,33 +1,87 @@
 from __future__ import annotations
 
+import time
 from datetime import timedelta
 from decimal import Decimal
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from django.db import transaction
-
 from accounts.models import User
-from projects.models import Client, ClientAccess, Job, JobAttachment, JobAuditLog, JobNote, Milestone, Project
+from projects.models import STATUS_STAGES, Client, ClientAccess, Job, Milestone, Project
+from projects.rollups import rebuild_rollups
+from projects.synthetic import (
+    SYNTHETIC_PASSWORD,
+    SYNTHETIC_PREFIX,
+    SyntheticPortfolio,
+    SyntheticSpec,
+    clear_portfolio,
+)
 
 
 class Command(BaseCommand):
-    help = "Seed demo data for the DDPS application."
+    help = (
+        "Seed demo data for the DDPS application. Pass --clients to generate a "
+        "synthetic portfolio of any size instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clients",
+            type=int,
+            help="Generate this many synthetic clients instead of the demo data",
+        )
+        parser.add_argument(
+            "--projects-per-client",
+            type=int,
+            default=SyntheticSpec.projects_per_client,
+            help="Synthetic projects per client (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--jobs-per-project",
+            type=int,
+            default=SyntheticSpec.jobs_per_project,
+            help="Synthetic jobs per project (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--notes",
+            type=int,
+            default=SyntheticSpec.notes_per_job,
+            help="Diary notes per synthetic job (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--audit",
+            type=int,
+            default=SyntheticSpec.audit_per_job,
+            help="Audit entries per synthetic job (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--staff",
+            type=int,
+            default=SyntheticSpec.staff,
+            help="Synthetic internal users to assign jobs to (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=SyntheticSpec.seed,
+            help="Random seed; the same seed gives the same data (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=SyntheticSpec.chunk_size,
+            help="Jobs written per batch (default: %(default)s)",
+        )
 
     def handle(self, *args, **options):
         today = timezone.now().date()
 
-        with transaction.atomic():
-            # Clear previous demo content while keeping core accounts.
-            JobAttachment.objects.all().delete()
-            JobNote.objects.all().delete()
-            JobAuditLog.objects.all().delete()
-            Milestone.objects.all().delete()
-            Job.objects.all().delete()
-            Project.objects.all().delete()
-            ClientAccess.objects.all().delete()
-            Client.objects.all().delete()
+        # Clear previous demo content while keeping core accounts.
+        clear_portfolio()
+        if options["clients"] is not None:
+            self._seed_synthetic(options)
+            return
 
         admin, admin_created = User.objects.get_or_create(
             username="admin",
@@ -176,19 +230,6 @@ class Command(BaseCommand):
             Job.Status.COMPLETED,
         ]
 
-        stage_progress_map = {
-            Job.Status.PENDING_REQUIREMENTS: Milestone.Stage.CREATED,
-            Job.Status.REQUIREMENTS_ANALYSIS: Milestone.Stage.REQUIREMENTS_ANALYSIS,
-            Job.Status.DRAWINGS_WIP: Milestone.Stage.DRAWING_COMPLETION,
-            Job.Status.PENDING_CLIENT_APPROVAL: Milestone.Stage.CLIENT_APPROVAL,
-            Job.Status.APPROVED_PENDING_FABRICATION: Milestone.Stage.CLIENT_APPROVAL,
-            Job.Status.IN_FABRICATION: Milestone.Stage.FABRICATION,
-            Job.Status.IN_QUALITY_CONTROL: Milestone.Stage.QUALITY_CONTROL,
-            Job.Status.READY_TO_BE_SHIPPED: Milestone.Stage.QUALITY_CONTROL,
-            Job.Status.SHIPPED: Milestone.Stage.DELIVERY,
-            Job.Status.COMPLETED: Milestone.Stage.DELIVERY,
-        }
-
         def set_milestones(job: Job, status: str, base_offset: int):
             stage_order = [
                 Milestone.Stage.CREATED,
@@ -199,7 +240,7 @@ class Command(BaseCommand):
                 Milestone.Stage.QUALITY_CONTROL,
                 Milestone.Stage.DELIVERY,
             ]
-            completed_stage = stage_progress_map.get(status, Milestone.Stage.CREATED)
+            completed_stage = STATUS_STAGES.get(status, Milestone.Stage.CREATED)
             planned_start = today + timedelta(days=base_offset)
             for index, milestone in enumerate(
                 job.milestones.order_by("created_at")
@@ -259,8 +300,6 @@ class Command(BaseCommand):
                 )
                 set_milestones(job, status, base_offset=idx * -20 + job_idx * 5)
 
-        self.stdout.write(self.style.SUCCESS("Demo data ready."))
-
         self.stdout.write(self.style.SUCCESS("Demo data ready."))
         self.stdout.write(
             "Log in with admin/Admin123! or sikla.manager/Demo123! for internal access."
@@ -269,3 +308,31 @@ class Command(BaseCommand):
             "Client portal demo: client.jane / Demo123! (only sees Harland Steel)."
         )
 
+    def _seed_synthetic(self, options):
+        spec = SyntheticSpec(
+            clients=options["clients"],
+            projects_per_client=options["projects_per_client"],
+            jobs_per_project=options["jobs_per_project"],
+            notes_per_job=options["notes"],
+            audit_per_job=options["audit"],
+            staff=options["staff"],
+            seed=options["seed"],
+            chunk_size=options["chunk_size"],
+        )
+        started = time.perf_counter()
+        result = SyntheticPortfolio(spec, progress=self.stdout.write).generate()
+        # Projects were bulk-created without their signals, so recount.
+        rebuild_rollups()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {result.clients} clients, {result.projects} projects, "
+                f"{result.jobs} jobs, {result.milestones} milestones, "
+                f"{result.notes} notes and {result.audit_entries} audit entries "
+                f"in {elapsed:.1f}s."
+            )
+        )
+        self.stdout.write(
+            f"Synthetic users log in with {SYNTHETIC_PASSWORD}, e.g. "
+            f"{SYNTHETIC_PREFIX}staff000 or {SYNTHETIC_PREFIX}client00000."
+        )
@@ -0,0 +1,261 @@
+"""Per-request performance metrics.
+
+``PerformanceMiddleware`` times each request, counts and times its database
+queries through ``connection.execute_wrapper`` and times ``TemplateResponse``
+rendering.  Each response gets a ``Server-Timing`` header (shown in the
+browser's network panel) and the numbers are added to in-process histograms
+keyed by the resolved view name, which ``MetricsView`` serves at ``/metrics``
+in Prometheus text format.
+
+Streaming responses (CSV/JSON-lines exports, file downloads) run most of
+their queries while the body is sent, so they are observed once the body is
+exhausted or closed and get no ``Server-Timing`` header, whose figures would
+be sent before the work is done.  The header is only added for staff, or
+with ``DEBUG``, as it exposes query counts.
+
+Each gunicorn worker keeps its own histograms.  Set ``PERF_METRICS_DIR`` to a
+directory shared by the workers and each one writes a snapshot there at most
+every ``PERF_METRICS_DUMP_INTERVAL`` seconds, named by pid and start time so
+a restarted worker that reuses a pid doesn't overwrite its predecessor's
+totals; ``/metrics`` then reports the sum over every snapshot, whichever
+worker answers.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+from .instrumentation import QueryRecorder, ignore_frames_from
+from .slow_queries import current_view
+
+# Upper bounds, in seconds, of the histogram buckets (Prometheus ``le``).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HISTOGRAMS = {
+    "request_duration_seconds": "Time spent handling the request.",
+    "request_db_seconds": "Time spent running database queries.",
+    "request_template_seconds": "Time spent rendering TemplateResponses.",
+}
+COUNTERS = {
+    "request_queries_total": "Database queries run.",
+    "requests_total": "Requests handled.",
+}
+METRIC_PREFIX = "ddps_"
+UNRESOLVED = "<unresolved>"
+ignore_frames_from(__file__)
+
+
+class RequestMetrics:
+    """Thread-safe histograms and counters per view name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        # {metric: {view: [bucket counts..., +Inf count, sum]}}
+        self.histograms: dict[str, dict[str, list[float]]] = {
+            name: {} for name in HISTOGRAMS
+        }
+        # {metric: {view: value}}
+        self.counters: dict[str, dict[str, float]] = {name: {} for name in COUNTERS}
+
+    def observe(self, view: str, values: dict[str, float], counts: dict[str, int]):
+        with self._lock:
+            for name, value in values.items():
+                series = self.histograms[name].setdefault(
+                    view, [0] * (len(BUCKETS) + 2)
+                )
+                series[bisect_left(BUCKETS, value)] += 1
+                series[-1] += value
+            for name, value in counts.items():
+                counter = self.counters[name]
+                counter[view] = counter.get(view, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return copy.deepcopy(
+                {"histograms": self.histograms, "counters": self.counters}
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+
+
+metrics = RequestMetrics()
+_last_dump = 0.0
+_dump_lock = threading.Lock()
+# (pid, snapshot file stem); recomputed after a fork.
+_process: tuple[int, str] | None = None
+
+
+def _snapshot_name() -> str:
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, f"{pid}-{time.time_ns()}")
+    return f"{_process[1]}.json"
+
+
+def _metrics_dir() -> Path | None:
+    directory = getattr(settings, "PERF_METRICS_DIR", None)
+    return Path(directory) if directory else None
+
+
+def dump_metrics(force: bool = False) -> None:
+    """Write this process's snapshot to ``PERF_METRICS_DIR`` if it's due."""
+    global _last_dump
+    directory = _metrics_dir()
+    if directory is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_dump < settings.PERF_METRICS_DUMP_INTERVAL:
+        return
+    if not _dump_lock.acquire(blocking=force):
+        return
+    try:
+        _last_dump = now
+        directory.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as temp:
+            json.dump(metrics.snapshot(), temp)
+        os.replace(temp_path, directory / _snapshot_name())
+    finally:
+        _dump_lock.release()
+
+
+def collected_metrics() -> dict:
+    """This process's metrics, or the sum of every worker's latest snapshot."""
+    directory = _metrics_dir()
+    if directory is None:
+        return metrics.snapshot()
+    dump_metrics(force=True)
+    merged = RequestMetrics().snapshot()
+    for path in sorted(directory.glob("*.json")):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, views in snapshot.get("histograms", {}).items():
+            for view, series in views.items():
+                total = merged["histograms"].setdefault(name, {}).setdefault(
+                    view, [0] * len(series)
+                )
+                for index, value in enumerate(series):
+                    total[index] += value
+        for name, views in snapshot.get("counters", {}).items():
+            for view, value in views.items():
+                counter = merged["counters"].setdefault(name, {})
+                counter[view] = counter.get(view, 0) + value
+    return merged
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(snapshot: dict) -> str:
+    lines = []
+    for name, help_text in HISTOGRAMS.items():
+        metric = METRIC_PREFIX + name
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for view, series in sorted(snapshot["histograms"].get(name, {}).items()):
+            label = f'view="{_label(view)}"'
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), series[:-1]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label}}} {series[-1]}")
+            lines.append(f"{metric}_count{{{label}}} {cumulative}")
+    for name, help_text in COUNTERS.items():
+        metric = METRIC_PREFIX + name
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for view, value in sorted(snapshot["counters"].get(name, {}).items()):
+            lines.append(f'{metric}{{view="{_label(view)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._template_seconds = 0.0
+        start = time.perf_counter()
+        recorder = QueryRecorder()
+        try:
+            with recorder:
+                response = self.get_response(request)
+        finally:
+            current_view.set(None)
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else UNRESOLVED
+        if response.streaming and not response.is_async:
+            response.streaming_content = self._measure_stream(
+                response.streaming_content, request, view, start, recorder
+            )
+            return response
+
+        total = time.perf_counter() - start
+        if self._show_timing(request):
+            response["Server-Timing"] = ", ".join(
+                [
+                    f"total;dur={total * 1000:.1f}",
+                    f"db;dur={recorder.total_time * 1000:.1f};"
+                    f'desc="{recorder.count} queries"',
+                    f"tpl;dur={request._template_seconds * 1000:.1f}",
+                ]
+            )
+        self._observe(request, view, total, recorder)
+        return response
+
+    @staticmethod
+    def _show_timing(request) -> bool:
+        user = getattr(request, "user", None)
+        return settings.DEBUG or bool(user and user.is_staff)
+
+    def _measure_stream(self, content, request, view, start, recorder):
+        token = current_view.set(view)
+        try:
+            with recorder:
+                yield from content
+        finally:
+            current_view.reset(token)
+            self._observe(request, view, time.perf_counter() - start, recorder)
+
+    @staticmethod
+    def _observe(request, view: str, total: float, recorder: QueryRecorder):
+        metrics.observe(
+            view,
+            {
+                "request_duration_seconds": total,
+                "request_db_seconds": recorder.total_time,
+                "request_template_seconds": request._template_seconds,
+            },
+            {"request_queries_total": recorder.count, "requests_total": 1},
+        )
+        dump_metrics()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Lets the slow query log say which view ran a query.
+        current_view.set(request.resolver_match.view_name)
+
+    def process_template_response(self, request, response):
+        # Called just before the response is rendered; the callback runs
+        # just after, so the difference is the render time.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._template_seconds += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:15
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    Client = apps.get_model("projects", "Client")
+    Job = apps.get_model("projects", "Job")
+    Project = apps.get_model("projects", "Project")
+    ProjectRollup = apps.get_model("projects", "ProjectRollup")
+    ClientRollup = apps.get_model("projects", "ClientRollup")
+
+    def empty():
+        return {
+            "job_count": 0,
+            "forecast_revenue": Decimal("0.00"),
+            "actual_revenue": Decimal("0.00"),
+            "status_counts": {},
+        }
+
+    client_of = dict(Project.objects.values_list("id", "client_id"))
+    projects = {project_id: empty() for project_id in client_of}
+    clients = {client_id: empty() for client_id in Client.objects.values_list("id", flat=True)}
+    rows = (
+        Job.objects.values("project_id", "status")
+        .annotate(
+            count=Count("id"),
+            forecast=Sum("forecast_revenue"),
+            actual=Sum("actual_revenue"),
+        )
+        .order_by()
+    )
+    for row in rows:
+        for totals in (projects[row["project_id"]], clients[client_of[row["project_id"]]]):
+            totals["job_count"] += row["count"]
+            totals["forecast_revenue"] += row["forecast"] or Decimal("0.00")
+            totals["actual_revenue"] += row["actual"] or Decimal("0.00")
+            counts = totals["status_counts"]
+            counts[row["status"]] = counts.get(row["status"], 0) + row["count"]
+    project_counts = dict.fromkeys(clients, 0)
+    for client_id in client_of.values():
+        project_counts[client_id] += 1
+
+    ProjectRollup.objects.bulk_create(
+        [ProjectRollup(project_id=pk, **totals) for pk, totals in projects.items()],
+        batch_size=500,
+    )
+    ClientRollup.objects.bulk_create(
+        [
+            ClientRollup(client_id=pk, project_count=project_counts[pk], **totals)
+            for pk, totals in clients.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_jobattachment_jobauditlog_jobnote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientRollup',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job_count', models.PositiveIntegerField(default=0)),
+                ('forecast_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('actual_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('status_counts', models.JSONField(blank=True, default=dict)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='projects.client')),
+                ('project_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectRollup',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job_count', models.PositiveIntegerField(default=0)),
+                ('forecast_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('actual_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('status_counts', models.JSONField(blank=True, default=dict)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='projects.project')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['updated_at'], name='projects_jo_updated_623fd5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobattachment',
+            index=models.Index(fields=['updated_at'], name='projects_jo_updated_b7d083_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobnote',
+            index=models.Index(fields=['updated_at'], name='projects_jo_updated_d1d418_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='milestone',
+            index=models.Index(fields=['updated_at'], name='projects_mi_updated_dc0208_idx'),
+        ),
+    ]
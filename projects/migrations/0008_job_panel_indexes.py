@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_systemcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobattachment',
+            index=models.Index(fields=['job', '-created_at', '-id'], name='projects_jo_job_id_7310f1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobauditlog',
+            index=models.Index(fields=['job', '-created_at', '-id'], name='projects_jo_job_id_3c9c19_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobnote',
+            index=models.Index(fields=['job', '-created_at', '-id'], name='projects_jo_job_id_3dbccb_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:32
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Frozen copies of projects.schedule as of this migration, so later changes
+# to the app code can't change what it computes.
+SCHEDULE_FIELDS = ["current_stage", "next_milestone_stage", "next_milestone_date"]
+STAGE_ORDER = {
+    stage: index
+    for index, stage in enumerate(
+        [
+            "created",
+            "requirements_analysis",
+            "drawing_completion",
+            "client_approval",
+            "fabrication",
+            "quality_control",
+            "delivery",
+        ]
+    )
+}
+
+
+def compute_schedule(milestones):
+    completed = None
+    upcoming = None
+    for stage, planned, actual in milestones:
+        order = STAGE_ORDER.get(stage, -1)
+        if actual is not None:
+            key = (actual, order)
+            if completed is None or key > completed[0]:
+                completed = (key, stage)
+        elif planned is not None:
+            key = (planned, order)
+            if upcoming is None or key < upcoming[0]:
+                upcoming = (key, stage)
+    return {
+        "current_stage": completed[1] if completed else "",
+        "next_milestone_stage": upcoming[1] if upcoming else "",
+        "next_milestone_date": upcoming[0][0] if upcoming else None,
+    }
+
+
+def populate_schedules(apps, schema_editor):
+    Job = apps.get_model("projects", "Job")
+    Milestone = apps.get_model("projects", "Milestone")
+    rows = defaultdict(list)
+    for job_id, *milestone in Milestone.objects.values_list(
+        "job_id", "stage", "planned_date", "actual_date"
+    ).iterator():
+        rows[job_id].append(milestone)
+    jobs = [
+        Job(pk=job_id, **compute_schedule(milestones))
+        for job_id, milestones in rows.items()
+    ]
+    Job.objects.bulk_update(jobs, SCHEDULE_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_job_panel_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='current_stage',
+            field=models.CharField(blank=True, choices=[('created', 'Created'), ('requirements_analysis', 'Requirements Analysis'), ('drawing_completion', 'Drawing Completion'), ('client_approval', 'Client Approval'), ('fabrication', 'Fabrication'), ('quality_control', 'Quality Control'), ('delivery', 'Delivery')], editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='next_milestone_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='next_milestone_stage',
+            field=models.CharField(blank=True, choices=[('created', 'Created'), ('requirements_analysis', 'Requirements Analysis'), ('drawing_completion', 'Drawing Completion'), ('client_approval', 'Client Approval'), ('fabrication', 'Fabrication'), ('quality_control', 'Quality Control'), ('delivery', 'Delivery')], editable=False, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['next_milestone_date'], name='projects_jo_next_mi_116c0c_idx'),
+        ),
+        migrations.RunPython(populate_schedules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_job_schedule_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobauditlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
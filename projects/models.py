@@ -1,8 +1,10 @@
+import uuid
 from decimal import Decimal
 
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
@@ -14,6 +16,19 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class ClientQuerySet(models.QuerySet):
+    def with_rollups(self) -> "ClientQuerySet":
+        # Totals come from the incrementally maintained ClientRollup row.
+        zero = models.Value(Decimal("0.00"))
+        return self.annotate(
+            project_count=Coalesce(models.F("rollup__project_count"), 0),
+            actual_revenue_total=Coalesce(models.F("rollup__actual_revenue"), zero),
+            forecast_revenue_total=Coalesce(
+                models.F("rollup__forecast_revenue"), zero
+            ),
+        )
+
+
 class Client(TimeStampedModel):
     name = models.CharField(max_length=255, unique=True)
     account_code = models.CharField(max_length=50, unique=True)
@@ -29,14 +44,19 @@ class Client(TimeStampedModel):
         related_name="managed_clients",
     )
 
+    objects = ClientQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
 
     def __str__(self) -> str:
         return self.name
 
+    # Prefer Client.objects.with_rollups(); these fall back to a query per call.
     @property
     def revenue_actual(self) -> Decimal:
+        if hasattr(self, "actual_revenue_total"):
+            return self.actual_revenue_total
         return (
             self.projects.aggregate(total=models.Sum("jobs__actual_revenue"))["total"]
             or Decimal("0.00")
@@ -44,6 +64,8 @@ class Client(TimeStampedModel):
 
     @property
     def revenue_forecast(self) -> Decimal:
+        if hasattr(self, "forecast_revenue_total"):
+            return self.forecast_revenue_total
         return (
             self.projects.aggregate(total=models.Sum("jobs__forecast_revenue"))["total"]
             or Decimal("0.00")
@@ -99,6 +121,16 @@ class Project(TimeStampedModel):
         return f"{self.reference} - {self.name}"
 
 
+class MilestoneStage(models.TextChoices):
+    CREATED = "created", "Created"
+    REQUIREMENTS_ANALYSIS = "requirements_analysis", "Requirements Analysis"
+    DRAWING_COMPLETION = "drawing_completion", "Drawing Completion"
+    CLIENT_APPROVAL = "client_approval", "Client Approval"
+    FABRICATION = "fabrication", "Fabrication"
+    QUALITY_CONTROL = "quality_control", "Quality Control"
+    DELIVERY = "delivery", "Delivery"
+
+
 class Job(TimeStampedModel):
     class Status(models.TextChoices):
         PENDING_REQUIREMENTS = (
@@ -187,36 +219,44 @@ class Job(TimeStampedModel):
         validators=[MinValueValidator(Decimal("0.00"))],
     )
     notes = models.TextField(blank=True)
+    # Maintained from the milestones by projects.schedule.refresh_job_schedule.
+    current_stage = models.CharField(
+        max_length=32, choices=MilestoneStage.choices, blank=True, editable=False
+    )
+    next_milestone_stage = models.CharField(
+        max_length=32, choices=MilestoneStage.choices, blank=True, editable=False
+    )
+    next_milestone_date = models.DateField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ["project", "reference"]
         unique_together = ("project", "reference")
+        indexes = [
+            models.Index(fields=["updated_at"]),
+            models.Index(fields=["next_milestone_date"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.project.reference}-{self.reference}"
 
-    def current_stage(self) -> str:
-        latest = self.milestones.order_by("-actual_date", "-planned_date").first()
-        return latest.get_stage_display() if latest else "Not yet scheduled"
 
-    def next_milestone(self):
-        today = timezone.now().date()
-        return (
-            self.milestones.filter(planned_date__gte=today)
-            .order_by("planned_date")
-            .first()
-        )
+# The milestone a job has reached by the time it is in each status.
+STATUS_STAGES = {
+    Job.Status.PENDING_REQUIREMENTS: MilestoneStage.CREATED,
+    Job.Status.REQUIREMENTS_ANALYSIS: MilestoneStage.REQUIREMENTS_ANALYSIS,
+    Job.Status.DRAWINGS_WIP: MilestoneStage.DRAWING_COMPLETION,
+    Job.Status.PENDING_CLIENT_APPROVAL: MilestoneStage.CLIENT_APPROVAL,
+    Job.Status.APPROVED_PENDING_FABRICATION: MilestoneStage.CLIENT_APPROVAL,
+    Job.Status.IN_FABRICATION: MilestoneStage.FABRICATION,
+    Job.Status.IN_QUALITY_CONTROL: MilestoneStage.QUALITY_CONTROL,
+    Job.Status.READY_TO_BE_SHIPPED: MilestoneStage.QUALITY_CONTROL,
+    Job.Status.SHIPPED: MilestoneStage.DELIVERY,
+    Job.Status.COMPLETED: MilestoneStage.DELIVERY,
+}
 
 
 class Milestone(TimeStampedModel):
-    class Stage(models.TextChoices):
-        CREATED = "created", "Created"
-        REQUIREMENTS_ANALYSIS = "requirements_analysis", "Requirements Analysis"
-        DRAWING_COMPLETION = "drawing_completion", "Drawing Completion"
-        CLIENT_APPROVAL = "client_approval", "Client Approval"
-        FABRICATION = "fabrication", "Fabrication"
-        QUALITY_CONTROL = "quality_control", "Quality Control"
-        DELIVERY = "delivery", "Delivery"
+    Stage = MilestoneStage
 
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="milestones")
     stage = models.CharField(max_length=32, choices=Stage.choices)
@@ -227,6 +267,7 @@ class Milestone(TimeStampedModel):
     class Meta:
         ordering = ["job", "planned_date"]
         unique_together = ("job", "stage")
+        indexes = [models.Index(fields=["updated_at"])]
 
     def __str__(self) -> str:
         return f"{self.job} - {self.get_stage_display()}"
@@ -245,6 +286,11 @@ class JobNote(TimeStampedModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["updated_at"]),
+            # Keyset pagination of the job detail panels.
+            models.Index(fields=["job", "-created_at", "-id"]),
+        ]
 
     def __str__(self) -> str:
         author = self.author.get_full_name() if self.author else "Unknown"
@@ -280,6 +326,11 @@ class JobAttachment(TimeStampedModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["updated_at"]),
+            # Keyset pagination of the job detail panels.
+            models.Index(fields=["job", "-created_at", "-id"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.job} - {self.get_category_display()}"
@@ -290,6 +341,9 @@ class JobAttachment(TimeStampedModel):
 
 
 class JobAuditLog(TimeStampedModel):
+    # Stamped when the entry is built, not when it's inserted: the buffered
+    # audit sink may write it seconds later (auto_now_add would overwrite it).
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="audit_logs")
     actor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -306,7 +360,118 @@ class JobAuditLog(TimeStampedModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["job", "-created_at", "-id"])]
 
     def __str__(self) -> str:
         actor = self.actor.get_full_name() if self.actor else "System"
         return f"{self.job} - {self.action} by {actor}"
+
+
+class RollupTotals(TimeStampedModel):
+    job_count = models.PositiveIntegerField(default=0)
+    forecast_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    actual_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    status_counts = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class ProjectRollup(RollupTotals):
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name="rollup"
+    )
+
+    def __str__(self) -> str:
+        return f"Rollup for {self.project_id}"
+
+
+class ClientRollup(RollupTotals):
+    client = models.OneToOneField(
+        Client, on_delete=models.CASCADE, primary_key=True, related_name="rollup"
+    )
+    project_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Rollup for {self.client_id}"
+
+
+def export_upload_to(instance: "ExportJob", filename: str) -> str:
+    return f"exports/{instance.requested_by_id}/{uuid.uuid4().hex}/{filename}"
+
+
+class ExportJob(TimeStampedModel):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        COMPLETE = "complete", "Complete"
+        FAILED = "failed", "Failed"
+
+    class Format(models.TextChoices):
+        XLSX = "xlsx", "Excel"
+        CSV = "csv", "CSV"
+        JSONL = "jsonl", "JSON lines"
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="export_jobs",
+    )
+    export_format = models.CharField(
+        max_length=10, choices=Format.choices, default=Format.XLSX
+    )
+    parameters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to=export_upload_to, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"{self.get_export_format_display()} export #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in {self.Status.COMPLETE, self.Status.FAILED}
+
+
+class SystemCounter(TimeStampedModel):
+    """Named, monotonically increasing counters shared by every worker."""
+
+    EXPORT_GENERATION = "export_generation"
+    EXPORT_CACHE_HITS = "export_cache_hits"
+    EXPORT_CACHE_MISSES = "export_cache_misses"
+
+    name = models.CharField(max_length=64, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self) -> str:
+        return f"{self.name} = {self.value}"
+
+    @classmethod
+    def increment(cls, name: str, by: int = 1) -> None:
+        updated = cls.objects.filter(name=name).update(
+            value=models.F("value") + by, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(value=models.F("value") + by)
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        return (
+            cls.objects.filter(name=name).values_list("value", flat=True).first() or 0
+        )
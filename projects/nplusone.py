@@ -0,0 +1,199 @@
+"""N+1 query detection for development and the test suite.
+
+``NPlusOneDetector`` watches the ``SELECT`` statements run on a connection and
+groups them by shape (``normalize_sql``).  A shape that runs
+``NPLUSONE_THRESHOLD`` times is almost always a related object or count being
+fetched once per row, so the detector records where that run came from (the
+template line and project frame, via ``query_origin``) and, on exit, warns or
+raises according to ``NPLUSONE_MODE``:
+
+* ``"off"``: nothing is watched;
+* ``"warn"``: a warning goes to the ``projects.nplusone`` logger;
+* ``"raise"``: ``NPlusOneError`` is raised.
+
+``NPlusOneMiddleware`` wraps every request in a detector, and
+``ignore_n_plus_one()`` exempts a block of code that repeats a query on purpose.
+``NPlusOneTestRunner`` runs the test suite in ``"raise"`` mode and also wraps
+each test method, so queries run outside a request are checked too.  That
+detector pauses while a request's own detector is active; otherwise the
+session and user lookups of every test client request would add up to an
+"N+1" in any test that makes a handful of requests.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import iter_test_cases
+
+from .instrumentation import (
+    QueryOrigin,
+    ignore_frames_from,
+    normalize_sql,
+    query_origin,
+)
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "warn", "raise")
+_ignored = contextvars.ContextVar("nplusone_ignored", default=False)
+# True while NPlusOneMiddleware is checking a request.
+_in_request = contextvars.ContextVar("nplusone_in_request", default=False)
+ignore_frames_from(__file__)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+@dataclass
+class RepeatedQuery:
+    shape: str
+    origin: QueryOrigin
+    count: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.count} x {self.shape}\n    from {self.origin}"
+
+
+class NPlusOneDetector:
+    """Context manager that flags repeated query shapes on one connection."""
+
+    def __init__(
+        self,
+        label: str = "",
+        mode: str | None = None,
+        threshold: int | None = None,
+        using: str = DEFAULT_DB_ALIAS,
+        outside_requests: bool = False,
+    ):
+        """``outside_requests`` leaves queries to the request's own detector."""
+        self.label = label
+        self.outside_requests = outside_requests
+        self.mode = mode or getattr(settings, "NPLUSONE_MODE", "off")
+        if self.mode not in MODES:
+            raise ValueError(f"NPLUSONE_MODE must be one of {', '.join(MODES)}.")
+        self.threshold = threshold or getattr(settings, "NPLUSONE_THRESHOLD", 5)
+        self.connection = connections[using]
+        self.counts: dict[str, int] = {}
+        self.repeated: dict[str, RepeatedQuery] = {}
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if (
+            not many
+            and not _ignored.get()
+            and not (self.outside_requests and _in_request.get())
+            and sql.lstrip()[:6].upper() == "SELECT"
+        ):
+            shape = normalize_sql(sql)
+            count = self.counts.get(shape, 0) + 1
+            self.counts[shape] = count
+            if count == self.threshold:
+                self.repeated[shape] = RepeatedQuery(shape, query_origin())
+            if count >= self.threshold:
+                self.repeated[shape].count = count
+        return execute(sql, params, many, context)
+
+    def __enter__(self) -> "NPlusOneDetector":
+        if self.mode != "off":
+            self._wrapper = self.connection.execute_wrapper(self)
+            self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.mode == "off":
+            return
+        self._wrapper.__exit__(exc_type, exc, tb)
+        self._wrapper = None
+        # Don't mask the exception that's already on its way out.
+        if self.repeated and exc_type is None:
+            self.report()
+
+    def report(self) -> None:
+        message = (
+            f"Possible N+1 queries{f' in {self.label}' if self.label else ''} "
+            f"(a query shape ran {self.threshold}+ times):\n  "
+            + "\n  ".join(str(repeat) for repeat in self.repeated.values())
+        )
+        if self.mode == "raise":
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+@contextmanager
+def ignore_n_plus_one():
+    """Don't count the queries run inside the block, e.g. deliberate fixtures."""
+    token = _ignored.set(True)
+    try:
+        yield
+    finally:
+        _ignored.reset(token)
+
+
+class NPlusOneMiddleware:
+    def __init__(self, get_response):
+        if getattr(settings, "NPLUSONE_MODE", "off") == "off":
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        label = f"{request.method} {request.path}"
+        token = _in_request.set(True)
+        try:
+            with NPlusOneDetector(label):
+                response = self.get_response(request)
+        finally:
+            _in_request.reset(token)
+        if response.streaming and not response.is_async:
+            # Streaming exports run their queries as the body is sent.
+            response.streaming_content = self._check_stream(
+                response.streaming_content, label
+            )
+        return response
+
+    @staticmethod
+    def _check_stream(content, label: str):
+        token = _in_request.set(True)
+        try:
+            with NPlusOneDetector(f"{label} (streaming body)"):
+                yield from content
+        finally:
+            _in_request.reset(token)
+
+
+def _checked(test, method):
+    @functools.wraps(method)
+    def run(*args, **kwargs):
+        with NPlusOneDetector(test.id(), mode="raise", outside_requests=True):
+            return method(*args, **kwargs)
+
+    return run
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """``DiscoverRunner`` with N+1 detection in strict mode."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._saved_mode = getattr(settings, "NPLUSONE_MODE", "off")
+        settings.NPLUSONE_MODE = "raise"
+
+    def teardown_test_environment(self, **kwargs):
+        settings.NPLUSONE_MODE = self._saved_mode
+        super().teardown_test_environment(**kwargs)
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        for test in iter_test_cases(suite):
+            name = getattr(test, "_testMethodName", None)
+            if name and not getattr(test, "allow_n_plus_one", False):
+                setattr(test, name, _checked(test, getattr(test, name)))
+        return suite
@@ -0,0 +1,83 @@
+"""Shift a project's planned milestone dates in one statement.
+
+``reschedule_project`` moves ``planned_date`` by a number of days with a single
+DB-side ``F()`` update.  Milestones can be narrowed to some stages or to dates
+from today onwards.  The matching rows are read once, to write one audit
+entry per milestone in a single batch; the rows are never loaded as model
+instances.  ``QuerySet.update`` skips the Milestone signals, so job schedules
+and the export cache are maintained here.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import User
+
+from .auditing import audit_sink
+from .export_cache import bump_export_generation
+from .models import JobAuditLog, Milestone, Project
+from .schedule import refresh_job_schedule
+
+
+def reschedule_project(
+    project: Project,
+    days: int,
+    actor: User | None = None,
+    stages: Iterable[str] | None = None,
+    future_only: bool = False,
+    today: date | None = None,
+) -> int:
+    """Move planned milestone dates in ``project`` by ``days``.
+
+    Returns the number of milestones moved.  ``future_only`` leaves milestones
+    planned before ``today`` alone.
+    """
+    if not days:
+        return 0
+    actor = actor if actor is not None and actor.is_authenticated else None
+    shift = timedelta(days=days)
+    milestones = Milestone.objects.filter(
+        job__project=project, planned_date__isnull=False
+    )
+    stages = list(stages or [])
+    if stages:
+        milestones = milestones.filter(stage__in=stages)
+    if future_only:
+        milestones = milestones.filter(
+            planned_date__gte=today or timezone.localdate()
+        )
+    labels = dict(Milestone.Stage.choices)
+    note = f"Project {project.reference} rescheduled by {days:+d} days."
+    with transaction.atomic():
+        rows = list(
+            milestones.select_for_update().values_list(
+                "job_id", "stage", "planned_date"
+            )
+        )
+        if not rows:
+            return 0
+        moved = milestones.update(
+            planned_date=F("planned_date") + shift, updated_at=timezone.now()
+        )
+        audit_sink().write(
+            [
+                JobAuditLog(
+                    job_id=job_id,
+                    actor=actor,
+                    action="milestone_updated",
+                    field_name=f"{labels.get(stage, stage)} - planned_date",
+                    previous_value=str(planned),
+                    new_value=str(planned + shift),
+                    note=note,
+                )
+                for job_id, stage, planned in rows
+            ]
+        )
+        refresh_job_schedule({job_id for job_id, _, _ in rows})
+        bump_export_generation()
+    return moved
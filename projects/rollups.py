@@ -0,0 +1,388 @@
+"""Incremental maintenance of the ProjectRollup / ClientRollup summary tables.
+
+Job and Project signals feed before/after states into ``apply_job_changes``,
+``adjust_project_count``, ``move_project`` and ``ProjectRemoval``, which
+adjust the affected rollup rows by delta instead of recounting.  Jobs deleted
+along with their project (or client) are not applied one by one: the project's
+own totals come off its client in one delta.  Code paths that bypass signals
+(``QuerySet.update``, ``bulk_create``) must call these helpers themselves;
+``rebuild_rollups`` recomputes everything from the Job table to repair drift.
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, QuerySet, Sum
+from django.utils import timezone
+
+from .models import Client, ClientRollup, Job, Project, ProjectRollup
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+TOTAL_FIELDS = ["job_count", "forecast_revenue", "actual_revenue", "status_counts"]
+
+
+class JobState(NamedTuple):
+    project_id: int
+    status: str
+    forecast_revenue: Decimal
+    actual_revenue: Decimal
+
+
+_MISSING = object()
+_STATE_ATTNAMES = ("project_id", "status", "forecast_revenue", "actual_revenue")
+_STATE_FIELD_NAMES = {"project_id": "project"}
+
+
+def _as_decimal(value) -> Decimal:
+    if value is None or value == "":
+        return ZERO
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def job_state(
+    job: Job,
+    previous: JobState | None = None,
+    update_fields: Iterable[str] | None = None,
+) -> JobState | None:
+    """Return the rollup-relevant state of ``job``.
+
+    Deferred attributes, and attributes excluded by ``update_fields``, are taken
+    from ``previous`` because they were not written by the save being handled.
+    """
+    values = []
+    for index, attname in enumerate(_STATE_ATTNAMES):
+        value = job.__dict__.get(attname, _MISSING)
+        if update_fields is not None and (
+            _STATE_FIELD_NAMES.get(attname, attname) not in update_fields
+        ):
+            value = _MISSING
+        if value is _MISSING:
+            if previous is None:
+                return None
+            value = previous[index]
+        values.append(value)
+    project_id, status, forecast, actual = values
+    if project_id is None:
+        return None
+    return JobState(project_id, status, _as_decimal(forecast), _as_decimal(actual))
+
+
+def stored_job_state(pk: int) -> JobState | None:
+    """The rollup-relevant state of job ``pk`` as currently saved."""
+    row = Job.objects.filter(pk=pk).values_list(*_STATE_ATTNAMES).first()
+    if row is None:
+        return None
+    project_id, status, forecast, actual = row
+    return JobState(project_id, status, _as_decimal(forecast), _as_decimal(actual))
+
+
+@dataclass
+class RollupDelta:
+    job_count: int = 0
+    forecast_revenue: Decimal = ZERO
+    actual_revenue: Decimal = ZERO
+    status_counts: Counter = field(default_factory=Counter)
+    project_count: int = 0
+    creates_row: bool = False
+
+    def add(self, state: JobState, sign: int = 1) -> None:
+        self.job_count += sign
+        self.forecast_revenue += sign * state.forecast_revenue
+        self.actual_revenue += sign * state.actual_revenue
+        self.status_counts[state.status] += sign
+
+    def merge(self, other: "RollupDelta") -> None:
+        self.job_count += other.job_count
+        self.forecast_revenue += other.forecast_revenue
+        self.actual_revenue += other.actual_revenue
+        self.status_counts.update(other.status_counts)
+        self.project_count += other.project_count
+        self.creates_row = self.creates_row or other.creates_row
+
+    def negated(self) -> "RollupDelta":
+        return RollupDelta(
+            job_count=-self.job_count,
+            forecast_revenue=-self.forecast_revenue,
+            actual_revenue=-self.actual_revenue,
+            status_counts=Counter({k: -v for k, v in self.status_counts.items()}),
+            project_count=-self.project_count,
+        )
+
+    def is_empty(self) -> bool:
+        return not (
+            self.job_count
+            or self.forecast_revenue
+            or self.actual_revenue
+            or self.project_count
+            or any(self.status_counts.values())
+        )
+
+    def apply_to(self, row) -> None:
+        drifted = []
+        row.job_count = self._clamped(row, "job_count", self.job_count, drifted)
+        row.forecast_revenue += self.forecast_revenue
+        row.actual_revenue += self.actual_revenue
+        counts = Counter(row.status_counts or {})
+        counts.update(self.status_counts)
+        drifted += [status for status, n in counts.items() if n < 0]
+        row.status_counts = {status: n for status, n in counts.items() if n > 0}
+        if hasattr(row, "project_count"):
+            row.project_count = self._clamped(
+                row, "project_count", self.project_count, drifted
+            )
+        if drifted:
+            # Exact deltas never go below zero, so the row had already drifted.
+            logger.warning(
+                "%s %s counts went negative (%s); clamped to zero, run "
+                "rebuild_rollups to repair it",
+                type(row).__name__,
+                row.pk,
+                ", ".join(drifted),
+            )
+
+    @staticmethod
+    def _clamped(row, name: str, delta: int, drifted: list[str]) -> int:
+        # The count columns are unsigned, so a negative value can't be saved.
+        value = getattr(row, name) + delta
+        if value < 0:
+            drifted.append(name)
+        return max(value, 0)
+
+
+def _apply(model, deltas: dict[int, RollupDelta], extra_fields=()) -> None:
+    deltas = {pk: delta for pk, delta in deltas.items() if not delta.is_empty()}
+    if not deltas:
+        return
+    # Rows are only created for parents that gained jobs/projects; a parent that
+    # is being cascade-deleted may already have lost its rollup row.
+    model.objects.bulk_create(
+        [model(pk=pk) for pk, delta in deltas.items() if delta.creates_row],
+        ignore_conflicts=True,
+    )
+    rows = list(model.objects.select_for_update().filter(pk__in=deltas))
+    now = timezone.now()
+    for row in rows:
+        deltas[row.pk].apply_to(row)
+        row.updated_at = now
+    model.objects.bulk_update(rows, [*TOTAL_FIELDS, *extra_fields, "updated_at"])
+
+
+def _client_ids(project_ids: Iterable[int]) -> dict[int, int]:
+    return dict(
+        Project.objects.filter(pk__in=set(project_ids)).values_list("id", "client_id")
+    )
+
+
+def apply_job_changes(
+    changes: Iterable[tuple[JobState | None, JobState | None]],
+) -> None:
+    """Apply ``(previous, current)`` job state pairs to the rollup tables.
+
+    ``previous`` is ``None`` for new jobs and ``current`` is ``None`` for
+    deleted jobs.
+    """
+    project_deltas: dict[int, RollupDelta] = defaultdict(RollupDelta)
+    for previous, current in changes:
+        if previous == current:
+            continue
+        if previous is not None:
+            project_deltas[previous.project_id].add(previous, sign=-1)
+        if current is not None:
+            project_deltas[current.project_id].add(current)
+            project_deltas[current.project_id].creates_row = True
+    if not project_deltas:
+        return
+
+    client_ids = _client_ids(project_deltas)
+    client_deltas: dict[int, RollupDelta] = defaultdict(RollupDelta)
+    for project_id, delta in project_deltas.items():
+        client_id = client_ids.get(project_id)
+        if client_id is not None:
+            client_deltas[client_id].merge(delta)
+
+    with transaction.atomic():
+        _apply(ProjectRollup, project_deltas)
+        _apply(ClientRollup, client_deltas, extra_fields=["project_count"])
+
+
+def adjust_project_count(client_id: int, change: int) -> None:
+    delta = RollupDelta(project_count=change, creates_row=change > 0)
+    with transaction.atomic():
+        _apply(ClientRollup, {client_id: delta}, extra_fields=["project_count"])
+
+
+def _project_delta(
+    job_count, forecast_revenue, actual_revenue, status_counts
+) -> RollupDelta:
+    """A project's rollup totals (None when it has no row) as a delta."""
+    return RollupDelta(
+        job_count=job_count or 0,
+        forecast_revenue=_as_decimal(forecast_revenue),
+        actual_revenue=_as_decimal(actual_revenue),
+        status_counts=Counter(status_counts or {}),
+        project_count=1,
+    )
+
+
+_PROJECT_TOTALS = (
+    "rollup__job_count",
+    "rollup__forecast_revenue",
+    "rollup__actual_revenue",
+    "rollup__status_counts",
+)
+
+
+def move_project(project_id: int, old_client_id: int, new_client_id: int) -> None:
+    """Move a project's totals from one client rollup to another."""
+    with transaction.atomic():
+        totals = (
+            Project.objects.filter(pk=project_id).values_list(*_PROJECT_TOTALS).first()
+        )
+        moved = _project_delta(*(totals or (None,) * 4))
+        removed = moved.negated()
+        moved.creates_row = True
+        _apply(
+            ClientRollup,
+            {old_client_id: removed, new_client_id: moved},
+            extra_fields=["project_count"],
+        )
+
+
+class ProjectRemoval:
+    """Client rollup deltas for projects deleted together.
+
+    Built before the delete from one query over ``projects``; each deleted
+    project is ticked off with ``deleted`` and the combined delta is applied
+    once the last one is gone.
+    """
+
+    def __init__(self, projects: QuerySet[Project]):
+        self.pending: set[int] = set()
+        self.deltas: dict[int, RollupDelta] = defaultdict(RollupDelta)
+        for pk, client_id, *totals in projects.values_list(
+            "pk", "client_id", *_PROJECT_TOTALS
+        ):
+            self.pending.add(pk)
+            self.deltas[client_id].merge(_project_delta(*totals).negated())
+
+    def deleted(self, project_id: int) -> bool:
+        """Record a deleted project; True once the deltas have been applied."""
+        self.pending.discard(project_id)
+        if self.pending:
+            return False
+        with transaction.atomic():
+            _apply(ClientRollup, self.deltas, extra_fields=["project_count"])
+        return True
+
+
+def _totals_by_key(rows, key: str) -> dict[int, dict]:
+    totals: dict[int, dict] = {}
+    for row in rows:
+        entry = totals.setdefault(
+            row[key],
+            {
+                "job_count": 0,
+                "forecast_revenue": ZERO,
+                "actual_revenue": ZERO,
+                "status_counts": {},
+            },
+        )
+        entry["job_count"] += row["count"]
+        entry["forecast_revenue"] += _as_decimal(row["forecast"])
+        entry["actual_revenue"] += _as_decimal(row["actual"])
+        entry["status_counts"][row["status"]] = row["count"]
+    return totals
+
+
+def _job_totals(group_by: str, **filters):
+    return (
+        Job.objects.filter(**filters)
+        .values(group_by, "status")
+        .annotate(
+            count=Count("id"),
+            forecast=Sum("forecast_revenue"),
+            actual=Sum("actual_revenue"),
+        )
+        .order_by()
+    )
+
+
+def _chunked_ids(model, chunk_size: int):
+    last_id = 0
+    while True:
+        ids = list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def rebuild_rollups(chunk_size: int = 500) -> tuple[int, int]:
+    """Recompute every rollup row from scratch, ``chunk_size`` parents at a time.
+
+    Returns the number of project and client rollups written.
+    """
+    projects_written = 0
+    for ids in _chunked_ids(Project, chunk_size):
+        totals = _totals_by_key(
+            _job_totals("project_id", project_id__in=ids), "project_id"
+        )
+        now = timezone.now()
+        rows = [
+            ProjectRollup(project_id=pk, updated_at=now, **totals.get(pk, {}))
+            for pk in ids
+        ]
+        with transaction.atomic():
+            ProjectRollup.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["project"],
+                update_fields=[*TOTAL_FIELDS, "updated_at"],
+            )
+        projects_written += len(rows)
+
+    clients_written = 0
+    for ids in _chunked_ids(Client, chunk_size):
+        totals = _totals_by_key(
+            _job_totals("project__client_id", project__client_id__in=ids),
+            "project__client_id",
+        )
+        project_counts = dict(
+            Project.objects.filter(client_id__in=ids)
+            .values("client_id")
+            .annotate(count=Count("id"))
+            .order_by()
+            .values_list("client_id", "count")
+        )
+        now = timezone.now()
+        rows = [
+            ClientRollup(
+                client_id=pk,
+                project_count=project_counts.get(pk, 0),
+                updated_at=now,
+                **totals.get(pk, {}),
+            )
+            for pk in ids
+        ]
+        with transaction.atomic():
+            ClientRollup.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["client"],
+                update_fields=[*TOTAL_FIELDS, "project_count", "updated_at"],
+            )
+        clients_written += len(rows)
+    return projects_written, clients_written
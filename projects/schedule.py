@@ -0,0 +1,87 @@
+"""Denormalized milestone schedule fields on Job.
+
+``Job.current_stage`` is the stage of the most recently completed milestone
+(latest ``actual_date``), and ``next_milestone_stage``/``next_milestone_date``
+describe the earliest-planned milestone that has no ``actual_date`` yet, so an
+overdue milestone stays "next" until it is completed.  Milestone signals call
+``refresh_job_schedule``; code that writes milestones with ``bulk_create``,
+``bulk_update`` or ``QuerySet.update`` must call it for the affected jobs.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, NamedTuple
+
+from .models import Job, Milestone, MilestoneStage
+
+SCHEDULE_FIELDS = ["current_stage", "next_milestone_stage", "next_milestone_date"]
+_STAGE_ORDER = {stage: index for index, stage in enumerate(MilestoneStage.values)}
+
+
+class JobSchedule(NamedTuple):
+    current_stage: str = ""
+    next_milestone_stage: str = ""
+    next_milestone_date: date | None = None
+
+
+def compute_schedule(
+    milestones: Iterable[tuple[str, date | None, date | None]],
+) -> JobSchedule:
+    """Schedule for one job from ``(stage, planned_date, actual_date)`` rows."""
+    completed = None
+    upcoming = None
+    for stage, planned, actual in milestones:
+        order = _STAGE_ORDER.get(stage, -1)
+        if actual is not None:
+            key = (actual, order)
+            if completed is None or key > completed[0]:
+                completed = (key, stage)
+        elif planned is not None:
+            key = (planned, order)
+            if upcoming is None or key < upcoming[0]:
+                upcoming = (key, stage)
+    return JobSchedule(
+        current_stage=completed[1] if completed else "",
+        next_milestone_stage=upcoming[1] if upcoming else "",
+        next_milestone_date=upcoming[0][0] if upcoming else None,
+    )
+
+
+def _chunks(ids: list[int], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def refresh_job_schedule(job_ids: Iterable[int], chunk_size: int = 500) -> int:
+    """Recompute the schedule fields of ``job_ids``; return the jobs changed.
+
+    Only jobs whose stored values differ are written, with one ``bulk_update``
+    per chunk.  ``updated_at`` is left alone because nothing a user edited
+    changed.
+    """
+    changed = 0
+    for ids in _chunks(sorted(set(job_ids)), chunk_size):
+        rows = defaultdict(list)
+        for job_id, *milestone in Milestone.objects.filter(job_id__in=ids).values_list(
+            "job_id", "stage", "planned_date", "actual_date"
+        ):
+            rows[job_id].append(milestone)
+        stale = []
+        for job_id, *stored in Job.objects.filter(pk__in=ids).values_list(
+            "id", *SCHEDULE_FIELDS
+        ):
+            schedule = compute_schedule(rows.get(job_id, ()))
+            if tuple(schedule) != tuple(stored):
+                stale.append(Job(pk=job_id, **schedule._asdict()))
+        if stale:
+            Job.objects.bulk_update(stale, SCHEDULE_FIELDS)
+            changed += len(stale)
+    return changed
+
+
+def refresh_all_job_schedules(chunk_size: int = 500) -> int:
+    return refresh_job_schedule(
+        Job.objects.values_list("pk", flat=True).iterator(chunk_size=chunk_size),
+        chunk_size=chunk_size,
+    )
@@ -1,54 +1,231 @@
 from __future__ import annotations
 
-from typing import Iterable
+import itertools
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Iterable
 
-from django.db.models import Prefetch, QuerySet, Sum
+from django.db import transaction
+from django.db.models import Prefetch, Q, QuerySet
+from django.utils import timezone
 
 from accounts.models import User
 
-from .models import Client, Job, Milestone, Project
+from . import rollups, tasks
+from .models import Client, ClientAccess, ExportJob, Job, Milestone, Project
+from .schedule import compute_schedule
+
+
+@dataclass(frozen=True)
+class AccessScope:
+    """The clients a user may see, resolved once and reused for the request."""
+
+    unrestricted: bool
+    client_ids: frozenset[int] = frozenset()
+
+    def filter(self, queryset: QuerySet, client_field: str = "pk") -> QuerySet:
+        """Limit ``queryset`` to the scope; ``client_field`` points at Client."""
+        if self.unrestricted:
+            return queryset
+        return queryset.filter(**{f"{client_field}__in": self.client_ids})
+
+
+def access_scope(user: User) -> AccessScope:
+    """Return the user's AccessScope, memoized on the user object.
+
+    ``request.user`` is loaded per request, so the memo lives as long as the
+    request does; long-lived user objects should be re-fetched to pick up
+    assignment changes.
+    """
+    scope = getattr(user, "_access_scope", None)
+    if scope is None:
+        if user.is_superuser or user.role in {User.Role.INTERNAL, User.Role.SIKLA}:
+            scope = AccessScope(unrestricted=True)
+        else:
+            scope = AccessScope(
+                unrestricted=False,
+                client_ids=frozenset(
+                    ClientAccess.objects.filter(user=user).values_list(
+                        "client_id", flat=True
+                    )
+                ),
+            )
+        user._access_scope = scope
+    return scope
 
 
 def clients_for_user(user: User) -> QuerySet[Client]:
-    if user.is_superuser or user.role in {User.Role.INTERNAL, User.Role.SIKLA}:
-        return Client.objects.all()
-    return Client.objects.filter(access_assignments__user=user).distinct()
+    return access_scope(user).filter(Client.objects.all())
 
 
 def projects_for_user(user: User) -> QuerySet[Project]:
-    if user.is_superuser or user.role in {User.Role.INTERNAL, User.Role.SIKLA}:
-        return Project.objects.select_related("client")
-    client_ids = clients_for_user(user).values_list("id", flat=True)
-    return Project.objects.filter(client_id__in=client_ids).select_related("client")
+    return access_scope(user).filter(
+        Project.objects.select_related("client"), "client_id"
+    )
 
 
 def jobs_for_user(user: User) -> QuerySet[Job]:
     qs = Job.objects.select_related(
         "project__client", "owner", "design_manager", "client_contact"
     )
-    if user.is_superuser or user.role in {User.Role.INTERNAL, User.Role.SIKLA}:
-        return qs
-    client_ids = clients_for_user(user).values_list("id", flat=True)
-    return qs.filter(project__client_id__in=client_ids)
+    return access_scope(user).filter(qs, "project__client_id")
 
 
-def job_milestones_prefetched(user: User) -> QuerySet[Job]:
+def internal_users() -> QuerySet[User]:
+    return User.objects.filter(
+        Q(role__in=[User.Role.INTERNAL, User.Role.SIKLA]) | Q(is_superuser=True)
+    )
+
+
+def client_contacts_for_user(user: User) -> QuerySet[User]:
+    """Users assigned to any client within ``user``'s scope."""
+    assignments = access_scope(user).filter(ClientAccess.objects.all(), "client_id")
+    return User.objects.filter(pk__in=assignments.values("user_id"))
+
+
+def job_milestones_prefetched(
+    user: User, milestones: QuerySet[Milestone] | None = None
+) -> QuerySet[Job]:
+    if milestones is None:
+        milestones = Milestone.objects.order_by("planned_date")
     return jobs_for_user(user).prefetch_related(
-        Prefetch("milestones", queryset=Milestone.objects.order_by("planned_date"))
+        Prefetch("milestones", queryset=milestones)
     )
 
 
+class InvalidCursor(ValueError):
+    """A ``keyset_page`` cursor that wasn't produced by ``keyset_page``."""
+
+
+def _parse_cursor(after: str) -> tuple[datetime, int]:
+    """The ``(created_at, id)`` in a ``keyset_page`` cursor."""
+    try:
+        created_at, pk = after.rsplit("_", 1)
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        raise InvalidCursor(f"Invalid page cursor {after!r}.")
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return created_at, pk
+
+
+def keyset_page(
+    queryset: QuerySet, after: str | None = None, size: int = 20
+) -> tuple[list, str | None]:
+    """Return one page of ``queryset``, newest first, and the next cursor.
+
+    Pages are keyed on ``(created_at, id)`` rather than an offset, so each page
+    is an index range scan however deep the reader goes.  ``after`` is the
+    cursor returned for the previous page; a malformed one raises
+    ``InvalidCursor``.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    if after:
+        created_at, pk = _parse_cursor(after)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+    items = list(queryset[: size + 1])
+    if len(items) <= size:
+        return items, None
+    items = items[:size]
+    last = items[-1]
+    return items, f"{last.created_at.isoformat()}_{last.pk}"
+
+
 def client_summary_data(client: Client) -> dict[str, Iterable]:
+    if not hasattr(client, "actual_revenue_total"):
+        client = Client.objects.with_rollups().get(pk=client.pk)
     jobs = (
-        client.jobs.select_related("project")
+        Job.objects.filter(project__client=client)
+        .select_related("project")
         .prefetch_related("milestones")
-        .annotate(
-            forecast_total=Sum("forecast_revenue"),
-            actual_total=Sum("actual_revenue"),
-        )
+        .order_by("project__reference", "reference")
     )
     return {
         "jobs": jobs,
-        "actual_revenue": client.revenue_actual,
-        "forecast_revenue": client.revenue_forecast,
+        "project_count": client.project_count,
+        "actual_revenue": client.actual_revenue_total,
+        "forecast_revenue": client.forecast_revenue_total,
     }
+
+
+MilestoneDates = dict[str, tuple[date | None, date | None]]
+
+
+def job_milestones(
+    jobs: Iterable[Job], dates: Iterable[MilestoneDates] | None = None
+) -> list[Milestone]:
+    """One milestone per stage for each of ``jobs``.
+
+    Milestones are blank unless ``dates`` gives each job's
+    ``{stage: (planned, actual)}``, in the same order as ``jobs``.
+    """
+    milestones = []
+    for job, stages in zip(jobs, dates or itertools.repeat({})):
+        for stage in Milestone.Stage.values:
+            planned, actual = stages.get(stage, (None, None))
+            milestones.append(
+                Milestone(
+                    job_id=job.pk,
+                    stage=stage,
+                    planned_date=planned,
+                    actual_date=actual,
+                )
+            )
+    return milestones
+
+
+def bulk_create_jobs(
+    jobs: Iterable[Job],
+    batch_size: int = 500,
+    milestone_dates: Callable[[Job], MilestoneDates] | None = None,
+) -> list[Job]:
+    """Insert ``jobs`` and their milestones with a few statements per batch.
+
+    The INSERT count grows with ``len(jobs) / batch_size`` rather than with
+    the number of jobs; SQLite also caps a batch at 999 parameters, so
+    milestones go in batches of at most 142 rows.  ``bulk_create`` skips the
+    Job signals, so this also creates the milestones, applies the rollup
+    deltas and invalidates cached exports itself.  Milestones are blank unless
+    ``milestone_dates`` returns ``{stage: (planned, actual)}`` for a job, in
+    which case the job's schedule fields are filled in to match.
+    """
+    from .export_cache import bump_export_generation
+
+    jobs = list(jobs)
+    dates = None
+    if milestone_dates is not None:
+        dates = [milestone_dates(job) for job in jobs]
+        for job, stages in zip(jobs, dates):
+            schedule = compute_schedule(
+                (stage, planned, actual)
+                for stage, (planned, actual) in stages.items()
+            )
+            for name, value in schedule._asdict().items():
+                setattr(job, name, value)
+    with transaction.atomic():
+        created = Job.objects.bulk_create(jobs, batch_size=batch_size)
+        Milestone.objects.bulk_create(
+            job_milestones(created, dates), batch_size=batch_size
+        )
+        rollups.apply_job_changes(
+            (None, rollups.job_state(job)) for job in created
+        )
+        bump_export_generation()
+    return created
+
+
+def queue_job_export(
+    user: User, export_format: str, parameters: dict | None = None
+) -> ExportJob:
+    """Record an ExportJob and build it on the background executor."""
+    from .exports import run_export_job
+
+    export = ExportJob.objects.create(
+        requested_by=user,
+        export_format=export_format,
+        parameters=parameters or {},
+    )
+    transaction.on_commit(lambda: tasks.submit(run_export_job, export.pk))
+    return export
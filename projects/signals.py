@@ -1,16 +1,195 @@
-from django.db.models.signals import post_save
+from django.core.signals import request_finished
+from django.db import models
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 
-from .models import Job, Milestone
+from accounts.models import User
+
+from . import auditing, choices, rollups, schedule, slow_queries
+from .export_cache import bump_export_generation
+from .models import Client, ClientAccess, Job, Milestone, Project
+from .services import job_milestones
 
 
 @receiver(post_save, sender=Job)
-def ensure_milestones_exist(sender, instance: Job, created: bool, **kwargs):
-    if not created:
+def ensure_milestones_exist(
+    sender, instance: Job, created: bool, raw: bool = False, **kwargs
+):
+    if not created or raw:
         return
-    existing_stages = set(
-        instance.milestones.values_list("stage", flat=True)
+    # One INSERT; stages that already exist are skipped by (job, stage).
+    Milestone.objects.bulk_create(job_milestones([instance]), ignore_conflicts=True)
+
+
+def _origin_model(origin):
+    """The model whose deletion started a cascade (``origin`` of the signal)."""
+    if isinstance(origin, models.Model):
+        return type(origin)
+    return getattr(origin, "model", None)
+
+
+@receiver(pre_save, sender=Job)
+def remember_job_rollup_state(sender, instance: Job, raw: bool = False, **kwargs):
+    # Read on save rather than on every load (post_init), which would cost
+    # each row of every job list and export.
+    instance._rollup_state = (
+        None if raw or instance.pk is None else rollups.stored_job_state(instance.pk)
     )
-    for stage, _ in Milestone.Stage.choices:
-        if stage not in existing_stages:
-            Milestone.objects.create(job=instance, stage=stage)
+
+
+@receiver(post_save, sender=Job)
+def update_rollups_on_job_save(
+    sender,
+    instance: Job,
+    created: bool,
+    raw: bool = False,
+    update_fields=None,
+    **kwargs,
+):
+    if raw:
+        return
+    previous = None if created else instance._rollup_state
+    current = rollups.job_state(
+        instance, previous=previous, update_fields=update_fields
+    )
+    rollups.apply_job_changes([(previous, current)])
+
+
+@receiver(post_delete, sender=Job)
+def update_rollups_on_job_delete(sender, instance: Job, origin=None, **kwargs):
+    # Cascades from a project or client take the project's totals off in
+    # one go (see update_rollups_on_project_delete).
+    if _origin_model(origin) in (Project, Client):
+        return
+    rollups.apply_job_changes([(rollups.job_state(instance), None)])
+
+
+@receiver(post_save, sender=Milestone)
+def refresh_schedule_on_milestone_save(
+    sender, instance: Milestone, created: bool, raw: bool = False, **kwargs
+):
+    # New undated milestones (e.g. from ensure_milestones_exist) change nothing.
+    if raw or (created and not (instance.planned_date or instance.actual_date)):
+        return
+    schedule.refresh_job_schedule([instance.job_id])
+
+
+@receiver(post_delete, sender=Milestone)
+def refresh_schedule_on_milestone_delete(
+    sender, instance: Milestone, origin=None, **kwargs
+):
+    # Skip cascades from deleting the job (or its project/client).
+    if _origin_model(origin) is Milestone:
+        schedule.refresh_job_schedule([instance.job_id])
+
+
+@receiver(post_init, sender=Project)
+def remember_project_client(sender, instance: Project, **kwargs):
+    instance._rollup_client_id = instance.__dict__.get("client_id")
+
+
+@receiver(post_save, sender=Project)
+def update_rollups_on_project_save(
+    sender,
+    instance: Project,
+    created: bool,
+    raw: bool = False,
+    update_fields=None,
+    **kwargs,
+):
+    if raw or (update_fields is not None and "client" not in update_fields):
+        return
+    client_id = instance.client_id
+    if created:
+        rollups.adjust_project_count(client_id, 1)
+    elif instance._rollup_client_id not in (None, client_id):
+        rollups.move_project(instance.pk, instance._rollup_client_id, client_id)
+    instance._rollup_client_id = client_id
+
+
+@receiver(pre_delete, sender=Project)
+def prepare_project_rollup_removal(
+    sender, instance: Project, origin=None, **kwargs
+):
+    # The client's rollup row goes with the client.
+    if _origin_model(origin) is Client:
+        return
+    # One removal covers every project of a QuerySet.delete(); it is kept on
+    # the origin, which the delete passes to every signal.
+    holder = origin if origin is not None else instance
+    if getattr(holder, "_rollup_removal", None) is None:
+        projects = (
+            origin
+            if isinstance(origin, models.QuerySet)
+            else Project.objects.filter(pk=instance.pk)
+        )
+        holder._rollup_removal = rollups.ProjectRemoval(projects)
+
+
+@receiver(post_delete, sender=Project)
+def update_rollups_on_project_delete(
+    sender, instance: Project, origin=None, **kwargs
+):
+    holder = origin if origin is not None else instance
+    removal = getattr(holder, "_rollup_removal", None)
+    if removal is not None and removal.deleted(instance.pk):
+        holder._rollup_removal = None
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(post_save, sender=Milestone)
+@receiver(post_delete, sender=Milestone)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_export_cache(sender, raw: bool = False, **kwargs):
+    if not raw:
+        bump_export_generation()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_export_cache_on_user_change(
+    sender, raw: bool = False, update_fields=None, **kwargs
+):
+    # Exports show owner, design manager and contact names; a login only
+    # saves last_login.
+    if raw or (update_fields is not None and set(update_fields) == {"last_login"}):
+        return
+    bump_export_generation()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=ClientAccess)
+@receiver(post_delete, sender=ClientAccess)
+def invalidate_user_choices(sender, update_fields=None, **kwargs):
+    # Logins save last_login only; that never changes a choice label.
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    choices.invalidate_user_choices()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_choices(sender, **kwargs):
+    choices.invalidate_project_choices()
+
+
+@receiver(request_finished)
+def flush_audit_entries(sender, **kwargs):
+    auditing.flush_audit_sink()
+
+
+@receiver(connection_created)
+def watch_for_slow_queries(sender, connection, **kwargs):
+    slow_queries.install(connection)
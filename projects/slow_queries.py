@@ -0,0 +1,150 @@
+"""Slow query log.
+
+Every database connection gets an execute wrapper (installed from the
+``connection_created`` signal) that times each statement.  Statements slower
+than ``SLOW_QUERY_MS`` are logged to the ``projects.slow_queries`` logger with
+their SQL, the view being served (set by ``PerformanceMiddleware``) and where
+they came from (``query_origin``).  The first slow ``SELECT`` of each shape
+(``normalize_sql``) is explained on the spot (``EXPLAIN QUERY PLAN`` on
+SQLite) so missing indexes show up without reproducing the query; later ones
+carry the same ``shape`` to join on.
+
+Parameters can hold password hashes, session keys and client data, so they
+are only logged with ``SLOW_QUERY_LOG_PARAMS``, and never for statements on
+the user, ``auth_*`` or session tables.
+
+``settings.LOGGING`` sends the logger to a rotating JSON-lines file,
+``SLOW_QUERY_LOG``; each line is one ``json.loads``-able record.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .instrumentation import ignore_frames_from, normalize_sql, query_origin
+
+logger = logging.getLogger(__name__)
+
+# Resolved view name of the request being served, if any.
+current_view: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_view", default=None
+)
+_EXPLAINABLE = ("SELECT", "WITH")
+_SENSITIVE_TABLES = re.compile(r'"?\b(?:auth_\w+|django_session)\b"?')
+# Shapes already explained by this process; bounded so odd ad-hoc SQL can't
+# grow it forever.
+_explained: set[str] = set()
+_explained_lock = threading.Lock()
+MAX_EXPLAINED_SHAPES = 10_000
+ignore_frames_from(__file__)
+
+
+def _touches_sensitive_table(sql: str) -> bool:
+    from django.contrib.auth import get_user_model
+
+    user_table = get_user_model()._meta.db_table
+    return bool(_SENSITIVE_TABLES.search(sql)) or f'"{user_table}"' in sql
+
+
+def _first_of_shape(shape: str) -> bool:
+    with _explained_lock:
+        if shape in _explained or len(_explained) >= MAX_EXPLAINED_SHAPES:
+            return False
+        _explained.add(shape)
+        return True
+
+
+def explain(connection, sql: str, params) -> list[str] | None:
+    """The database's plan for ``sql``, one line per row, or None."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    # Detach the wrappers so QueryRecorder and friends don't count the
+    # EXPLAIN (and this wrapper doesn't log it).
+    wrappers, connection.execute_wrappers = connection.execute_wrappers, []
+    try:
+        # A savepoint keeps a failed EXPLAIN from breaking the caller's
+        # transaction on PostgreSQL.
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {sql}", params)
+                rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        connection.execute_wrappers = wrappers
+    return [" | ".join(str(value) for value in row) for row in rows]
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    threshold = getattr(settings, "SLOW_QUERY_MS", None)
+    if not threshold:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - start) * 1000
+    if duration >= threshold:
+        _log(context["connection"], sql, params, many, duration)
+    return result
+
+
+def _log(connection, sql: str, params, many: bool, duration: float) -> None:
+    origin = query_origin()
+    shape = normalize_sql(sql)
+    log_params = getattr(settings, "SLOW_QUERY_LOG_PARAMS", False)
+    if log_params and _touches_sensitive_table(sql):
+        log_params = False
+    record = {
+        "timestamp": timezone.now().isoformat(),
+        "duration_ms": round(duration, 2),
+        "database": connection.alias,
+        "vendor": connection.vendor,
+        "view": current_view.get(),
+        "origin": origin.frame,
+        "template": origin.template,
+        "sql": sql,
+        "shape": shape,
+        "params": params if log_params else None,
+        "many": many,
+        "explain": (
+            explain(connection, sql, params)
+            if not many and _first_of_shape(shape)
+            else None
+        ),
+    }
+    logger.warning(
+        "Slow query (%.0f ms) in %s", duration, record["view"] or "-",
+        extra={"slow_query": record},
+    )
+
+
+def install(connection) -> None:
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = getattr(record, "slow_query", None) or {
+            "timestamp": timezone.now().isoformat(),
+            "message": record.getMessage(),
+        }
+        return json.dumps(payload, default=str)
+
+
+class JsonLinesFileHandler(RotatingFileHandler):
+    """``RotatingFileHandler`` that creates the log directory on first use."""
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
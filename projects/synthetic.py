@@ -0,0 +1,402 @@
+"""Deterministic synthetic data at production scale for ``seed_demo``.
+
+Every row comes from one ``random.Random(seed)``, so the same options produce
+the same portfolio (apart from timestamps).  Jobs are generated
+project by project and written ``chunk_size`` at a time through
+``bulk_create_jobs`` together with their dated milestones, then their notes
+and audit entries with ``insert_rows``, so memory stays flat however many
+rows are requested.
+
+Statuses follow ``STATUS_WEIGHTS``.  Each job's milestones are planned a few
+weeks apart; stages up to the one its status has reached (``STATUS_STAGES``)
+have an actual date that slips a little around the plan, and a job's start is
+placed so its current stage falls around today.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from accounts.models import User
+
+from . import choices
+from .export_cache import bump_export_generation
+from .models import (
+    STATUS_STAGES,
+    Client,
+    ClientAccess,
+    ClientRollup,
+    Job,
+    JobAttachment,
+    JobAuditLog,
+    JobNote,
+    Milestone,
+    Project,
+    ProjectRollup,
+)
+from .services import MilestoneDates, bulk_create_jobs
+
+SYNTHETIC_PREFIX = "synthetic."
+SYNTHETIC_PASSWORD = "Demo123!"
+
+# Relative share of jobs in each status, weighted towards finished work the
+# way a live portfolio is.
+STATUS_WEIGHTS = {
+    Job.Status.PENDING_REQUIREMENTS: 4,
+    Job.Status.REQUIREMENTS_ANALYSIS: 5,
+    Job.Status.DRAWINGS_WIP: 10,
+    Job.Status.PENDING_CLIENT_APPROVAL: 8,
+    Job.Status.APPROVED_PENDING_FABRICATION: 6,
+    Job.Status.IN_FABRICATION: 12,
+    Job.Status.IN_QUALITY_CONTROL: 5,
+    Job.Status.READY_TO_BE_SHIPPED: 4,
+    Job.Status.SHIPPED: 11,
+    Job.Status.COMPLETED: 35,
+}
+PROJECT_STATUS_WEIGHTS = {
+    Project.Status.PLANNING: 1,
+    Project.Status.ACTIVE: 6,
+    Project.Status.HOLD: 1,
+    Project.Status.COMPLETE: 2,
+}
+JOB_TITLES = [
+    "Pipe run",
+    "Process pipe",
+    "Plant room",
+    "Rooftop",
+    "Riser",
+    "Cable tray",
+    "Duct supports",
+    "Utility corridor",
+    "Skid frame",
+    "Mezzanine",
+]
+NOTE_BODIES = [
+    "Drawings issued for comment.",
+    "Client requested a revision to the support spacing.",
+    "Materials ordered.",
+    "Site survey completed; dimensions confirmed.",
+    "Fabrication slot booked.",
+    "QC found minor weld defects; rework scheduled.",
+    "Delivery agreed with site manager.",
+]
+AUDIT_FIELDS = ["status", "anticipated_completion", "forecast_revenue", "notes"]
+CLEARED_MODELS = [
+    JobAttachment,
+    JobNote,
+    JobAuditLog,
+    Milestone,
+    Job,
+    ProjectRollup,
+    ClientRollup,
+    Project,
+    ClientAccess,
+    Client,
+]
+
+
+@dataclass
+class SyntheticSpec:
+    clients: int = 50
+    projects_per_client: int = 5
+    jobs_per_project: int = 20
+    notes_per_job: int = 2
+    audit_per_job: int = 3
+    staff: int = 20
+    seed: int = 0
+    chunk_size: int = 2000
+
+
+@dataclass
+class SyntheticResult:
+    clients: int = 0
+    projects: int = 0
+    jobs: int = 0
+    milestones: int = 0
+    notes: int = 0
+    audit_entries: int = 0
+
+
+def clear_portfolio() -> None:
+    """Empty the client, project and job tables in a few statements.
+
+    ``QuerySet.delete`` would load every row to run the signals and cascades,
+    which takes hours at this scale.
+    """
+    tables = [model._meta.db_table for model in CLEARED_MODELS]
+    with transaction.atomic():
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables))
+        User.objects.filter(username__startswith=SYNTHETIC_PREFIX).delete()
+    invalidate_caches()
+
+
+def invalidate_caches() -> None:
+    """Drop cached exports and choice lists, which the flush and bulk inserts
+    don't signal."""
+    bump_export_generation()
+    choices.invalidate_user_choices()
+    choices.invalidate_project_choices()
+
+
+def insert_rows(
+    model: type[Model],
+    columns: list[str],
+    rows: Iterable[tuple],
+    using: str = DEFAULT_DB_ALIAS,
+) -> None:
+    """Insert ``rows`` into ``model``'s table with one ``executemany`` call.
+
+    Values must already be in database form (``connection.ops.adapt_*`` of
+    the ``using`` connection).  This skips building model instances and
+    preparing each value, which is most of the cost of ``bulk_create`` at
+    hundreds of thousands of rows.  The driver may still send one INSERT per
+    row; on SQLite that is cheap inside a transaction.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(column) for column in columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _weighted(rng: random.Random, weights: dict) -> Callable[[], str]:
+    population, cumulative = list(weights), []
+    total = 0
+    for weight in weights.values():
+        total += weight
+        cumulative.append(total)
+    return lambda: rng.choices(population, cum_weights=cumulative)[0]
+
+
+class SyntheticPortfolio:
+    def __init__(self, spec: SyntheticSpec, progress: Callable[[str], None] = print):
+        self.spec = spec
+        self.progress = progress
+        self.rng = random.Random(spec.seed)
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        self.stages = Milestone.Stage.values
+        self.job_status = _weighted(self.rng, STATUS_WEIGHTS)
+        self.project_status = _weighted(self.rng, PROJECT_STATUS_WEIGHTS)
+        self.result = SyntheticResult()
+
+    def _users(self) -> tuple[list[User], dict[int, int]]:
+        password = make_password(SYNTHETIC_PASSWORD)
+        staff = User.objects.bulk_create(
+            User(
+                username=f"{SYNTHETIC_PREFIX}staff{index:03d}",
+                first_name="Staff",
+                last_name=f"{index:03d}",
+                # Every fifth member of staff is a Sikla user.
+                role=User.Role.SIKLA if index % 5 == 4 else User.Role.INTERNAL,
+                is_staff=True,
+                can_view_finance=index % 3 == 0,
+                password=password,
+            )
+            for index in range(max(self.spec.staff, 1))
+        )
+        clients = Client.objects.bulk_create(
+            Client(
+                name=f"Synthetic client {index:05d}",
+                account_code=f"SYN{index:05d}",
+                city="London",
+                country="UK",
+                account_manager=self.rng.choice(staff),
+            )
+            for index in range(self.spec.clients)
+        )
+        contacts = User.objects.bulk_create(
+            User(
+                username=f"{SYNTHETIC_PREFIX}client{index:05d}",
+                first_name="Contact",
+                last_name=f"{index:05d}",
+                role=User.Role.CLIENT,
+                password=password,
+            )
+            for index in range(self.spec.clients)
+        )
+        ClientAccess.objects.bulk_create(
+            [
+                ClientAccess(client=client, user=contact, is_primary=True)
+                for client, contact in zip(clients, contacts)
+            ],
+            batch_size=500,
+        )
+        self.result.clients = len(clients)
+        return staff, {
+            client.pk: contact.pk for client, contact in zip(clients, contacts)
+        }
+
+    def _projects(self, client_contacts: dict[int, int]) -> list[Project]:
+        projects = []
+        for client_number, client_id in enumerate(client_contacts):
+            for index in range(self.spec.projects_per_client):
+                start = self.today - timedelta(days=self.rng.randint(0, 900))
+                projects.append(
+                    Project(
+                        name=f"Project {client_number:05d}-{index:03d}",
+                        reference=f"SYN-{client_number:05d}-{index:03d}",
+                        client_id=client_id,
+                        status=self.project_status(),
+                        start_date=start,
+                        end_date=start + timedelta(days=self.rng.randint(90, 720)),
+                    )
+                )
+        projects = Project.objects.bulk_create(projects, batch_size=500)
+        self.result.projects = len(projects)
+        return projects
+
+    def _milestone_dates(self, status: str) -> tuple[date, MilestoneDates]:
+        reached = self.stages.index(STATUS_STAGES[status])
+        gaps = [self.rng.randint(5, 35) for _ in self.stages]
+        # Put the reached stage somewhere in the last few weeks.
+        start = self.today - timedelta(
+            days=sum(gaps[: reached + 1]) + self.rng.randint(0, 21)
+        )
+        dates: MilestoneDates = {}
+        planned = start
+        for index, stage in enumerate(self.stages):
+            planned += timedelta(days=gaps[index])
+            if index <= reached:
+                slip = round(self.rng.triangular(-5, 25, 2))
+                dates[stage] = (planned, min(planned + timedelta(days=slip), self.today))
+            elif self.rng.random() < 0.9:
+                # The rest are planned, bar the odd stage nobody has dated yet.
+                dates[stage] = (planned, None)
+        return start, dates
+
+    def _jobs(self, project: Project, staff: list[User], contact_id: int):
+        for index in range(self.spec.jobs_per_project):
+            status = self.job_status()
+            start, dates = self._milestone_dates(status)
+            forecast = Decimal(round(self.rng.lognormvariate(11, 0.6), -2))
+            progress = (self.stages.index(STATUS_STAGES[status]) + 1) / len(
+                self.stages
+            )
+            last_planned = max(
+                (planned for planned, _ in dates.values() if planned), default=start
+            )
+            job = Job(
+                project=project,
+                reference=f"J{index:05d}",
+                title=self.rng.choice(JOB_TITLES),
+                status=status,
+                owner=self.rng.choice(staff),
+                design_manager=self.rng.choice(staff),
+                client_contact_id=contact_id,
+                anticipated_start=start,
+                anticipated_completion=last_planned,
+                actual_completion=(
+                    dates[Milestone.Stage.DELIVERY][1]
+                    if status in {Job.Status.SHIPPED, Job.Status.COMPLETED}
+                    else None
+                ),
+                forecast_revenue=forecast,
+                actual_revenue=Decimal(round(float(forecast) * progress, -2)),
+            )
+            job._synthetic_dates = dates
+            yield job
+
+    def _timestamp(self, job: Job) -> str:
+        """A time between the job's start and now, in database form."""
+        elapsed = max((self.today - job.anticipated_start).days, 1)
+        moment = self.now - timedelta(seconds=self.rng.randrange(elapsed * 86400))
+        return connection.ops.adapt_datetimefield_value(moment)
+
+    def _write_chunk(self, jobs: list[Job], staff: list[User]) -> None:
+        created = bulk_create_jobs(
+            jobs, milestone_dates=lambda job: job._synthetic_dates
+        )
+        staff_ids = [user.pk for user in staff]
+        notes = []
+        for job in created:
+            for _ in range(self.spec.notes_per_job):
+                stamp = self._timestamp(job)
+                notes.append(
+                    (
+                        job.pk,
+                        self.rng.choice(staff_ids),
+                        self.rng.choice(NOTE_BODIES),
+                        stamp,
+                        stamp,
+                    )
+                )
+        audit = []
+        for job in created:
+            for _ in range(self.spec.audit_per_job):
+                field = self.rng.choice(AUDIT_FIELDS)
+                stamp = self._timestamp(job)
+                audit.append(
+                    (
+                        job.pk,
+                        self.rng.choice(staff_ids),
+                        "job_field_updated",
+                        field,
+                        "",
+                        str(getattr(job, field)),
+                        "",
+                        stamp,
+                        stamp,
+                    )
+                )
+        # Timestamps are spread over each job's life, which bulk_create's
+        # auto_now_add would flatten to one instant.
+        with transaction.atomic():
+            insert_rows(
+                JobNote,
+                ["job_id", "author_id", "body", "created_at", "updated_at"],
+                notes,
+            )
+            insert_rows(
+                JobAuditLog,
+                [
+                    "job_id",
+                    "actor_id",
+                    "action",
+                    "field_name",
+                    "previous_value",
+                    "new_value",
+                    "note",
+                    "created_at",
+                    "updated_at",
+                ],
+                audit,
+            )
+        self.result.jobs += len(created)
+        self.result.milestones += len(created) * len(self.stages)
+        self.result.notes += len(notes)
+        self.result.audit_entries += len(audit)
+        self.progress(f"  {self.result.jobs} jobs written")
+
+    def generate(self) -> SyntheticResult:
+        staff, client_contacts = self._users()
+        projects = self._projects(client_contacts)
+        self.progress(
+            f"Created {self.result.clients} clients and "
+            f"{self.result.projects} projects."
+        )
+        chunk: list[Job] = []
+        for project in projects:
+            contact_id = client_contacts[project.client_id]
+            for job in self._jobs(project, staff, contact_id):
+                chunk.append(job)
+                if len(chunk) >= self.spec.chunk_size:
+                    self._write_chunk(chunk, staff)
+                    chunk = []
+        if chunk:
+            self._write_chunk(chunk, staff)
+        invalidate_caches()
+        return self.result
@@ -0,0 +1,52 @@
+"""Local background executor for work that should not tie up a request worker.
+
+Tasks run on a small per-process thread pool so no external broker is needed.
+Set ``BACKGROUND_TASKS_EAGER`` to run them inline (useful in tests and
+management commands).  Swapping this module for Celery/RQ only needs ``submit``
+to enqueue instead.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_TASK_WORKERS,
+                thread_name_prefix="ddps-task",
+            )
+            atexit.register(_executor.shutdown, wait=True)
+        return _executor
+
+
+def _run(func: Callable[..., Any], args, kwargs) -> Any:
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+        raise
+    finally:
+        # Each pool thread opens its own connections; don't leak them.
+        connections.close_all()
+
+
+def submit(func: Callable[..., Any], *args, **kwargs) -> Future | None:
+    if settings.BACKGROUND_TASKS_EAGER:
+        func(*args, **kwargs)
+        return None
+    return _get_executor().submit(_run, func, args, kwargs)
@@ -1,3 +1,1735 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Engine, Template
+from django.template.base import Origin
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+
+from accounts.models import User
+
+from . import choices, export_cache, exports, middleware, slow_queries
+from .auditing import BufferedAuditSink
+from .forms import JobForm
+from .imports import import_jobs
+from .models import (
+    Client,
+    ClientAccess,
+    ClientRollup,
+    ExportJob,
+    Job,
+    JobAttachment,
+    JobAuditLog,
+    JobNote,
+    Milestone,
+    Project,
+    ProjectRollup,
+    SystemCounter,
+)
+from .nplusone import NPlusOneDetector, NPlusOneError, ignore_n_plus_one
+from .reschedule import reschedule_project
+from .rollups import rebuild_rollups
+from .services import (
+    access_scope,
+    bulk_create_jobs,
+    clients_for_user,
+    jobs_for_user,
+    projects_for_user,
+)
+from .synthetic import SyntheticPortfolio, SyntheticSpec, clear_portfolio
+from .transitions import transition_jobs
+from .views import JOB_PANEL_PAGE_SIZE, job_panel_page
+
+
+class DashboardQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        cls.client_record = Client.objects.create(name="Acme", account_code="ACME")
+
+    def _build_portfolio(self, projects: int, jobs_per_project: int) -> None:
+        Project.objects.all().delete()
+        created = Project.objects.bulk_create(
+            Project(
+                name=f"Project {index}",
+                reference=f"PRJ-{index}",
+                client=self.client_record,
+            )
+            for index in range(projects)
+        )
+        # bulk_create skips the job signals; only the cards are under test.
+        Job.objects.bulk_create(
+            Job(
+                project=project,
+                reference=f"J{index:04d}",
+                title=f"Job {index}",
+                forecast_revenue=Decimal("10.00"),
+                actual_revenue=Decimal("4.00"),
+            )
+            for project in created
+            for index in range(jobs_per_project)
+        )
+        rebuild_rollups()
+
+    def _dashboard_queries(self) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_flat_as_jobs_grow(self):
+        self.client.force_login(self.user)
+
+        self._build_portfolio(projects=1, jobs_per_project=8)
+        small = self._dashboard_queries()
+        self._build_portfolio(projects=8, jobs_per_project=800)
+        large = self._dashboard_queries()
+
+        self.assertEqual(small, large)
+
+    def test_cards_total_revenue_in_the_database(self):
+        self.client.force_login(self.user)
+        self._build_portfolio(projects=3, jobs_per_project=8)
+
+        response = self.client.get(reverse("dashboard"))
+
+        cards = response.context["project_cards"]
+        self.assertEqual(len(cards), 3)
+        for card in cards:
+            self.assertEqual(card["forecast_total"], Decimal("80.00"))
+            self.assertEqual(card["actual_total"], Decimal("32.00"))
+            references = [job["reference"] for job in card["jobs"]]
+            self.assertEqual(references, sorted(references))
+            self.assertEqual(len(references), 8)
+
+
+class RescheduleProjectTests(TestCase):
+    today = date(2026, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="planner", password="pass", role=User.Role.INTERNAL
+        )
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        cls.project = Project.objects.create(
+            name="Plant", reference="PRJ-1", client=client
+        )
+        cls.other = Project.objects.create(
+            name="Other", reference="PRJ-2", client=client
+        )
+
+    def _add_jobs(self, project: Project, count: int) -> list[Job]:
+        jobs = bulk_create_jobs(
+            Job(project=project, reference=f"J{index:04d}", title=f"Job {index}")
+            for index in range(count)
+        )
+        # Past, today and future planned dates, one undated stage.
+        offsets = {
+            stage: timedelta(days=(index - 2) * 7)
+            for index, stage in enumerate(Milestone.Stage.values[:-1])
+        }
+        milestones = list(Milestone.objects.filter(job__in=jobs))
+        for milestone in milestones:
+            if milestone.stage in offsets:
+                milestone.planned_date = self.today + offsets[milestone.stage]
+        Milestone.objects.bulk_update(milestones, ["planned_date"])
+        return jobs
+
+    def _planned(self, project: Project) -> dict:
+        return dict(
+            Milestone.objects.filter(job__project=project).values_list(
+                "pk", "planned_date"
+            )
+        )
+
+    def test_shifts_every_dated_milestone_in_the_project(self):
+        self._add_jobs(self.project, 3)
+        self._add_jobs(self.other, 1)
+        before, other_before = self._planned(self.project), self._planned(self.other)
+
+        moved = reschedule_project(self.project, -45, self.user, today=self.today)
+
+        dated = {pk: planned for pk, planned in before.items() if planned}
+        self.assertEqual(moved, len(dated))
+        after = self._planned(self.project)
+        for pk, planned in before.items():
+            expected = planned - timedelta(days=45) if planned else None
+            self.assertEqual(after[pk], expected)
+        self.assertEqual(self._planned(self.other), other_before)
+        # The DB-side arithmetic must store plain dates that still compare
+        # correctly in later filters (SQLite keeps dates as text).
+        shifted = date(2026, 1, 10)
+        self.assertTrue(
+            Milestone.objects.filter(
+                job__project=self.project,
+                stage=Milestone.Stage.CREATED,
+                planned_date=shifted,
+            ).exists()
+        )
+        self.assertEqual(
+            JobAuditLog.objects.filter(
+                job__project=self.project, action="milestone_updated"
+            ).count(),
+            moved,
+        )
+
+    def test_filters_by_stage_and_future_dates(self):
+        jobs = self._add_jobs(self.project, 2)
+        stages = [Milestone.Stage.CREATED, Milestone.Stage.FABRICATION]
+
+        moved = reschedule_project(
+            self.project, 5, stages=stages, future_only=True, today=self.today
+        )
+
+        # Only FABRICATION (planned in 14 days) is in the future.
+        self.assertEqual(moved, 2)
+        fabrication = Milestone.objects.filter(
+            job__in=jobs, stage=Milestone.Stage.FABRICATION
+        )
+        self.assertEqual(
+            set(fabrication.values_list("planned_date", flat=True)),
+            {self.today + timedelta(days=19)},
+        )
+        self.assertFalse(
+            Milestone.objects.filter(
+                job__in=jobs,
+                stage=Milestone.Stage.CREATED,
+                planned_date=self.today - timedelta(days=9),
+            ).exists()
+        )
+
+    def test_refreshes_job_schedules(self):
+        jobs = self._add_jobs(self.project, 1)
+
+        reschedule_project(self.project, 30, today=self.today)
+
+        job = Job.objects.get(pk=jobs[0].pk)
+        self.assertEqual(job.next_milestone_date, self.today + timedelta(days=16))
+
+    def test_moves_milestones_in_one_update(self):
+        self._add_jobs(self.project, 300)
+        with CaptureQueriesContext(connection) as queries:
+            moved = reschedule_project(self.project, 7, today=self.today)
+
+        updates = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "projects_milestone"')
+        ]
+        self.assertEqual(moved, 1800)
+        self.assertEqual(len(updates), 1)
+        # Audit inserts and schedule refreshes are batched, never per row.
+        self.assertLess(len(queries), moved // 50)
+
+
+class NPlusOneDetectorTests(TestCase):
+    # These tests run N+1 queries on purpose.
+    allow_n_plus_one = True
+
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        project = Project.objects.create(name="Plant", reference="PRJ-1", client=client)
+        owners = [
+            User.objects.create_user(username=f"owner{index}", password="pass")
+            for index in range(6)
+        ]
+        bulk_create_jobs(
+            Job(project=project, reference=f"J{index}", title="Job", owner=owner)
+            for index, owner in enumerate(owners)
+        )
+
+    def test_raises_with_the_template_line(self):
+        template = Template(
+            "{% for job in jobs %}\n{{ job.owner.username }}\n{% endfor %}",
+            origin=Origin("jobs.html", template_name="jobs.html"),
+            engine=Engine.get_default(),
+        )
+        with self.assertRaisesMessage(NPlusOneError, "6 x SELECT") as raised:
+            with NPlusOneDetector(mode="raise", threshold=5):
+                template.render(Context({"jobs": Job.objects.all()}))
+        self.assertIn('FROM "accounts_user"', str(raised.exception))
+        self.assertIn("jobs.html:2", str(raised.exception))
+        self.assertIn("projects/tests.py", str(raised.exception))
+
+    def test_warns_in_warn_mode(self):
+        with self.assertLogs("projects.nplusone", "WARNING") as logs:
+            with NPlusOneDetector("owners", mode="warn", threshold=5):
+                [job.owner for job in Job.objects.all()]
+        self.assertIn("Possible N+1 queries in owners", logs.output[0])
+
+    def test_ignores_fast_paths_and_ignored_blocks(self):
+        with NPlusOneDetector(mode="raise", threshold=5):
+            [job.owner for job in Job.objects.select_related("owner")]
+            with ignore_n_plus_one():
+                [job.owner for job in Job.objects.all()]
+
+    def test_test_level_detector_still_counts_outside_requests(self):
+        with self.assertRaises(NPlusOneError):
+            with NPlusOneDetector(mode="raise", threshold=5, outside_requests=True):
+                self.client.get(reverse("dashboard"))
+                [job.owner for job in Job.objects.all()]
+
+    @override_settings(NPLUSONE_MODE="off")
+    def test_off_mode_installs_nothing(self):
+        with NPlusOneDetector(threshold=1) as detector:
+            self.assertNotIn(detector, connection.execute_wrappers)
+
+
+class PageQueryTests(TestCase):
+    """Pages that used to run a query per row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        cls.project = Project.objects.create(
+            name="Plant",
+            reference="PRJ-1",
+            client=Client.objects.create(name="Acme", account_code="ACME"),
+        )
+
+    def _add_jobs(self, count: int, own_clients: bool = False) -> None:
+        """``count`` jobs with their own owner and a milestone due tomorrow."""
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        start = Job.objects.count()
+        jobs = []
+        for index in range(start, start + count):
+            project = self.project
+            if own_clients:
+                project = Project.objects.create(
+                    name=f"Project {index}",
+                    reference=f"PRJ-C{index}",
+                    client=Client.objects.create(
+                        name=f"Client {index}", account_code=f"C{index}"
+                    ),
+                )
+            owner = User.objects.create_user(username=f"owner{index}")
+            jobs.append(
+                Job(project=project, reference=f"J{index}", title="Job", owner=owner)
+            )
+        bulk_create_jobs(
+            jobs,
+            milestone_dates=lambda job: {Milestone.Stage.CREATED: (tomorrow, None)},
+        )
+
+    def _queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_project_detail_loads_job_owners_together(self):
+        self.client.force_login(self.user)
+        url = reverse("project-detail", args=[self.project.pk])
+        with ignore_n_plus_one():
+            self._add_jobs(1)
+            few = self._queries(url)
+            self._add_jobs(9)
+        self.assertEqual(self._queries(url), few)
+
+    def test_dashboard_loads_milestone_clients_together(self):
+        self.client.force_login(self.user)
+        with ignore_n_plus_one():
+            self._add_jobs(1, own_clients=True)
+            few = self._queries(reverse("dashboard"))
+            self._add_jobs(9, own_clients=True)
+        self.assertEqual(self._queries(reverse("dashboard")), few)
+
+    def test_repeated_requests_are_not_an_n_plus_one(self):
+        # Each request repeats the session and user lookups; only the
+        # request's own detector should judge its queries.
+        self.client.force_login(self.user)
+        url = reverse("project-detail", args=[self.project.pk])
+        with NPlusOneDetector(mode="raise", threshold=5, outside_requests=True):
+            for _ in range(6):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_repeated_streaming_exports_are_not_an_n_plus_one(self):
+        # A streamed body runs its queries after the view has returned.
+        self.client.force_login(self.user)
+        with NPlusOneDetector(mode="raise", threshold=5, outside_requests=True):
+            for _ in range(6):
+                response = self.client.get(reverse("job-export"), {"format": "csv"})
+                b"".join(response.streaming_content)
+
+
+class ExportCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(EXPORT_CACHE_DIR=directory.name))
+
+    def _fetch(self, body: bytes = b"workbook") -> tuple[bytes, bool]:
+        cached, hit = export_cache.fetch_or_build(
+            self.user, "xlsx", {}, lambda handle: handle.write(body)
+        )
+        with cached:
+            return cached.read(), hit
+
+    def test_cache_is_not_under_media_root(self):
+        self.assertFalse(
+            Path(settings.EXPORT_CACHE_DIR).is_relative_to(settings.MEDIA_ROOT)
+        )
+
+    def test_key_is_keyed_on_the_secret_key(self):
+        key = export_cache.export_cache_key(self.user, "xlsx", {})
+        with override_settings(SECRET_KEY="another secret"):
+            rekeyed = export_cache.export_cache_key(self.user, "xlsx", {})
+        self.assertNotEqual(rekeyed, key)
+
+    def test_a_pruned_file_is_rebuilt(self):
+        self.assertEqual(self._fetch(), (b"workbook", False))
+        self.assertEqual(self._fetch(b"ignored"), (b"workbook", True))
+
+        for path in export_cache.cache_dir().iterdir():
+            path.unlink()
+        self.assertEqual(self._fetch(b"rebuilt"), (b"rebuilt", False))
+
+    def test_user_changes_invalidate_exports_but_logins_do_not(self):
+        generation = SystemCounter.current(SystemCounter.EXPORT_GENERATION)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=["last_login"])
+        self.assertEqual(
+            SystemCounter.current(SystemCounter.EXPORT_GENERATION), generation
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Renamed"
+            self.user.save()
+        self.assertEqual(
+            SystemCounter.current(SystemCounter.EXPORT_GENERATION), generation + 1
+        )
+
+
+@override_settings(SLOW_QUERY_MS=1e-6)
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_record = Client.objects.create(name="Acme", account_code="ACME")
+
+    def setUp(self):
+        slow_queries._explained.clear()
+
+    def _records(self, run) -> list[dict]:
+        with self.assertLogs("projects.slow_queries", "WARNING") as logs:
+            run()
+        return [record.slow_query for record in logs.records]
+
+    def test_logs_slow_statements_without_parameters(self):
+        records = self._records(lambda: list(Client.objects.filter(name="Acme")))
+
+        [record] = [r for r in records if '"projects_client"' in r["sql"]]
+        self.assertIsNone(record["params"])
+        self.assertIn("projects/tests.py", record["origin"])
+        self.assertEqual(record["shape"], slow_queries.normalize_sql(record["sql"]))
+        self.assertTrue(record["explain"])
+
+    def test_parameters_are_opt_in_and_never_for_auth_tables(self):
+        with override_settings(SLOW_QUERY_LOG_PARAMS=True):
+            records = self._records(
+                lambda: (
+                    list(Client.objects.filter(name="Acme")),
+                    User.objects.create_user(username="someone", password="secret"),
+                )
+            )
+        client_query = next(r for r in records if '"projects_client"' in r["sql"])
+        self.assertEqual(list(client_query["params"]), ["Acme"])
+        user_insert = next(
+            r for r in records if r["sql"].startswith('INSERT INTO "accounts_user"')
+        )
+        self.assertIsNone(user_insert["params"])
+
+    def test_explains_each_shape_once(self):
+        def run():
+            list(Client.objects.filter(name="Acme"))
+            list(Client.objects.filter(name="Other"))
+
+        records = [r for r in self._records(run) if '"projects_client"' in r["sql"]]
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[0]["explain"])
+        self.assertIsNone(records[1]["explain"])
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_zero_threshold_disables_the_log(self):
+        with self.assertNoLogs("projects.slow_queries"):
+            list(Client.objects.all())
+
+    def test_explain(self):
+        queryset = Client.objects.filter(pk=self.client_record.pk)
+        sql, params = queryset.query.sql_with_params()
+
+        plan = slow_queries.explain(connection, sql, params)
+
+        self.assertTrue(any("projects_client" in line for line in plan))
+        self.assertIsNone(slow_queries.explain(connection, "UPDATE x SET y = 1", ()))
+
+    def test_json_lines_formatter(self):
+        formatter = slow_queries.JsonLinesFormatter()
+        record = logging.LogRecord(
+            "x", logging.WARNING, "", 0, "plain %s", ("text",), None
+        )
+        self.assertEqual(json.loads(formatter.format(record))["message"], "plain text")
+
+        record.slow_query = {"sql": "SELECT 1", "params": [date(2026, 1, 2)]}
+        line = formatter.format(record)
+        self.assertNotIn("\n", line)
+        self.assertEqual(json.loads(line)["params"], ["2026-01-02"])
+
+
+class RequestMetricsTests(TestCase):
+    def test_observe_buckets_and_sums(self):
+        recorded = middleware.RequestMetrics()
+        for seconds in (0.004, 0.005, 0.2, 30):
+            recorded.observe(
+                "dashboard",
+                {"request_duration_seconds": seconds},
+                {"requests_total": 1},
+            )
+        snapshot = recorded.snapshot()
+
+        series = snapshot["histograms"]["request_duration_seconds"]["dashboard"]
+        self.assertEqual(series[0], 2)  # le 0.005 includes the bound
+        self.assertEqual(series[middleware.BUCKETS.index(0.25)], 1)
+        self.assertEqual(series[-2], 1)  # +Inf
+        self.assertAlmostEqual(series[-1], 30.209)
+        self.assertEqual(snapshot["counters"]["requests_total"], {"dashboard": 4})
+
+        series[0] = 99  # Snapshots are copies.
+        fresh = recorded.snapshot()["histograms"]["request_duration_seconds"]
+        self.assertEqual(fresh["dashboard"][0], 2)
+        recorded.reset()
+        self.assertEqual(recorded.snapshot()["counters"]["requests_total"], {})
+
+    def test_render_prometheus(self):
+        recorded = middleware.RequestMetrics()
+        recorded.observe(
+            'odd"view', {"request_db_seconds": 0.02}, {"request_queries_total": 3}
+        )
+        recorded.observe(
+            'odd"view', {"request_db_seconds": 0.3}, {"request_queries_total": 2}
+        )
+
+        text = middleware.render_prometheus(recorded.snapshot())
+
+        metric = "ddps_request_db_seconds"
+        self.assertIn("# TYPE ddps_request_db_seconds histogram", text)
+        self.assertIn(f'{metric}_bucket{{view="odd\\"view",le="0.01"}} 0', text)
+        self.assertIn(f'{metric}_bucket{{view="odd\\"view",le="0.025"}} 1', text)
+        self.assertIn(f'{metric}_bucket{{view="odd\\"view",le="+Inf"}} 2', text)
+        self.assertIn(f'{metric}_count{{view="odd\\"view"}} 2', text)
+        self.assertIn(f'{metric}_sum{{view="odd\\"view"}} 0.32', text)
+        self.assertIn('ddps_request_queries_total{view="odd\\"view"} 5', text)
+
+    def test_snapshots_from_every_worker_are_summed(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        middleware.metrics.reset()
+        self.addCleanup(middleware.metrics.reset)
+        middleware.metrics.observe("dashboard", {}, {"requests_total": 2})
+        # A previous worker with the same pid but an earlier start.
+        previous = {"histograms": {}, "counters": {"requests_total": {"dashboard": 5}}}
+        Path(directory.name, f"{os.getpid()}-1.json").write_text(json.dumps(previous))
+
+        with override_settings(PERF_METRICS_DIR=directory.name):
+            merged = middleware.collected_metrics()
+
+        self.assertEqual(merged["counters"]["requests_total"], {"dashboard": 7})
+        self.assertEqual(len(list(Path(directory.name).glob("*.json"))), 2)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username="staff", password="pass", role=User.Role.INTERNAL, is_staff=True
+        )
+        cls.internal = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        project = Project.objects.create(
+            name="Plant",
+            reference="PRJ-1",
+            client=Client.objects.create(name="Acme", account_code="ACME"),
+        )
+        bulk_create_jobs(
+            Job(project=project, reference=f"J{index}", title="Job")
+            for index in range(3)
+        )
+
+    def setUp(self):
+        middleware.metrics.reset()
+        self.addCleanup(middleware.metrics.reset)
+
+    def _counter(self, name: str, view: str):
+        return middleware.metrics.snapshot()["counters"][name].get(view)
+
+    @override_settings(DEBUG=False)
+    def test_server_timing_is_for_staff_only(self):
+        self.client.force_login(self.internal)
+        self.assertNotIn("Server-Timing", self.client.get(reverse("dashboard")))
+        self.client.force_login(self.staff)
+        timing = self.client.get(reverse("dashboard"))["Server-Timing"]
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertEqual(self._counter("requests_total", "dashboard"), 2)
+
+    def test_streaming_responses_are_observed_when_the_body_is_done(self):
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("job-export"), {"format": "csv"})
+            self.assertIsNone(self._counter("requests_total", "job-export"))
+            b"".join(response.streaming_content)
+            response.close()
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self._counter("requests_total", "job-export"), 1)
+        self.assertEqual(
+            self._counter("request_queries_total", "job-export"), len(queries)
+        )
+
+    def test_metrics_view_is_staff_only(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.internal)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn('ddps_requests_total{view="metrics"}', response.content.decode())
+
+
+class RollupAssertions:
+    """Incremental rollups must match a full rebuild_rollups()."""
+
+    def _rollups(self) -> dict:
+        def totals(row):
+            return (
+                row.job_count,
+                row.forecast_revenue,
+                row.actual_revenue,
+                {status: n for status, n in row.status_counts.items() if n},
+                getattr(row, "project_count", None),
+            )
+
+        # Parents without a rollup row count as empty.
+        empty = (0, Decimal("0"), Decimal("0"), {})
+        result = {
+            ("project", pk): (*empty, None)
+            for pk in Project.objects.values_list("pk", flat=True)
+        }
+        result.update(
+            (("client", pk), (*empty, 0))
+            for pk in Client.objects.values_list("pk", flat=True)
+        )
+        result.update(
+            (("project", row.pk), totals(row)) for row in ProjectRollup.objects.all()
+        )
+        result.update(
+            (("client", row.pk), totals(row)) for row in ClientRollup.objects.all()
+        )
+        return result
+
+    def assertMatchesRebuild(self):
+        incremental = self._rollups()
+        rebuild_rollups()
+        self.assertEqual(incremental, self._rollups())
+
+
+class RollupConsistencyTests(RollupAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Client.objects.create(name="Acme", account_code="ACME")
+        cls.globex = Client.objects.create(name="Globex", account_code="GLOBEX")
+        cls.plant, cls.depot, cls.yard = (
+            Project.objects.create(name=name, reference=reference, client=client)
+            for name, reference, client in [
+                ("Plant", "P1", cls.acme),
+                ("Depot", "P2", cls.acme),
+                ("Yard", "P3", cls.globex),
+            ]
+        )
+        cls.jobs = [
+            Job.objects.create(
+                project=project,
+                reference=f"J{index}",
+                title="Job",
+                status=status,
+                forecast_revenue=Decimal(forecast),
+                actual_revenue=Decimal("5.00"),
+            )
+            for index, (project, status, forecast) in enumerate(
+                [
+                    (cls.plant, Job.Status.DRAWINGS_WIP, "100.00"),
+                    (cls.plant, Job.Status.SHIPPED, "250.50"),
+                    (cls.depot, Job.Status.DRAWINGS_WIP, "40.00"),
+                    (cls.yard, Job.Status.COMPLETED, "75.25"),
+                ]
+                + [(cls.depot, Job.Status.IN_FABRICATION, "10.00")] * 6
+            )
+        ]
+
+    def test_initial_state(self):
+        self.assertMatchesRebuild()
+
+    def test_status_and_revenue_edits(self):
+        job = Job.objects.get(pk=self.jobs[0].pk)
+        job.status = Job.Status.COMPLETED
+        job.forecast_revenue = Decimal("120.00")
+        job.save()
+        job.actual_revenue = Decimal("60.00")
+        job.save(update_fields=["actual_revenue"])
+        self.assertMatchesRebuild()
+
+    def test_deferred_fields_are_not_mistaken_for_changes(self):
+        job = Job.objects.only("id", "title").get(pk=self.jobs[1].pk)
+        job.title = "Renamed"
+        job.save()
+        self.assertMatchesRebuild()
+
+    def test_moving_a_job_between_projects(self):
+        job = Job.objects.get(pk=self.jobs[0].pk)
+        job.project = self.yard
+        job.save()
+        self.assertMatchesRebuild()
+
+    def test_moving_a_project_between_clients(self):
+        project = Project.objects.get(pk=self.plant.pk)
+        project.client = self.globex
+        project.save()
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_job(self):
+        Job.objects.get(pk=self.jobs[1].pk).delete()
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_project(self):
+        Project.objects.get(pk=self.plant.pk).delete()
+        self.assertMatchesRebuild()
+
+    def test_deleting_projects_in_bulk(self):
+        Project.objects.filter(client=self.acme).delete()
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_client(self):
+        self.acme.delete()
+        self.assertMatchesRebuild()
+
+    def test_project_delete_does_not_apply_each_job(self):
+        def rollup_writes(project: Project) -> int:
+            with CaptureQueriesContext(connection) as queries:
+                project.delete()
+            return sum(
+                'UPDATE "projects_clientrollup"' in query["sql"]
+                or 'UPDATE "projects_projectrollup"' in query["sql"]
+                for query in queries.captured_queries
+            )
+
+        # Depot has seven jobs, Plant two; each takes one client update.
+        self.assertEqual(rollup_writes(self.depot), 1)
+        self.assertEqual(rollup_writes(self.plant), 1)
+        self.assertMatchesRebuild()
+
+    def test_drift_below_zero_is_clamped_and_logged(self):
+        ProjectRollup.objects.filter(project=self.plant).update(job_count=0)
+
+        with self.assertLogs("projects.rollups", "WARNING") as logs:
+            Job.objects.get(pk=self.jobs[1].pk).delete()
+
+        self.assertIn(
+            f"ProjectRollup {self.plant.pk} counts went negative (job_count)",
+            logs.output[0],
+        )
+        self.assertEqual(ProjectRollup.objects.get(project=self.plant).job_count, 0)
+        rebuild_rollups()
+        self.assertEqual(ProjectRollup.objects.get(project=self.plant).job_count, 1)
+
+
+class SyntheticPortfolioTests(TestCase):
+    def setUp(self):
+        # Rolled-back tests don't signal, so earlier lists may be cached.
+        cache.clear()
+
+    def _generation(self) -> int:
+        return SystemCounter.current(SystemCounter.EXPORT_GENERATION)
+
+    def test_generating_and_clearing_invalidate_caches(self):
+        spec = SyntheticSpec(
+            clients=2, projects_per_client=2, jobs_per_project=2, staff=2
+        )
+        self.assertEqual(choices.project_choices(), [])
+        generation = self._generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            SyntheticPortfolio(spec, progress=lambda message: None).generate()
+        self.assertGreater(self._generation(), generation)
+        self.assertEqual(len(choices.project_choices()), 4)
+        self.assertEqual(len(choices.staff_choices()), 2)
+
+        generation = self._generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            clear_portfolio()
+        self.assertGreater(self._generation(), generation)
+        self.assertEqual(choices.project_choices(), [])
+        self.assertEqual(choices.staff_choices(), [])
+
+
+class ExportJobCleanupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=directory.name))
+
+    def _export(self, status: str, age: timedelta, **fields) -> ExportJob:
+        export = ExportJob.objects.create(
+            requested_by=self.user, status=status, **fields
+        )
+        ExportJob.objects.filter(pk=export.pk).update(
+            created_at=timezone.now() - age
+        )
+        return export
+
+    def test_full_exports_report_a_watermark(self):
+        export = ExportJob.objects.create(
+            requested_by=self.user, export_format=ExportJob.Format.CSV
+        )
+        exports.run_export_job(export.pk)
+        export.refresh_from_db()
+        self.assertEqual(export.status, ExportJob.Status.COMPLETE)
+        self.assertTrue(export.parameters["watermark"])
+
+    def test_a_missing_export_is_logged(self):
+        with self.assertLogs("projects.exports", "WARNING") as logs:
+            exports.run_export_job(0)
+        self.assertIn("Export 0 no longer exists", logs.output[0])
+
+    def test_stale_exports_are_failed(self):
+        hour = timedelta(hours=1)
+        stale_pending = self._export(ExportJob.Status.PENDING, 2 * hour)
+        stale_running = self._export(
+            ExportJob.Status.RUNNING,
+            2 * hour,
+            started_at=timezone.now() - 2 * hour,
+        )
+        fresh = self._export(ExportJob.Status.PENDING, timedelta(minutes=5))
+
+        self.assertEqual(exports.fail_stale_exports(hour), 2)
+        statuses = dict(ExportJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[stale_pending.pk], ExportJob.Status.FAILED)
+        self.assertEqual(statuses[stale_running.pk], ExportJob.Status.FAILED)
+        self.assertEqual(statuses[fresh.pk], ExportJob.Status.PENDING)
+
+    def test_expired_exports_and_files_are_deleted(self):
+        week = timedelta(days=7)
+        old = self._export(
+            ExportJob.Status.COMPLETE,
+            2 * week,
+            finished_at=timezone.now() - 2 * week,
+        )
+        old.file.save("old.csv", ContentFile(b"job"))
+        path = Path(old.file.path)
+        recent = self._export(
+            ExportJob.Status.COMPLETE, timedelta(0), finished_at=timezone.now()
+        )
+
+        self.assertEqual(exports.delete_expired_exports(week), 1)
+        self.assertFalse(path.exists())
+        self.assertQuerySetEqual(
+            ExportJob.objects.values_list("pk", flat=True), [recent.pk]
+        )
+
+
+class ImportJobsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="importer",
+            password="pass",
+            role=User.Role.INTERNAL,
+            can_view_finance=True,
+        )
+        cls.client_user = User.objects.create_user(
+            username="contact", password="pass", role=User.Role.CLIENT
+        )
+        acme = Client.objects.create(name="Acme", account_code="ACME")
+        other = Client.objects.create(name="Globex", account_code="GLOBEX")
+        ClientAccess.objects.create(client=acme, user=cls.client_user)
+        cls.project = Project.objects.create(name="Plant", reference="P1", client=acme)
+        Project.objects.create(name="Yard", reference="P2", client=other)
+        Job.objects.create(project=cls.project, reference="J1", title="Existing")
+
+    def _import(self, text: str, user: User | None = None, **kwargs):
+        return import_jobs(
+            io.BytesIO(text.encode()), "jobs.csv", user or self.user, **kwargs
+        )
+
+    def _errors(self, result) -> dict[int, set[str]]:
+        return {error.row: set(error.errors) for error in result.errors}
+
+    def test_valid_rows_use_defaults_for_blank_columns(self):
+        result = self._import(
+            "project,reference,title,status,forecast_revenue,owner,client_contact\n"
+            "P1,J2,New,,,importer,contact\n"
+        )
+        self.assertEqual((result.created, result.errors), (1, []))
+        job = Job.objects.get(reference="J2")
+        self.assertEqual(job.status, Job.Status.PENDING_REQUIREMENTS)
+        self.assertEqual(job.forecast_revenue, Decimal("0.00"))
+        self.assertEqual(job.owner, self.user)
+        self.assertEqual(job.client_contact, self.client_user)
+
+    def test_duplicate_and_existing_references_are_rejected(self):
+        result = self._import(
+            "project,reference,title\nP1,J2,New\nP1,J2,Again\nP1,J1,Existing\n"
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(self._errors(result), {3: {"reference"}, 4: {"reference"}})
+
+    def test_unknown_project_and_users_are_rejected(self):
+        result = self._import(
+            "project,reference,title,owner,client_contact\n"
+            "P9,J2,New,,\n"
+            "P1,J3,New,nobody,importer\n"
+        )
+        self.assertEqual(result.created, 0)
+        self.assertEqual(
+            self._errors(result),
+            {2: {"project"}, 3: {"owner", "client_contact"}},
+        )
+
+    def test_projects_outside_the_users_scope_are_unknown(self):
+        result = self._import(
+            "project,reference,title\nP2,J2,New\n", user=self.client_user
+        )
+        self.assertEqual(self._errors(result), {2: {"project"}})
+
+    def test_invalid_status_and_numbers_are_rejected(self):
+        result = self._import(
+            "project,reference,title,status,forecast_revenue,anticipated_start\n"
+            "P1,J2,New,lost,abc,2026-13-40\n"
+        )
+        self.assertEqual(
+            self._errors(result),
+            {2: {"status", "forecast_revenue", "anticipated_start"}},
+        )
+        self.assertFalse(Job.objects.filter(reference="J2").exists())
+
+    def test_xlsx_files_are_imported(self):
+        workbook = Workbook()
+        workbook.active.append(["Project", "Reference", "Title", "Forecast revenue"])
+        workbook.active.append(["P1", "J2", "From Excel", 125.5])
+        handle = io.BytesIO()
+        workbook.save(handle)
+        handle.seek(0)
+
+        result = import_jobs(handle, "jobs.xlsx", self.user)
+        self.assertEqual((result.created, result.errors), (1, []))
+        self.assertEqual(
+            Job.objects.get(reference="J2").forecast_revenue, Decimal("125.50")
+        )
+
+    def test_dry_run_command_creates_nothing(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "jobs.csv"
+        path.write_text("project,reference,title\nP1,J2,New\nP1,J1,Existing\n")
+        output = io.StringIO()
+
+        call_command(
+            "import_jobs", str(path), username="importer", dry_run=True, stdout=output
+        )
+        self.assertIn("Row 3: reference:", output.getvalue())
+        self.assertIn("Validated 1 of 2 rows", output.getvalue())
+        self.assertFalse(Job.objects.filter(reference="J2").exists())
+
+
+class TransitionJobsTests(RollupAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.internal = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        cls.client_user = User.objects.create_user(
+            username="contact", password="pass", role=User.Role.CLIENT
+        )
+        acme = Client.objects.create(name="Acme", account_code="ACME")
+        globex = Client.objects.create(name="Globex", account_code="GLOBEX")
+        ClientAccess.objects.create(client=acme, user=cls.client_user)
+        plant = Project.objects.create(name="Plant", reference="P1", client=acme)
+        yard = Project.objects.create(name="Yard", reference="P2", client=globex)
+        cls.drawing, cls.approval, cls.fabricating, cls.elsewhere = (
+            Job.objects.create(
+                project=project,
+                reference=reference,
+                title="Job",
+                status=status,
+                forecast_revenue=Decimal("100.00"),
+            )
+            for project, reference, status in [
+                (plant, "J1", Job.Status.DRAWINGS_WIP),
+                (plant, "J2", Job.Status.PENDING_CLIENT_APPROVAL),
+                (plant, "J3", Job.Status.IN_FABRICATION),
+                (yard, "J4", Job.Status.DRAWINGS_WIP),
+            ]
+        )
+
+    def _jobs(self, *jobs: Job):
+        return Job.objects.filter(pk__in=[job.pk for job in jobs])
+
+    def test_moves_jobs_and_completes_their_stage(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = transition_jobs(
+                self._jobs(self.drawing, self.approval, self.fabricating),
+                Job.Status.IN_FABRICATION,
+                self.internal,
+                completed_on=date(2026, 3, 1),
+            )
+
+        self.assertEqual((result.updated, result.milestones_completed), (2, 2))
+        jobs = {job.pk: job for job in self._jobs(self.drawing, self.approval)}
+        for job in jobs.values():
+            self.assertEqual(job.status, Job.Status.IN_FABRICATION)
+            self.assertEqual(job.current_stage, Milestone.Stage.FABRICATION)
+        self.assertEqual(
+            Milestone.objects.filter(
+                stage=Milestone.Stage.FABRICATION, actual_date=date(2026, 3, 1)
+            ).count(),
+            2,
+        )
+        self.assertMatchesRebuild()
+
+    def test_writes_audit_entries_for_changed_jobs_only(self):
+        transition_jobs(
+            self._jobs(self.drawing, self.fabricating),
+            Job.Status.IN_FABRICATION,
+            self.internal,
+        )
+        entries = set(
+            JobAuditLog.objects.values_list(
+                "job_id", "actor_id", "field_name", "previous_value", "new_value"
+            )
+        )
+        today = str(timezone.localdate())
+        self.assertEqual(
+            entries,
+            {
+                (
+                    self.drawing.pk,
+                    self.internal.pk,
+                    "status",
+                    Job.Status.DRAWINGS_WIP,
+                    Job.Status.IN_FABRICATION,
+                ),
+                (
+                    self.drawing.pk,
+                    self.internal.pk,
+                    "Fabrication - actual_date",
+                    "",
+                    today,
+                ),
+            },
+        )
+
+    def test_jobs_already_in_the_status_are_skipped(self):
+        generation = SystemCounter.current(SystemCounter.EXPORT_GENERATION)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = transition_jobs(
+                self._jobs(self.fabricating), Job.Status.IN_FABRICATION
+            )
+        self.assertEqual((result.updated, result.milestones_completed), (0, 0))
+        self.assertFalse(JobAuditLog.objects.exists())
+        self.assertEqual(
+            SystemCounter.current(SystemCounter.EXPORT_GENERATION), generation
+        )
+
+    def test_only_jobs_in_the_users_scope_move(self):
+        result = transition_jobs(
+            jobs_for_user(self.client_user).filter(
+                pk__in=[self.drawing.pk, self.elsewhere.pk]
+            ),
+            Job.Status.SHIPPED,
+        )
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(
+            Job.objects.get(pk=self.elsewhere.pk).status, Job.Status.DRAWINGS_WIP
+        )
+
+    def test_bulk_status_view(self):
+        url = reverse("job-bulk-status")
+        data = {
+            "jobs": [self.drawing.pk, self.elsewhere.pk],
+            "status": Job.Status.SHIPPED,
+            "next": "/projects/",
+        }
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.post(url, data).status_code, 404)
+        self.assertFalse(Job.objects.filter(status=Job.Status.SHIPPED).exists())
+
+        self.client.force_login(self.internal)
+        response = self.client.post(url, data)
+        self.assertRedirects(response, "/projects/", fetch_redirect_response=False)
+        self.assertEqual(Job.objects.filter(status=Job.Status.SHIPPED).count(), 2)
+        self.assertMatchesRebuild()
+
+
+class BufferedAuditSinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        project = Project.objects.create(name="Plant", reference="P1", client=client)
+        cls.job = Job.objects.create(project=project, reference="J1", title="Job")
+
+    def test_entries_keep_the_time_of_the_edit(self):
+        edited_at = timezone.now() - timedelta(minutes=5)
+        entries = [
+            JobAuditLog(job=self.job, action="job_field_updated", field_name=name)
+            for name in ("title", "status")
+        ]
+        for entry in entries:
+            entry.created_at = edited_at
+        sink = BufferedAuditSink(batch_size=10, interval=60)
+        # A closed sink inserts on commit without its background thread.
+        sink.close()
+        with self.captureOnCommitCallbacks(execute=True):
+            sink.write(entries)
+
+        self.assertEqual(
+            list(JobAuditLog.objects.values_list("created_at", flat=True)),
+            [edited_at, edited_at],
+        )
+        self.assertLess(
+            abs(JobAuditLog(job=self.job).created_at - timezone.now()),
+            timedelta(seconds=5),
+        )
+
+
+class MilestoneFormSetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        project = Project.objects.create(name="Plant", reference="P1", client=client)
+        cls.job = Job.objects.create(project=project, reference="J1", title="Job")
+
+    def test_saves_every_stage_in_one_update(self):
+        self.client.force_login(self.user)
+        url = reverse("job-detail", args=[self.job.pk])
+        page = self.client.get(url).content.decode()
+        # The formset's hidden inputs (management form, ids, job) as rendered.
+        data = dict(
+            re.findall(r'type="hidden" name="(milestones-[^"]+)" value="([^"]*)"', page)
+        )
+        stages = dict(
+            Milestone.objects.filter(job=self.job).values_list("pk", "stage")
+        )
+        start = date(2026, 4, 1)
+        for index in range(len(stages)):
+            stage = stages[int(data[f"milestones-{index}-id"])]
+            order = Milestone.Stage.values.index(stage)
+            data[f"milestones-{index}-planned_date"] = str(
+                start + timedelta(weeks=order)
+            )
+        data["milestone_update"] = "1"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data)
+
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        milestone_sql = [
+            query["sql"]
+            for query in queries.captured_queries
+            if '"projects_milestone"' in query["sql"]
+        ]
+        self.assertEqual(
+            sum(sql.startswith('UPDATE "projects_milestone"') for sql in milestone_sql),
+            1,
+        )
+        self.assertFalse([sql for sql in milestone_sql if sql.startswith("SELECT 1")])
+        self.assertEqual(
+            JobAuditLog.objects.filter(
+                job=self.job, action="milestone_updated"
+            ).count(),
+            7,
+        )
+        self.job.refresh_from_db()
+        self.assertEqual(
+            (self.job.next_milestone_stage, self.job.next_milestone_date),
+            (Milestone.Stage.CREATED, start),
+        )
+
+
+class JobPanelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        cls.outsider = User.objects.create_user(
+            username="contact", password="pass", role=User.Role.CLIENT
+        )
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        project = Project.objects.create(name="Plant", reference="P1", client=client)
+        cls.job = Job.objects.create(project=project, reference="J1", title="Job")
+        # bulk_create gives every note the same created_at, so pages also
+        # have to break ties on id.
+        JobNote.objects.bulk_create(
+            JobNote(job=cls.job, author=cls.user, body=f"Note {index}")
+            for index in range(25)
+        )
+
+    def _url(self, panel: str = "notes", **params) -> str:
+        url = reverse("job-panel", kwargs={"pk": self.job.pk, "panel": panel})
+        return f"{url}?{urlencode(params)}" if params else url
+
+    def test_cursor_pages_through_every_item_once(self):
+        first = job_panel_page(self.job.pk, "notes")
+        self.assertEqual(len(first["items"]), JOB_PANEL_PAGE_SIZE)
+        self.assertTrue(first["first_page"])
+
+        self.client.force_login(self.user)
+        response = self.client.get(first["next_url"])
+        self.assertEqual(response.status_code, 200)
+        rest = response.context["page"]
+        self.assertIsNone(rest["next_url"])
+        self.assertFalse(rest["first_page"])
+        seen = [note.pk for note in first["items"] + rest["items"]]
+        newest_first = JobNote.objects.order_by("-created_at", "-id")
+        self.assertEqual(seen, list(newest_first.values_list("pk", flat=True)))
+
+    def test_an_exhausted_cursor_is_not_the_empty_state(self):
+        oldest = JobNote.objects.order_by("created_at", "id").first()
+        self.client.force_login(self.user)
+        response = self.client.get(
+            self._url(after=f"{oldest.created_at.isoformat()}_{oldest.pk}")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "No notes recorded yet.")
+
+    def test_a_malformed_cursor_is_rejected(self):
+        self.client.force_login(self.user)
+        for cursor in ("yesterday", "2026-01-01_x"):
+            response = self.client.get(self._url(after=cursor))
+            self.assertEqual(response.status_code, 400)
+
+    def test_a_naive_cursor_is_read_in_the_current_time_zone(self):
+        self.client.force_login(self.user)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            response = self.client.get(self._url(after="2999-01-01T00:00:00_1"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["page"]["items"]), 20)
+
+    def test_jobs_outside_the_users_scope_are_not_found(self):
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(self._url()).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self._url("bogus")).status_code, 404)
+
+
+class ChoiceListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.internal = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        cls.jane = User.objects.create_user(
+            username="jane", password="pass", role=User.Role.CLIENT
+        )
+        cls.bob = User.objects.create_user(
+            username="bob", password="pass", role=User.Role.CLIENT
+        )
+        cls.acme = Client.objects.create(name="Acme", account_code="ACME")
+        cls.globex = Client.objects.create(name="Globex", account_code="GLOBEX")
+        ClientAccess.objects.create(client=cls.acme, user=cls.jane)
+        ClientAccess.objects.create(client=cls.globex, user=cls.bob)
+        cls.plant = Project.objects.create(
+            name="Plant", reference="P1", client=cls.acme
+        )
+        cls.yard = Project.objects.create(
+            name="Yard", reference="P2", client=cls.globex
+        )
+
+    def setUp(self):
+        # Rolled-back tests don't signal, so earlier lists may be cached.
+        cache.clear()
+
+    def _search(self, source: str, **params) -> list:
+        url = reverse("job-autocomplete", args=[source])
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [result["text"] for result in response.json()["results"]]
+
+    def test_client_scope_sees_only_its_clients(self):
+        jane_scope = access_scope(self.jane)
+        self.assertEqual(
+            choices.choices_for("client_contact", jane_scope), [(self.jane.pk, "jane")]
+        )
+        self.assertEqual(
+            choices.choices_for("project", jane_scope), [(self.plant.pk, "P1 - Plant")]
+        )
+        internal_scope = access_scope(self.internal)
+        self.assertEqual(len(choices.choices_for("client_contact", internal_scope)), 2)
+        self.assertEqual(len(choices.choices_for("project", internal_scope)), 2)
+
+    def test_search_narrows_by_project_and_term(self):
+        self.client.force_login(self.internal)
+        self.assertEqual(self._search("client_contact"), ["bob", "jane"])
+        self.assertEqual(self._search("client_contact", project=self.yard.pk), ["bob"])
+        self.assertEqual(self._search("project", q="yar"), ["P2 - Yard"])
+        self.assertEqual(self._search("owner"), ["internal"])
+
+    def test_only_internal_users_may_search(self):
+        self.client.force_login(self.jane)
+        url = reverse("job-autocomplete", args=["project"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.internal)
+        url = reverse("job-autocomplete", args=["clients"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_saves_invalidate_the_cached_lists(self):
+        self.assertEqual(len(choices.project_choices()), 2)
+        Project.objects.create(name="Depot", reference="P3", client=self.acme)
+        self.assertEqual(len(choices.project_choices()), 3)
+
+        self.assertEqual(len(choices.contact_choices()), 2)
+        ClientAccess.objects.create(client=self.globex, user=self.jane)
+        self.assertEqual(len(choices.contact_choices()), 3)
+
+        self.assertEqual(choices.staff_choices(), [(self.internal.pk, "internal")])
+        self.internal.username = "planner"
+        self.internal.save()
+        self.assertEqual(choices.staff_choices(), [(self.internal.pk, "planner")])
+
+    def test_logins_keep_the_cached_lists(self):
+        cache.set(choices.STAFF_KEY, ["cached"])
+        self.internal.last_login = timezone.now()
+        self.internal.save(update_fields=["last_login"])
+        self.assertEqual(cache.get(choices.STAFF_KEY), ["cached"])
+
+    def test_autocomplete_select_renders_only_the_selected_option(self):
+        job = Job.objects.create(
+            project=self.plant, reference="J1", title="Job", client_contact=self.jane
+        )
+        html = str(JobForm(instance=job, user=self.internal)["client_contact"])
+        self.assertIn(f'<option value="{self.jane.pk}" selected>jane</option>', html)
+        self.assertNotIn("bob", html)
+        self.assertIn('data-autocomplete-forward="project"', html)
+
+
+class AccessScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clients = [
+            Client.objects.create(name=name, account_code=name.upper())
+            for name in ("Acme", "Globex", "Initech")
+        ]
+        for client in cls.clients:
+            project = Project.objects.create(
+                name=client.name, reference=f"P-{client.account_code}", client=client
+            )
+            Job.objects.create(project=project, reference="J1", title="Job")
+        cls.users = {
+            name: User.objects.create_user(username=name, password="pass", **fields)
+            for name, fields in {
+                "internal": {"role": User.Role.INTERNAL},
+                "sikla": {"role": User.Role.SIKLA},
+                "superuser": {"role": User.Role.CLIENT, "is_superuser": True},
+                "one_client": {"role": User.Role.CLIENT},
+                "two_clients": {"role": User.Role.CLIENT},
+                "no_clients": {"role": User.Role.CLIENT},
+            }.items()
+        }
+        for name, clients in (
+            ("one_client", cls.clients[1:2]),
+            ("two_clients", cls.clients[1:]),
+        ):
+            for client in clients:
+                ClientAccess.objects.create(client=client, user=cls.users[name])
+
+    def _user(self, name: str) -> User:
+        # A fresh object, as request.user would be.
+        return User.objects.get(pk=self.users[name].pk)
+
+    def test_scope_is_resolved_once_per_user_object(self):
+        user = self._user("two_clients")
+        with self.assertNumQueries(1):
+            first = access_scope(user)
+            self.assertIs(access_scope(user), first)
+        self.assertEqual(
+            first.client_ids, {client.pk for client in self.clients[1:]}
+        )
+        internal = self._user("internal")
+        with self.assertNumQueries(0):
+            self.assertTrue(access_scope(internal).unrestricted)
+
+    def test_scoped_querysets_match_the_assignment_join(self):
+        # One round of queries per role, on purpose.
+        for name in self.users:
+            with self.subTest(name), ignore_n_plus_one():
+                user = self._user(name)
+                if user.is_superuser or not user.is_client_user:
+                    expected = Client.objects.all()
+                else:
+                    expected = Client.objects.filter(
+                        access_assignments__user=user
+                    ).distinct()
+                client_ids = set(expected.values_list("pk", flat=True))
+                self.assertEqual(
+                    set(clients_for_user(user).values_list("pk", flat=True)),
+                    client_ids,
+                )
+                self.assertEqual(
+                    set(projects_for_user(user).values_list("client_id", flat=True)),
+                    client_ids,
+                )
+                self.assertEqual(
+                    set(
+                        jobs_for_user(user).values_list(
+                            "project__client_id", flat=True
+                        )
+                    ),
+                    client_ids,
+                )
+
+    def test_client_users_are_sent_to_their_client(self):
+        url = reverse("client-list")
+        for name, client in (
+            ("one_client", self.clients[1]),
+            ("two_clients", self.clients[1]),
+        ):
+            with self.subTest(name), ignore_n_plus_one():
+                self.client.force_login(self.users[name])
+                self.assertRedirects(
+                    self.client.get(url),
+                    reverse("client-detail", args=[client.pk]),
+                    fetch_redirect_response=False,
+                )
+        for name in ("no_clients", "internal"):
+            with self.subTest(name), ignore_n_plus_one():
+                self.client.force_login(self.users[name])
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class JobExportRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.finance = User.objects.create_user(
+            username="finance",
+            password="pass",
+            role=User.Role.INTERNAL,
+            can_view_finance=True,
+        )
+        cls.internal = User.objects.create_user(
+            username="internal", password="pass", role=User.Role.INTERNAL
+        )
+        cls.acme = Client.objects.create(name="Acme", account_code="ACME")
+        cls.globex = Client.objects.create(name="Globex", account_code="GLBX")
+        plant = Project.objects.create(name="Plant", reference="P1", client=cls.acme)
+        depot = Project.objects.create(name="Depot", reference="P2", client=cls.globex)
+        cls.wip = Job.objects.create(
+            project=plant,
+            reference="J1",
+            title="Frames",
+            status=Job.Status.DRAWINGS_WIP,
+            actual_revenue=Decimal("40.00"),
+        )
+        cls.shipped = Job.objects.create(
+            project=plant, reference="J2", title="Racks", status=Job.Status.SHIPPED
+        )
+        cls.depot_job = Job.objects.create(project=depot, reference="J3", title="Bay")
+        cls.spare = Job.objects.create(project=depot, reference="J4", title="Spare")
+        Milestone.objects.filter(
+            job=cls.wip, stage=Milestone.Stage.CREATED
+        ).update(planned_date=date(2026, 2, 1))
+        Milestone.objects.filter(
+            job=cls.shipped, stage=Milestone.Stage.CREATED
+        ).update(planned_date=date(2026, 5, 1))
+
+    def setUp(self):
+        self.client.force_login(self.finance)
+
+    def _get(self, **params):
+        return self.client.get(reverse("job-export"), params)
+
+    def _content(self, response) -> str:
+        return b"".join(response.streaming_content).decode()
+
+    def _csv(self, **params) -> list[dict]:
+        response = self._get(format="csv", **params)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.DictReader(io.StringIO(self._content(response))))
+
+    def _jobs(self, rows: list[dict]) -> set[str]:
+        return {row["Job"] for row in rows}
+
+    def test_csv_streams_one_row_per_milestone(self):
+        response = self._get(format="csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("X-Export-Watermark", response)
+        lines = list(csv.reader(io.StringIO(self._content(response))))
+        self.assertEqual(lines[0], exports.export_headers())
+        self.assertEqual(len(lines) - 1, 4 * len(Milestone.Stage))
+
+    def test_empty_xlsx_export_keeps_the_header_row(self):
+        response = self._get(status=Job.Status.COMPLETED)
+
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook["Jobs"].iter_rows(values_only=True))
+        self.assertEqual(rows, [tuple(exports.export_headers())])
+
+    def test_jsonl_streams_one_object_per_milestone(self):
+        response = self._get(format="jsonl")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(len(rows), 4 * len(Milestone.Stage))
+        self.assertEqual(list(rows[0]), exports.export_headers())
+        self.assertEqual(
+            {row["Actual Revenue"] for row in rows if row["Job"] == "J1"}, {"40.00"}
+        )
+
+    def test_finance_columns_are_masked(self):
+        self.client.force_login(self.internal)
+
+        rows = self._csv(status=Job.Status.DRAWINGS_WIP)
+
+        self.assertTrue(rows)
+        self.assertEqual({row["Actual Revenue"] for row in rows}, {""})
+        response = self._get(format="jsonl", columns=["job", "actual_revenue"])
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual({row["Actual Revenue"] for row in rows}, {None})
+
+    def test_filters(self):
+        shipped = self._csv(status=Job.Status.SHIPPED)
+        self.assertEqual(self._jobs(shipped), {"J2"})
+
+        globex = self._csv(client=self.globex.pk)
+        self.assertEqual(self._jobs(globex), {"J3", "J4"})
+
+        window = self._csv(planned_from="2026-01-01", planned_to="2026-03-01")
+        self.assertEqual(
+            [(row["Job"], row["Stage"]) for row in window], [("J1", "Created")]
+        )
+
+        response = self._get(format="csv", columns=["stage", "job"])
+        header = self._content(response).splitlines()[0]
+        self.assertEqual(header, "Job,Stage")
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in (
+            {"format": "pdf"},
+            {"status": "bogus"},
+            {"columns": "salary"},
+            {"planned_from": "not-a-date"},
+            {"planned_from": "2026-03-01", "planned_to": "2026-01-01"},
+            {"since": "yesterday"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self._get(**params).status_code, 400)
+
+    def test_since_returns_only_jobs_changed_through_any_table(self):
+        past = timezone.now() - timedelta(days=30)
+        since = (past + timedelta(days=1)).isoformat()
+        touches = {
+            "J1": lambda: Job.objects.filter(pk=self.wip.pk).update(
+                updated_at=timezone.now()
+            ),
+            "J2": lambda: Milestone.objects.filter(
+                job=self.shipped, stage=Milestone.Stage.DELIVERY
+            ).update(updated_at=timezone.now()),
+            "J3": lambda: JobNote.objects.create(
+                job=self.depot_job, author=self.finance, body="Called site"
+            ),
+            "J4": lambda: JobAttachment.objects.create(
+                job=self.spare,
+                category=JobAttachment.Category.values[0],
+                file="job_attachments/spare.pdf",
+            ),
+        }
+        for reference, touch in touches.items():
+            with self.subTest(reference=reference):
+                for model in (Job, Milestone, JobNote, JobAttachment):
+                    model.objects.update(updated_at=past)
+                self.assertEqual(self._csv(since=since), [])
+
+                touch()
+
+                rows = self._csv(since=since)
+                self.assertEqual(self._jobs(rows), {reference})
+                self.assertEqual(len(rows), len(Milestone.Stage))
+
+
+class JobScheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        project = Project.objects.create(name="Plant", reference="P1", client=client)
+        cls.job = Job.objects.create(project=project, reference="J1", title="Job")
+
+    def _milestone(self, stage: str) -> Milestone:
+        return Milestone.objects.get(job=self.job, stage=stage)
+
+    def _schedule(self) -> tuple:
+        self.job.refresh_from_db()
+        return (
+            self.job.current_stage,
+            self.job.next_milestone_stage,
+            self.job.next_milestone_date,
+        )
+
+    def test_milestone_save_recomputes_the_schedule(self):
+        design = self._milestone(Milestone.Stage.DRAWING_COMPLETION)
+        design.planned_date = date(2026, 3, 1)
+        design.save()
+        self.assertEqual(
+            self._schedule(),
+            ("", Milestone.Stage.DRAWING_COMPLETION, date(2026, 3, 1)),
+        )
+
+        created = self._milestone(Milestone.Stage.CREATED)
+        created.planned_date = date(2026, 2, 1)
+        created.save()
+        self.assertEqual(
+            self._schedule(), ("", Milestone.Stage.CREATED, date(2026, 2, 1))
+        )
+
+        created.actual_date = date(2026, 2, 3)
+        created.save()
+        self.assertEqual(
+            self._schedule(),
+            (
+                Milestone.Stage.CREATED,
+                Milestone.Stage.DRAWING_COMPLETION,
+                date(2026, 3, 1),
+            ),
+        )
+
+    def test_milestone_delete_recomputes_the_schedule(self):
+        Milestone.objects.filter(
+            job=self.job, stage=Milestone.Stage.CREATED
+        ).update(planned_date=date(2026, 2, 1), actual_date=date(2026, 2, 1))
+        delivery = self._milestone(Milestone.Stage.DELIVERY)
+        delivery.planned_date = date(2026, 9, 1)
+        delivery.save()
+        self.assertEqual(
+            self._schedule(),
+            (Milestone.Stage.CREATED, Milestone.Stage.DELIVERY, date(2026, 9, 1)),
+        )
+
+        delivery.delete()
+        self.assertEqual(self._schedule(), (Milestone.Stage.CREATED, "", None))
+
+        self._milestone(Milestone.Stage.CREATED).delete()
+        self.assertEqual(self._schedule(), ("", "", None))
+
+    def test_refresh_job_schedules_command_fixes_stale_jobs(self):
+        # QuerySet.update() sends no signals, leaving the job's fields stale.
+        Milestone.objects.filter(
+            job=self.job, stage=Milestone.Stage.FABRICATION
+        ).update(planned_date=date(2026, 6, 1))
+        self.assertEqual(self._schedule(), ("", "", None))
+
+        out = io.StringIO()
+        call_command("refresh_job_schedules", stdout=out)
+
+        self.assertIn("Updated the schedule of 1 jobs.", out.getvalue())
+        self.assertEqual(
+            self._schedule(), ("", Milestone.Stage.FABRICATION, date(2026, 6, 1))
+        )
+        out = io.StringIO()
+        call_command("refresh_job_schedules", "--chunk-size", "1", stdout=out)
+        self.assertIn("Updated the schedule of 0 jobs.", out.getvalue())
+
+
+class JobMilestoneCreationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(name="Acme", account_code="ACME")
+        cls.project = Project.objects.create(
+            name="Plant", reference="P1", client=client
+        )
+
+    def _milestone_inserts(self, queries) -> int:
+        return sum(
+            query["sql"].startswith("INSERT")
+            and 'INTO "projects_milestone"' in query["sql"]
+            for query in queries.captured_queries
+        )
+
+    def test_new_job_gets_every_stage_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            job = Job.objects.create(project=self.project, reference="J1", title="Job")
+
+        self.assertEqual(self._milestone_inserts(queries), 1)
+        self.assertEqual(
+            sorted(job.milestones.values_list("stage", flat=True)),
+            sorted(Milestone.Stage.values),
+        )
+        job.title = "Renamed"
+        job.save()
+        self.assertEqual(job.milestones.count(), len(Milestone.Stage))
+
+    def test_bulk_create_jobs_batches_dated_milestones(self):
+        with CaptureQueriesContext(connection) as queries:
+            created = bulk_create_jobs(
+                (
+                    Job(project=self.project, reference=f"J{index}", title="Job")
+                    for index in range(30)
+                ),
+                milestone_dates=lambda job: {
+                    Milestone.Stage.CREATED: (date(2026, 1, 5), date(2026, 1, 6)),
+                    Milestone.Stage.DELIVERY: (date(2026, 9, 1), None),
+                },
+            )
+
+        # 210 milestones at SQLite's 142 rows per batch.
+        self.assertEqual(self._milestone_inserts(queries), 2)
+        self.assertEqual(Milestone.objects.count(), 30 * len(Milestone.Stage))
+        self.assertEqual(
+            Milestone.objects.filter(actual_date=date(2026, 1, 6)).count(), 30
+        )
+        job = Job.objects.get(pk=created[0].pk)
+        self.assertEqual(
+            (job.current_stage, job.next_milestone_stage, job.next_milestone_date),
+            (Milestone.Stage.CREATED, Milestone.Stage.DELIVERY, date(2026, 9, 1)),
+        )
@@ -0,0 +1,109 @@
+"""Bulk job status transitions.
+
+``transition_jobs`` moves many jobs to one status with a single ``UPDATE``.
+When the status maps to a milestone stage (``STATUS_STAGES``), that stage's
+``actual_date`` is set to today on every job that hasn't completed it yet, in
+one more ``UPDATE``.  The audit entries for both go to the audit sink as one
+batch.  ``QuerySet.update`` skips the Job and Milestone signals, so the rollups,
+job schedules and export cache are maintained here.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from accounts.models import User
+
+from . import rollups
+from .auditing import audit_sink
+from .export_cache import bump_export_generation
+from .models import STATUS_STAGES, Job, JobAuditLog, Milestone
+from .schedule import refresh_job_schedule
+
+
+@dataclass
+class TransitionResult:
+    updated: int = 0
+    milestones_completed: int = 0
+
+
+def transition_jobs(
+    jobs: QuerySet[Job],
+    status: str,
+    actor: User | None = None,
+    completed_on: date | None = None,
+) -> TransitionResult:
+    """Set ``status`` on ``jobs``; jobs already in that status are skipped.
+
+    ``jobs`` should already be limited to the actor's access scope, e.g. with
+    ``jobs_for_user``.
+    """
+    if status not in Job.Status.values:
+        raise ValueError(f"Unknown job status {status!r}")
+    actor = actor if actor is not None and actor.is_authenticated else None
+    now = timezone.now()
+    completed_on = completed_on or timezone.localdate()
+    stage = STATUS_STAGES.get(status)
+    result = TransitionResult()
+    with transaction.atomic():
+        rows = list(
+            jobs.exclude(status=status)
+            .select_for_update()
+            .values_list(
+                "id", "project_id", "status", "forecast_revenue", "actual_revenue"
+            )
+        )
+        if not rows:
+            return result
+        job_ids = [row[0] for row in rows]
+        result.updated = Job.objects.filter(pk__in=job_ids).update(
+            status=status, updated_at=now
+        )
+        rollups.apply_job_changes(
+            (
+                rollups.JobState(project_id, previous, forecast, actual),
+                rollups.JobState(project_id, status, forecast, actual),
+            )
+            for _, project_id, previous, forecast, actual in rows
+        )
+        entries = [
+            JobAuditLog(
+                job_id=job_id,
+                actor=actor,
+                action="job_field_updated",
+                field_name="status",
+                previous_value=previous,
+                new_value=status,
+            )
+            for job_id, _, previous, *_ in rows
+        ]
+
+        if stage is not None:
+            pending = Milestone.objects.filter(
+                job_id__in=job_ids, stage=stage, actual_date__isnull=True
+            )
+            completed_jobs = list(pending.values_list("job_id", flat=True))
+            if completed_jobs:
+                result.milestones_completed = pending.update(
+                    actual_date=completed_on, updated_at=now
+                )
+                label = f"{stage.label} - actual_date"
+                entries.extend(
+                    JobAuditLog(
+                        job_id=job_id,
+                        actor=actor,
+                        action="milestone_updated",
+                        field_name=label,
+                        new_value=str(completed_on),
+                    )
+                    for job_id in completed_jobs
+                )
+                refresh_job_schedule(completed_jobs)
+
+        audit_sink().write(entries)
+        bump_export_generation()
+    return result
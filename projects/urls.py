@@ -8,8 +8,42 @@ urlpatterns = [
     path("clients/<int:pk>/", views.ClientDetailView.as_view(), name="client-detail"),
     path("projects/create/", views.ProjectCreateView.as_view(), name="project-create"),
     path("projects/<int:pk>/", views.ProjectDetailView.as_view(), name="project-detail"),
+    path(
+        "projects/<int:pk>/reschedule/",
+        views.ProjectRescheduleView.as_view(),
+        name="project-reschedule",
+    ),
     path("jobs/create/", views.JobCreateView.as_view(), name="job-create"),
+    path("jobs/import/", views.JobImportView.as_view(), name="job-import"),
+    path("jobs/status/", views.JobBulkStatusView.as_view(), name="job-bulk-status"),
     path("jobs/<int:pk>/", views.JobDetailView.as_view(), name="job-detail"),
+    path(
+        "jobs/<int:pk>/panels/<str:panel>/",
+        views.JobPanelView.as_view(),
+        name="job-panel",
+    ),
     path("jobs/<int:pk>/edit/", views.JobUpdateView.as_view(), name="job-edit"),
+    path(
+        "jobs/autocomplete/<str:source>/",
+        views.JobAutocompleteView.as_view(),
+        name="job-autocomplete",
+    ),
     path("exports/jobs/", views.JobExcelExportView.as_view(), name="job-export"),
+    path(
+        "exports/jobs/background/",
+        views.JobExportStartView.as_view(),
+        name="job-export-start",
+    ),
+    path("exports/<int:pk>/", views.ExportJobDetailView.as_view(), name="export-detail"),
+    path(
+        "exports/<int:pk>/status/",
+        views.ExportJobStatusView.as_view(),
+        name="export-status",
+    ),
+    path(
+        "exports/<int:pk>/download/",
+        views.ExportJobDownloadView.as_view(),
+        name="export-download",
+    ),
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
 ]
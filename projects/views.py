@@ -1,38 +1,94 @@
 ﻿from __future__ import annotations
 
-import io
+import tempfile
 from datetime import date
 from decimal import Decimal
 
-import pandas as pd
-from django import forms
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
-from django.http import FileResponse, Http404, HttpResponseRedirect
-from django.shortcuts import redirect
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Coalesce
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.defaultfilters import pluralize
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import add_never_cache_headers
+from django.utils.http import (
+    content_disposition_header,
+    url_has_allowed_host_and_scheme,
+    urlencode,
+)
 from django.views import View
 from django.views.generic import (
     DetailView,
     ListView,
     TemplateView,
     CreateView,
+    FormView,
     UpdateView,
 )
 
 from accounts.models import User
 
-from .forms import JobAttachmentForm, JobForm, JobNoteForm, MilestoneFormSet, ProjectForm
-from .models import Client, Job, JobAttachment, JobAuditLog, JobNote, Milestone, Project
+from . import choices, export_cache
+from .auditing import ChangeTracker, save_milestone_formset
+from .exports import (
+    EXPORT_CHUNK_SIZE,
+    STREAMING_FORMATS,
+    XLSX_CONTENT_TYPE,
+    export_columns,
+    export_headers,
+    export_jobs_queryset,
+    iter_export_rows,
+    next_watermark,
+    write_xlsx,
+)
+from .forms import (
+    JobAttachmentForm,
+    JobExportFilterForm,
+    JobBulkStatusForm,
+    JobForm,
+    JobImportForm,
+    JobNoteForm,
+    MilestoneFormSet,
+    ProjectForm,
+    ProjectRescheduleForm,
+)
+from .imports import ImportFileError, import_jobs
+from .middleware import collected_metrics, render_prometheus
+from .models import (
+    Client,
+    ExportJob,
+    Job,
+    JobAttachment,
+    JobAuditLog,
+    JobNote,
+    Milestone,
+    Project,
+)
+from .reschedule import reschedule_project
 from .services import (
+    InvalidCursor,
+    access_scope,
     clients_for_user,
     job_milestones_prefetched,
     jobs_for_user,
+    keyset_page,
     projects_for_user,
+    queue_job_export,
 )
+from .transitions import transition_jobs
 
 
 class InternalAccessRequired(UserPassesTestMixin):
@@ -53,7 +109,22 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user: User = self.request.user
-        projects = projects_for_user(user).prefetch_related("jobs__project__client")[:8]
+        projects = (
+            projects_for_user(user)
+            .annotate(
+                forecast_total=Coalesce(F("rollup__forecast_revenue"), Decimal("0")),
+                actual_total=Coalesce(F("rollup__actual_revenue"), Decimal("0")),
+            )
+            .prefetch_related(
+                Prefetch(
+                    "jobs",
+                    queryset=Job.objects.only(
+                        "id", "project_id", "reference", "title", "status"
+                    ).order_by("reference"),
+                    to_attr="card_jobs",
+                )
+            )[:8]
+        )
 
         cards = []
         status_badges = {
@@ -70,21 +141,12 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         }
 
         for project in projects:
-            job_qs = list(
-                project.jobs.select_related("project", "project__client").order_by(
-                    "reference"
-                )
-            )
-            forecast_total = sum(
-                (job.forecast_revenue for job in job_qs), Decimal("0")
-            )
-            actual_total = sum((job.actual_revenue for job in job_qs), Decimal("0"))
             cards.append(
                 {
                     "project": project,
                     "client": project.client,
-                    "forecast_total": forecast_total,
-                    "actual_total": actual_total,
+                    "forecast_total": project.forecast_total,
+                    "actual_total": project.actual_total,
                     "jobs": [
                         {
                             "reference": job.reference,
@@ -94,7 +156,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                                 job.status, "bg-secondary"
                             ),
                         }
-                        for job in job_qs
+                        for job in project.card_jobs
                     ],
                 }
             )
@@ -108,7 +170,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         upcoming_milestones = (
             Milestone.objects.filter(job__in=jobs_for_user(user))
             .filter(planned_date__gte=today)
-            .select_related("job", "job__project")
+            .select_related("job__project__client")
             .order_by("planned_date")[:10]
         )
         context.update(
@@ -127,14 +189,24 @@ class ClientListView(LoginRequiredMixin, ListView):
     context_object_name = "clients"
 
     def get_queryset(self):
-        return clients_for_user(self.request.user)
+        return (
+            clients_for_user(self.request.user)
+            .with_rollups()
+            .select_related("account_manager")
+        )
 
     def dispatch(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
         if request.user.is_authenticated and request.user.is_client_user:
-            single_client = queryset.first()
-            if single_client:
-                return redirect("client-detail", pk=single_client.pk)
+            client_ids = access_scope(request.user).client_ids
+            if len(client_ids) == 1:
+                return redirect("client-detail", pk=next(iter(client_ids)))
+            if client_ids:
+                first_client = (
+                    Client.objects.filter(pk__in=client_ids)
+                    .values_list("pk", flat=True)
+                    .first()
+                )
+                return redirect("client-detail", pk=first_client)
         return super().dispatch(request, *args, **kwargs)
 
 
@@ -143,8 +215,11 @@ class ClientDetailView(LoginRequiredMixin, DetailView):
     template_name = "projects/client_detail.html"
 
     def get_queryset(self):
-        return clients_for_user(self.request.user).prefetch_related(
-            "projects__jobs__milestones", "access_assignments__user"
+        return (
+            clients_for_user(self.request.user)
+            .with_rollups()
+            .select_related("account_manager")
+            .prefetch_related("access_assignments__user")
         )
 
     def get_context_data(self, **kwargs):
@@ -152,8 +227,7 @@ class ClientDetailView(LoginRequiredMixin, DetailView):
         client = self.object
         context["jobs"] = (
             Job.objects.filter(project__client=client)
-            .select_related("project")
-            .prefetch_related("milestones")
+            .select_related("project", "owner")
             .order_by("project__reference", "reference")
         )
         return context
@@ -165,9 +239,42 @@ class ProjectDetailView(LoginRequiredMixin, DetailView):
 
     def get_queryset(self):
         return projects_for_user(self.request.user).prefetch_related(
-            "jobs__milestones"
+            Prefetch("jobs", queryset=Job.objects.select_related("owner"))
         )
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["status_choices"] = Job.Status.choices
+        context["reschedule_form"] = ProjectRescheduleForm()
+        return context
+
+
+class ProjectRescheduleView(InternalAccessRequired, LoginRequiredMixin, View):
+    """Shift the project's planned milestone dates in one UPDATE."""
+
+    def post(self, request, pk):
+        project = get_object_or_404(projects_for_user(request.user), pk=pk)
+        form = ProjectRescheduleForm(request.POST)
+        if form.is_valid():
+            moved = reschedule_project(
+                project,
+                form.cleaned_data["days"],
+                request.user,
+                stages=form.cleaned_data["stages"],
+                future_only=form.cleaned_data["future_only"],
+            )
+            messages.success(
+                request,
+                f"Moved {moved} milestone{pluralize(moved)} by "
+                f"{form.cleaned_data['days']:+d} days.",
+            )
+        else:
+            messages.error(
+                request,
+                " ".join(error for errors in form.errors.values() for error in errors),
+            )
+        return redirect("project-detail", pk=project.pk)
+
 
 class ProjectCreateView(InternalAccessRequired, LoginRequiredMixin, CreateView):
     model = Project
@@ -210,22 +317,10 @@ class JobCreateView(InternalAccessRequired, LoginRequiredMixin, CreateView):
                 pass
         return initial
 
-    def get_form(self, form_class=None):
-        form = super().get_form(form_class)
-        user = self.request.user
-        form.fields["project"].queryset = projects_for_user(user)
-        internal_users = User.objects.filter(
-            Q(role__in=[User.Role.INTERNAL, User.Role.SIKLA]) | Q(is_superuser=True)
-        )
-        form.fields["owner"].queryset = internal_users
-        form.fields["design_manager"].queryset = internal_users
-        form.fields["client_contact"].queryset = User.objects.filter(
-            client_assignments__client__in=clients_for_user(user)
-        ).distinct()
-        if not user.can_view_finance:
-            form.fields["actual_revenue"].widget = forms.HiddenInput()
-            form.fields["actual_revenue"].required = False
-        return form
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
 
     def form_valid(self, form):
         response = super().form_valid(form)
@@ -244,22 +339,10 @@ class JobUpdateView(InternalAccessRequired, LoginRequiredMixin, UpdateView):
     def get_queryset(self):
         return jobs_for_user(self.request.user)
 
-    def get_form(self, form_class=None):
-        form = super().get_form(form_class)
-        user = self.request.user
-        form.fields["project"].queryset = projects_for_user(user)
-        internal_users = User.objects.filter(
-            Q(role__in=[User.Role.INTERNAL, User.Role.SIKLA]) | Q(is_superuser=True)
-        )
-        form.fields["owner"].queryset = internal_users
-        form.fields["design_manager"].queryset = internal_users
-        form.fields["client_contact"].queryset = User.objects.filter(
-            client_assignments__client__in=clients_for_user(user)
-        ).distinct()
-        if not user.can_view_finance:
-            form.fields["actual_revenue"].widget = forms.HiddenInput()
-            form.fields["actual_revenue"].required = False
-        return form
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
 
     def form_valid(self, form):
         messages.success(self.request, "Job updated successfully.")
@@ -269,6 +352,122 @@ class JobUpdateView(InternalAccessRequired, LoginRequiredMixin, UpdateView):
         return reverse("job-detail", kwargs={"pk": self.object.pk})
 
 
+class JobBulkStatusView(InternalAccessRequired, LoginRequiredMixin, View):
+    """Move the selected jobs to one status in a single UPDATE."""
+
+    def post(self, request, *args, **kwargs):
+        form = JobBulkStatusForm(request.POST, user=request.user)
+        if form.is_valid():
+            status = form.cleaned_data["status"]
+            result = transition_jobs(form.cleaned_data["jobs"], status, request.user)
+            messages.success(
+                request,
+                f"Moved {result.updated} job{pluralize(result.updated)} to "
+                f"{Job.Status(status).label}.",
+            )
+        else:
+            messages.error(request, "Select at least one job and a status.")
+        next_url = request.POST.get("next")
+        if not url_has_allowed_host_and_scheme(
+            next_url, allowed_hosts={request.get_host()}
+        ):
+            next_url = reverse("dashboard")
+        return redirect(next_url)
+
+
+class JobImportView(InternalAccessRequired, LoginRequiredMixin, FormView):
+    form_class = JobImportForm
+    template_name = "projects/job_import.html"
+
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        try:
+            result = import_jobs(
+                upload,
+                upload.name,
+                self.request.user,
+                dry_run=form.cleaned_data["dry_run"],
+            )
+        except ImportFileError as exc:
+            form.add_error("file", str(exc))
+            return self.form_invalid(form)
+        if result.dry_run:
+            messages.info(
+                self.request,
+                f"Checked {result.rows} rows; {len(result.errors)} would be rejected.",
+            )
+        else:
+            messages.success(
+                self.request,
+                f"Imported {result.created} of {result.rows} rows; "
+                f"{len(result.errors)} rejected.",
+            )
+        return self.render_to_response(
+            self.get_context_data(form=JobImportForm(), result=result)
+        )
+
+
+class JobAutocompleteView(InternalAccessRequired, LoginRequiredMixin, View):
+    """JSON search over the cached choice lists behind ``AutocompleteSelect``."""
+
+    def get(self, request, source, *args, **kwargs):
+        if source not in choices.SOURCES:
+            raise Http404("Unknown autocomplete source.")
+        client_id = None
+        project_id = request.GET.get("project", "")
+        if project_id.isdigit():
+            client_id = choices.client_for_project(int(project_id))
+        results = choices.search_choices(
+            source,
+            access_scope(request.user),
+            term=request.GET.get("q", ""),
+            client_id=client_id,
+        )
+        return JsonResponse({"results": results})
+
+
+# panel -> (model, relation shown on each row, fragment template)
+JOB_PANELS = {
+    "notes": (JobNote, "author", "projects/partials/job_notes.html"),
+    "attachments": (
+        JobAttachment,
+        "uploaded_by",
+        "projects/partials/job_attachments.html",
+    ),
+    "audit": (JobAuditLog, "actor", "projects/partials/job_audit.html"),
+}
+JOB_PANEL_PAGE_SIZE = 20
+
+
+def job_panel_page(job_id: int, panel: str, after: str | None = None) -> dict:
+    model, relation, _ = JOB_PANELS[panel]
+    items, cursor = keyset_page(
+        model.objects.filter(job_id=job_id).select_related(relation),
+        after,
+        JOB_PANEL_PAGE_SIZE,
+    )
+    next_url = None
+    if cursor:
+        next_url = reverse("job-panel", kwargs={"pk": job_id, "panel": panel})
+        next_url += "?" + urlencode({"after": cursor})
+    return {"items": items, "next_url": next_url, "first_page": not after}
+
+
+class JobPanelView(LoginRequiredMixin, View):
+    """Later pages of a job detail panel, as an HTML fragment."""
+
+    def get(self, request, pk, panel, *args, **kwargs):
+        if panel not in JOB_PANELS:
+            raise Http404("Unknown panel.")
+        if not jobs_for_user(request.user).filter(pk=pk).exists():
+            raise Http404("Job not found.")
+        try:
+            page = job_panel_page(pk, panel, request.GET.get("after"))
+        except InvalidCursor as exc:
+            return HttpResponseBadRequest(str(exc))
+        return render(request, JOB_PANELS[panel][2], {"page": page})
+
+
 class JobDetailView(LoginRequiredMixin, DetailView):
     model = Job
     template_name = "projects/job_detail.html"
@@ -280,25 +479,8 @@ class JobDetailView(LoginRequiredMixin, DetailView):
         user: User = self.request.user
         return user.is_superuser or user.role in {User.Role.INTERNAL, User.Role.SIKLA}
 
-    def _configure_job_form(self, form: JobForm):
-        user = self.request.user
-        form.fields["project"].queryset = projects_for_user(user)
-        internal_users = User.objects.filter(
-            Q(role__in=[User.Role.INTERNAL, User.Role.SIKLA]) | Q(is_superuser=True)
-        ).distinct()
-        form.fields["owner"].queryset = internal_users
-        form.fields["design_manager"].queryset = internal_users
-        form.fields["client_contact"].queryset = User.objects.filter(
-            client_assignments__client__in=clients_for_user(user)
-        ).distinct()
-        if not user.can_view_finance:
-            form.fields["actual_revenue"].widget = forms.HiddenInput()
-            form.fields["actual_revenue"].required = False
-        return form
-
     def _get_job_form(self, data=None, disable=True):
-        form = JobForm(data=data, instance=self.object)
-        self._configure_job_form(form)
+        form = JobForm(data=data, instance=self.object, user=self.request.user)
         if disable:
             for field in form.fields.values():
                 field.widget.attrs["disabled"] = True
@@ -324,9 +506,9 @@ class JobDetailView(LoginRequiredMixin, DetailView):
         context.setdefault("milestone_form_errors", False)
         context.setdefault("note_form_errors", False)
         context.setdefault("attachment_form_errors", False)
-        context["notes"] = self.object.diary_entries.select_related("author")
-        context["attachments"] = self.object.attachments.select_related("uploaded_by")
-        context["audit_logs"] = self.object.audit_logs.select_related("actor")
+        context["notes"] = job_panel_page(self.object.pk, "notes")
+        context["attachments"] = job_panel_page(self.object.pk, "attachments")
+        context["audit_logs"] = job_panel_page(self.object.pk, "audit")
         context["can_edit_job"] = self._user_can_edit()
         return context
 
@@ -339,23 +521,11 @@ class JobDetailView(LoginRequiredMixin, DetailView):
                 raise PermissionDenied
             job_form = self._get_job_form(data=request.POST, disable=False)
             if job_form.is_valid():
-                old_values = {
-                    field: getattr(self.object, field) for field in job_form.fields
-                }
-                job_form.save()
-                self.object.refresh_from_db()
-                for field in job_form.changed_data:
-                    previous = old_values.get(field)
-                    new_value = getattr(self.object, field)
-                    if previous != new_value:
-                        JobAuditLog.objects.create(
-                            job=self.object,
-                            actor=user,
-                            action="job_field_updated",
-                            field_name=field,
-                            previous_value=str(previous or ""),
-                            new_value=str(new_value or ""),
-                        )
+                with transaction.atomic():
+                    tracker = ChangeTracker(self.object, user)
+                    tracker.track_form(job_form, "job_field_updated")
+                    job_form.save()
+                    tracker.flush()
                 messages.success(request, "Job details updated.")
                 return HttpResponseRedirect(self.request.path)
             context = self.get_context_data(
@@ -369,25 +539,10 @@ class JobDetailView(LoginRequiredMixin, DetailView):
                 raise PermissionDenied
             formset = MilestoneFormSet(request.POST, instance=self.object)
             if formset.is_valid():
-                changes = []
-                for form in formset.forms:
-                    if not form.cleaned_data or not form.has_changed():
-                        continue
-                    stage = form.instance.get_stage_display()
-                    for field in form.changed_data:
-                        previous = form.initial.get(field)
-                        new_value = form.cleaned_data.get(field)
-                        changes.append((stage, field, previous, new_value))
-                formset.save()
-                for stage, field, previous, new_value in changes:
-                    JobAuditLog.objects.create(
-                        job=self.object,
-                        actor=user,
-                        action="milestone_updated",
-                        field_name=f"{stage} - {field}",
-                        previous_value=str(previous or ""),
-                        new_value=str(new_value or ""),
-                    )
+                with transaction.atomic():
+                    tracker = ChangeTracker(self.object, user)
+                    save_milestone_formset(formset, tracker)
+                    tracker.flush()
                 messages.success(request, "Milestones updated.")
                 return HttpResponseRedirect(self.request.path)
             context = self.get_context_data(
@@ -403,12 +558,9 @@ class JobDetailView(LoginRequiredMixin, DetailView):
                 note.job = self.object
                 note.author = user if user.is_authenticated else None
                 note.save()
-                JobAuditLog.objects.create(
-                    job=self.object,
-                    actor=user,
-                    action="note_added",
-                    note=note.body,
-                )
+                tracker = ChangeTracker(self.object, user)
+                tracker.add("note_added", note=note.body)
+                tracker.flush()
                 messages.success(request, "Note added to job.")
                 return HttpResponseRedirect(self.request.path)
             context = self.get_context_data(
@@ -426,13 +578,13 @@ class JobDetailView(LoginRequiredMixin, DetailView):
                 attachment.job = self.object
                 attachment.uploaded_by = user if user.is_authenticated else None
                 attachment.save()
-                JobAuditLog.objects.create(
-                    job=self.object,
-                    actor=user,
-                    action="attachment_added",
+                tracker = ChangeTracker(self.object, user)
+                tracker.add(
+                    "attachment_added",
                     field_name=attachment.get_category_display(),
                     new_value=attachment.filename,
                 )
+                tracker.flush()
                 messages.success(request, "Attachment uploaded.")
                 return HttpResponseRedirect(self.request.path)
             context = self.get_context_data(
@@ -445,59 +597,132 @@ class JobDetailView(LoginRequiredMixin, DetailView):
 
 
 class JobExcelExportView(LoginRequiredMixin, View):
+    chunk_size = EXPORT_CHUNK_SIZE
+    # Full (non-delta) workbooks are reused until the data generation changes.
+    use_cache = True
+
     def get(self, request, *args, **kwargs):
-        jobs = job_milestones_prefetched(request.user)
-        rows = []
-        for job in jobs:
-            for milestone in job.milestones.all():
-                rows.append(
-                    {
-                        "Project": job.project.reference,
-                        "Job": job.reference,
-                        "Job Title": job.title,
-                        "Job Status": job.get_status_display(),
-                        "Stage": milestone.get_stage_display(),
-                        "Planned Date": milestone.planned_date,
-                        "Actual Date": milestone.actual_date,
-                        "Owner": job.owner.get_full_name() if job.owner else "",
-                        "Design Manager": job.design_manager.get_full_name()
-                        if job.design_manager
-                        else "",
-                        "Client": job.project.client.name,
-                        "Client Contact": job.client_contact.get_full_name()
-                        if job.client_contact
-                        else "",
-                        "Forecast Revenue": job.forecast_revenue,
-                        "Actual Revenue": job.actual_revenue if request.user.can_view_finance else None,
-                    }
-                )
-        if not rows:
-            rows.append(
-                {
-                    "Project": "",
-                    "Job": "",
-                    "Job Title": "",
-                    "Job Status": "",
-                    "Stage": "",
-                    "Planned Date": "",
-                    "Actual Date": "",
-                    "Owner": "",
-                    "Design Manager": "",
-                    "Client": "",
-                    "Client Contact": "",
-                    "Forecast Revenue": 0,
-                    "Actual Revenue": 0 if request.user.can_view_finance else None,
-                }
+        form = JobExportFilterForm(request.GET, user=request.user)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+        export_format = form.cleaned_data["format"] or "xlsx"
+        watermark = next_watermark()
+        columns = export_columns(form.cleaned_data["columns"])
+        jobs = export_jobs_queryset(request.user, columns, form.cleaned_data)
+        rows = iter_export_rows(
+            jobs, request.user, columns, chunk_size=self.chunk_size
+        )
+        headers = export_headers(columns)
+        filename = f"ddps_jobs_{date.today().isoformat()}.{export_format}"
+
+        if export_format in STREAMING_FORMATS:
+            content_type, stream = STREAMING_FORMATS[export_format]
+            response = StreamingHttpResponse(
+                stream(headers, rows), content_type=content_type
+            )
+            response["Content-Disposition"] = content_disposition_header(
+                True, filename
+            )
+        elif self.use_cache and not form.cleaned_data["since"]:
+            cached, hit = export_cache.fetch_or_build(
+                request.user,
+                export_format,
+                form.export_parameters(),
+                lambda handle: write_xlsx(handle, headers, rows),
+            )
+            response = FileResponse(
+                cached,
+                as_attachment=True,
+                filename=filename,
+                content_type=XLSX_CONTENT_TYPE,
             )
-        frame = pd.DataFrame(rows)
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            frame.to_excel(writer, index=False, sheet_name="Jobs")
-        buffer.seek(0)
-        filename = f"ddps_jobs_{date.today().isoformat()}.xlsx"
+            response["X-Export-Cache"] = "hit" if hit else "miss"
+        else:
+            # Spool to disk so a large workbook never sits in worker memory;
+            # the FileResponse then streams it out in blocks and closes it.
+            handle = tempfile.TemporaryFile()
+            write_xlsx(handle, headers, rows)
+            handle.seek(0)
+            response = FileResponse(
+                handle,
+                as_attachment=True,
+                filename=filename,
+                content_type=XLSX_CONTENT_TYPE,
+            )
+        # Pass this back as ``since`` to fetch only jobs changed afterwards.
+        response["X-Export-Watermark"] = watermark
+        return response
+
+
+class JobExportStartView(LoginRequiredMixin, View):
+    def post(self, request, *args, **kwargs):
+        form = JobExportFilterForm(request.POST, user=request.user)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+        export = queue_job_export(
+            request.user,
+            form.cleaned_data["format"] or ExportJob.Format.XLSX,
+            form.export_parameters(),
+        )
+        preferred = request.get_preferred_type(["text/html", "application/json"])
+        if preferred == "application/json":
+            return JsonResponse(_export_status(export), status=202)
+        return redirect("export-detail", pk=export.pk)
+
+
+def _export_status(export: ExportJob) -> dict:
+    return {
+        "id": export.pk,
+        "format": export.export_format,
+        "status": export.status,
+        "status_display": export.get_status_display(),
+        "rows_processed": export.rows_processed,
+        "error": export.error,
+        "watermark": export.parameters.get("watermark"),
+        "status_url": reverse("export-status", kwargs={"pk": export.pk}),
+        "download_url": (
+            reverse("export-download", kwargs={"pk": export.pk})
+            if export.status == ExportJob.Status.COMPLETE
+            else None
+        ),
+    }
+
+
+class ExportJobDetailView(LoginRequiredMixin, DetailView):
+    model = ExportJob
+    template_name = "projects/export_detail.html"
+
+    def get_queryset(self):
+        return self.request.user.export_jobs.all()
+
+
+class ExportJobStatusView(ExportJobDetailView):
+    def render_to_response(self, context, **response_kwargs):
+        return JsonResponse(_export_status(self.object))
+
+
+class ExportJobDownloadView(ExportJobDetailView):
+    def render_to_response(self, context, **response_kwargs):
+        export = self.object
+        if export.status != ExportJob.Status.COMPLETE or not export.file:
+            raise Http404("Export is not ready.")
         return FileResponse(
-            buffer,
+            export.file.open("rb"),
             as_attachment=True,
-            filename=filename,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename=export.file.name.rsplit("/", 1)[-1],
+        )
+
+
+class MetricsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Per-view request metrics in Prometheus text format, for staff."""
+
+    def test_func(self) -> bool:
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        response = HttpResponse(
+            render_prometheus(collected_metrics()),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
         )
+        add_never_cache_headers(response)
+        return response
@@ -0,0 +1,42 @@
+// Searchable selects for fields rendered with projects.forms.AutocompleteSelect.
+// The server renders only the selected option; typing in the search box above
+// the select fetches matching options from its data-autocomplete-url.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control form-control-sm mb-1';
+        search.placeholder = 'Search...';
+        search.disabled = select.disabled;
+        select.parentNode.insertBefore(search, select);
+
+        let timer = null;
+        const load = function () {
+            const params = new URLSearchParams({q: search.value});
+            const forward = select.dataset.autocompleteForward;
+            if (forward && select.form && select.form.elements[forward]) {
+                params.set(forward, select.form.elements[forward].value);
+            }
+            fetch(select.dataset.autocompleteUrl + '?' + params, {
+                headers: {'Accept': 'application/json'},
+                credentials: 'same-origin',
+            })
+                .then(function (response) { return response.ok ? response.json() : {results: []}; })
+                .then(function (data) {
+                    const current = select.value;
+                    Array.from(select.options).forEach(function (option) {
+                        if (option.value && option.value !== current) { option.remove(); }
+                    });
+                    data.results.forEach(function (item) {
+                        if (String(item.id) === current) { return; }
+                        select.add(new Option(item.text, item.id));
+                    });
+                });
+        };
+        search.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(load, 250);
+        });
+        search.addEventListener('focus', load, {once: true});
+    });
+});